@@ -0,0 +1,44 @@
+"""Add vector collections table
+
+Revision ID: 0a4c8e61f9d2
+Revises: f1b7d3a25c80
+Create Date: 2026-10-17 16:10:03.218445
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a4c8e61f9d2'
+down_revision: Union[str, Sequence[str], None] = 'f1b7d3a25c80'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vector_collections',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('physical_name', sa.String(), nullable=False),
+    sa.Column('embedding_model', sa.String(), nullable=False),
+    sa.Column('dimension', sa.Integer(), nullable=True),
+    sa.Column('pending_physical_name', sa.String(), nullable=True),
+    sa.Column('pending_embedding_model', sa.String(), nullable=True),
+    sa.Column('retired_physical_name', sa.String(), nullable=True),
+    sa.Column('migration_status', sa.String(), nullable=True),
+    sa.Column('migration_done', sa.Integer(), nullable=True),
+    sa.Column('migration_total', sa.Integer(), nullable=True),
+    sa.Column('migration_error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index(op.f('ix_vector_collections_name'), 'vector_collections', ['name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_vector_collections_name'), table_name='vector_collections')
+    op.drop_table('vector_collections')
@@ -0,0 +1,28 @@
+"""Add pdf extractor to rfp projects
+
+Revision ID: 1b6f2d9e4a73
+Revises: 0a4c8e61f9d2
+Create Date: 2026-10-17 17:05:12.904361
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b6f2d9e4a73'
+down_revision: Union[str, Sequence[str], None] = '0a4c8e61f9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rfp_projects', sa.Column('pdf_extractor', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('rfp_projects', 'pdf_extractor')
@@ -0,0 +1,51 @@
+"""Add requirement statements table
+
+Revision ID: 2c7e9a4f1d58
+Revises: 1b6f2d9e4a73
+Create Date: 2026-10-17 18:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7e9a4f1d58'
+down_revision: Union[str, Sequence[str], None] = '1b6f2d9e4a73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('requirement_statements',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('page', sa.Integer(), nullable=True),
+    sa.Column('section_path', sa.Text(), nullable=True),
+    sa.Column('section_letter', sa.String(length=1), nullable=True),
+    sa.Column('parent_id', sa.String(), nullable=True),
+    sa.Column('kind', sa.String(), nullable=True),
+    sa.Column('text', sa.Text(), nullable=True),
+    sa.Column('embedding', sa.LargeBinary(), nullable=True),
+    sa.Column('embedding_model', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_requirement_statements_id'), 'requirement_statements', ['id'], unique=False)
+    op.create_index(op.f('ix_requirement_statements_collection_name'), 'requirement_statements', ['collection_name'], unique=False)
+    op.create_index(op.f('ix_requirement_statements_source'), 'requirement_statements', ['source'], unique=False)
+    op.create_index(op.f('ix_requirement_statements_section_letter'), 'requirement_statements', ['section_letter'], unique=False)
+    op.create_index(op.f('ix_requirement_statements_kind'), 'requirement_statements', ['kind'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_requirement_statements_kind'), table_name='requirement_statements')
+    op.drop_index(op.f('ix_requirement_statements_section_letter'), table_name='requirement_statements')
+    op.drop_index(op.f('ix_requirement_statements_source'), table_name='requirement_statements')
+    op.drop_index(op.f('ix_requirement_statements_collection_name'), table_name='requirement_statements')
+    op.drop_index(op.f('ix_requirement_statements_id'), table_name='requirement_statements')
+    op.drop_table('requirement_statements')
@@ -0,0 +1,48 @@
+"""Add document digests table
+
+Revision ID: 3d0b5f82c6e1
+Revises: 2c7e9a4f1d58
+Create Date: 2026-10-17 19:20:31.552910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d0b5f82c6e1'
+down_revision: Union[str, Sequence[str], None] = '2c7e9a4f1d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('document_digests',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('content_hash', sa.String(), nullable=True),
+    sa.Column('summary', sa.Text(), nullable=True),
+    sa.Column('sections', sa.JSON(), nullable=True),
+    sa.Column('evaluation_factors', sa.JSON(), nullable=True),
+    sa.Column('tokens', sa.Integer(), nullable=True),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_document_digests_id'), 'document_digests', ['id'], unique=False)
+    op.create_index(op.f('ix_document_digests_collection_name'), 'document_digests', ['collection_name'], unique=False)
+    op.create_index(op.f('ix_document_digests_source'), 'document_digests', ['source'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_document_digests_source'), table_name='document_digests')
+    op.drop_index(op.f('ix_document_digests_collection_name'), table_name='document_digests')
+    op.drop_index(op.f('ix_document_digests_id'), table_name='document_digests')
+    op.drop_table('document_digests')
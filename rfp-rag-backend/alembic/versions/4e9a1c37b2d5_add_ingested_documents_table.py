@@ -0,0 +1,54 @@
+"""Add ingested documents table
+
+Revision ID: 4e9a1c37b2d5
+Revises: 3d0b5f82c6e1
+Create Date: 2026-10-17 20:41:08.730126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e9a1c37b2d5'
+down_revision: Union[str, Sequence[str], None] = '3d0b5f82c6e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingested_documents',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('document_name', sa.String(), nullable=True),
+    sa.Column('content_hash', sa.String(), nullable=True),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('pages', sa.Integer(), nullable=True),
+    sa.Column('chunks', sa.Integer(), nullable=True),
+    sa.Column('chunk_ids', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('job_id', sa.String(), nullable=True),
+    sa.Column('timings', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingested_documents_id'), 'ingested_documents', ['id'], unique=False)
+    op.create_index(op.f('ix_ingested_documents_collection_name'), 'ingested_documents', ['collection_name'], unique=False)
+    op.create_index(op.f('ix_ingested_documents_source'), 'ingested_documents', ['source'], unique=False)
+    op.create_index(op.f('ix_ingested_documents_status'), 'ingested_documents', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ingested_documents_status'), table_name='ingested_documents')
+    op.drop_index(op.f('ix_ingested_documents_source'), table_name='ingested_documents')
+    op.drop_index(op.f('ix_ingested_documents_collection_name'), table_name='ingested_documents')
+    op.drop_index(op.f('ix_ingested_documents_id'), table_name='ingested_documents')
+    op.drop_table('ingested_documents')
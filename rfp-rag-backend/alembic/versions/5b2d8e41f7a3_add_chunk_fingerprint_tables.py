@@ -0,0 +1,55 @@
+"""Add chunk fingerprint and ref tables
+
+Revision ID: 5b2d8e41f7a3
+Revises: 4e9a1c37b2d5
+Create Date: 2026-10-17 21:12:44.508193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2d8e41f7a3'
+down_revision: Union[str, Sequence[str], None] = '4e9a1c37b2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chunk_fingerprints',
+    sa.Column('chunk_id', sa.String(), nullable=False),
+    sa.Column('band_key', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=False),
+    sa.Column('simhash', sa.String(length=16), nullable=False),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('page', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('chunk_id', 'band_key')
+    )
+    op.create_index('ix_chunk_fingerprints_collection_band', 'chunk_fingerprints', ['collection_name', 'band_key'], unique=False)
+    op.create_table('chunk_refs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chunk_id', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('page', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_chunk_refs_id'), 'chunk_refs', ['id'], unique=False)
+    op.create_index(op.f('ix_chunk_refs_chunk_id'), 'chunk_refs', ['chunk_id'], unique=False)
+    op.create_index('ix_chunk_refs_collection_source', 'chunk_refs', ['collection_name', 'source'], unique=False)
+    op.add_column('vector_collections', sa.Column('fingerprint_bands', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('vector_collections', 'fingerprint_bands')
+    op.drop_index('ix_chunk_refs_collection_source', table_name='chunk_refs')
+    op.drop_index(op.f('ix_chunk_refs_chunk_id'), table_name='chunk_refs')
+    op.drop_index(op.f('ix_chunk_refs_id'), table_name='chunk_refs')
+    op.drop_table('chunk_refs')
+    op.drop_index('ix_chunk_fingerprints_collection_band', table_name='chunk_fingerprints')
+    op.drop_table('chunk_fingerprints')
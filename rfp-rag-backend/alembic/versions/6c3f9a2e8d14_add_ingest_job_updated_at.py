@@ -0,0 +1,28 @@
+"""Add ingest job updated_at
+
+Revision ID: 6c3f9a2e8d14
+Revises: 5b2d8e41f7a3
+Create Date: 2026-10-17 21:47:19.264318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c3f9a2e8d14'
+down_revision: Union[str, Sequence[str], None] = '5b2d8e41f7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingest_jobs', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingest_jobs', 'updated_at')
@@ -0,0 +1,48 @@
+"""Add ingest jobs table
+
+Revision ID: 7c2e91d4a5b3
+Revises: 3dd8370c503a
+Create Date: 2026-10-17 09:12:44.180233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e91d4a5b3'
+down_revision: Union[str, Sequence[str], None] = '3dd8370c503a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingest_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=True),
+    sa.Column('document_name', sa.String(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('pages', sa.Integer(), nullable=True),
+    sa.Column('chunks_total', sa.Integer(), nullable=True),
+    sa.Column('chunks_embedded', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingest_jobs_id'), 'ingest_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_ingest_jobs_collection_name'), 'ingest_jobs', ['collection_name'], unique=False)
+    op.create_index(op.f('ix_ingest_jobs_status'), 'ingest_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ingest_jobs_status'), table_name='ingest_jobs')
+    op.drop_index(op.f('ix_ingest_jobs_collection_name'), table_name='ingest_jobs')
+    op.drop_index(op.f('ix_ingest_jobs_id'), table_name='ingest_jobs')
+    op.drop_table('ingest_jobs')
@@ -0,0 +1,30 @@
+"""Add embedding cache counters to ingest jobs
+
+Revision ID: b41f0e6c8d27
+Revises: 7c2e91d4a5b3
+Create Date: 2026-10-17 10:03:51.623017
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f0e6c8d27'
+down_revision: Union[str, Sequence[str], None] = '7c2e91d4a5b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingest_jobs', sa.Column('cache_hits', sa.Integer(), nullable=True))
+    op.add_column('ingest_jobs', sa.Column('cache_misses', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingest_jobs', 'cache_misses')
+    op.drop_column('ingest_jobs', 'cache_hits')
@@ -0,0 +1,30 @@
+"""Add replaced document and diff summary to ingest jobs
+
+Revision ID: c8a35d19f2e4
+Revises: b41f0e6c8d27
+Create Date: 2026-10-17 11:26:09.441872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8a35d19f2e4'
+down_revision: Union[str, Sequence[str], None] = 'b41f0e6c8d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingest_jobs', sa.Column('replaces', sa.String(), nullable=True))
+    op.add_column('ingest_jobs', sa.Column('summary', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingest_jobs', 'summary')
+    op.drop_column('ingest_jobs', 'replaces')
@@ -0,0 +1,30 @@
+"""Add batch id to ingest jobs
+
+Revision ID: d5e07b2a9c61
+Revises: c8a35d19f2e4
+Create Date: 2026-10-17 12:48:30.905514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e07b2a9c61'
+down_revision: Union[str, Sequence[str], None] = 'c8a35d19f2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingest_jobs', sa.Column('batch_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_ingest_jobs_batch_id'), 'ingest_jobs', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ingest_jobs_batch_id'), table_name='ingest_jobs')
+    op.drop_column('ingest_jobs', 'batch_id')
@@ -0,0 +1,44 @@
+"""Add document sections table
+
+Revision ID: e3a91c07b6d4
+Revises: d5e07b2a9c61
+Create Date: 2026-10-17 14:05:12.402876
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a91c07b6d4'
+down_revision: Union[str, Sequence[str], None] = 'd5e07b2a9c61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('document_sections',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=True),
+    sa.Column('section_path', sa.Text(), nullable=True),
+    sa.Column('text', sa.Text(), nullable=True),
+    sa.Column('tokens', sa.Integer(), nullable=True),
+    sa.Column('page_start', sa.Integer(), nullable=True),
+    sa.Column('page_end', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_document_sections_id'), 'document_sections', ['id'], unique=False)
+    op.create_index(op.f('ix_document_sections_collection_name'), 'document_sections', ['collection_name'], unique=False)
+    op.create_index(op.f('ix_document_sections_source'), 'document_sections', ['source'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_document_sections_source'), table_name='document_sections')
+    op.drop_index(op.f('ix_document_sections_collection_name'), table_name='document_sections')
+    op.drop_index(op.f('ix_document_sections_id'), table_name='document_sections')
+    op.drop_table('document_sections')
@@ -0,0 +1,28 @@
+"""Add embedding model to rfp projects
+
+Revision ID: f1b7d3a25c80
+Revises: e3a91c07b6d4
+Create Date: 2026-10-17 15:22:41.667310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b7d3a25c80'
+down_revision: Union[str, Sequence[str], None] = 'e3a91c07b6d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rfp_projects', sa.Column('embedding_model', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('rfp_projects', 'embedding_model')
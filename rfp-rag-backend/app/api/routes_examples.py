@@ -3,17 +3,20 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from uuid import UUID
 import os
+import tempfile
 
+import crud, schemas
 from app.deps import get_db
-from app.services.examples import ingest_example_file
+from app.services import vectorstore
+from app.services.ingest_jobs import batch_status, enqueue_example_batch
+from app.services.uploads import save_upload
 from app.models.examples import ProposalExample, ExampleSection
-from app.core.config import DB_DIRECTORY, EXAMPLES_COLLECTION
-from chromadb import PersistentClient
+from app.core.config import EXAMPLES_COLLECTION, EXAMPLES_DIRECTORY
 
 router = APIRouter(prefix="/examples", tags=["examples"])
 
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_examples(
     files: List[UploadFile] = File(...),
     title: Optional[str] = Form(None),
@@ -25,31 +28,50 @@ async def upload_examples(
 ):
     """Upload one or more proposal example files.
 
-    Stores files under EXAMPLES_DIRECTORY, extracts text, slices into sections,
-    and indexes chunks into the Chroma `examples` collection.
+    Stores files under EXAMPLES_DIRECTORY and queues them as one ingest
+    batch: files are extracted and sliced into sections concurrently, and
+    their chunks are indexed into the Chroma `examples` collection in shared
+    batches. Poll `/examples/batches/{batch_id}` for progress.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    created_ids: List[str] = []
-    for f in files:
-        tmp_path = f"/tmp/{f.filename}"
-        # Save to a temporary file first
-        contents = await f.read()
-        with open(tmp_path, "wb") as out:
-            out.write(contents)
+    os.makedirs(EXAMPLES_DIRECTORY, exist_ok=True)
+    saved = []
+    try:
+        for f in files:
+            # a unique name per upload: same-named files (in this or another request) never collide
+            stem, ext = os.path.splitext(os.path.basename(f.filename))
+            fd, path = tempfile.mkstemp(prefix=f"{stem}-", suffix=ext, dir=EXAMPLES_DIRECTORY)
+            os.close(fd)
+            meta = {
+                "title": title or f.filename,
+                "client_type": client_type,
+                "domain": domain,
+                "contract_vehicle": contract_vehicle,
+                "complexity_tier": complexity_tier,
+            }
+            saved.append((path, meta))
+            # Stream straight into EXAMPLES_DIRECTORY (bounded memory, size-limited)
+            await save_upload(f, path)
+    except BaseException:
+        # a rejected file fails the whole request; drop what was already stored
+        for path, _ in saved:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    batch_id, created_ids = enqueue_example_batch(db, saved)
+    return {"example_ids": created_ids, "batch_id": batch_id, "status": "queued"}
 
-        meta = {
-            "title": title or f.filename,
-            "client_type": client_type,
-            "domain": domain,
-            "contract_vehicle": contract_vehicle,
-            "complexity_tier": complexity_tier,
-        }
-        ex_id = ingest_example_file(db, tmp_path, meta)
-        created_ids.append(ex_id)
 
-    return {"example_ids": created_ids}
+@router.get("/batches/{batch_id}", response_model=schemas.IngestBatch)
+def get_example_batch(batch_id: str, db: Session = Depends(get_db)):
+    """Progress of an example upload batch, aggregated over its files."""
+    jobs = [j for j in crud.get_ingest_jobs_for_batch(db, batch_id) if j.collection_name == EXAMPLES_COLLECTION]
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+    return batch_status(batch_id, jobs)
 
 
 @router.get("")
@@ -126,9 +148,8 @@ def delete_example(example_id: str, db: Session = Depends(get_db)):
 
     try:
         # Delete from Chroma collection
-        client = PersistentClient(path=DB_DIRECTORY)
         try:
-            collection = client.get_collection(EXAMPLES_COLLECTION)
+            collection = vectorstore.default_collection(EXAMPLES_COLLECTION)
             # Delete all documents with this example_id
             collection.delete(where={"example_id": example_id})
         except Exception as e:
@@ -13,6 +13,8 @@ from app.models.examples import SectionInstructionRow
 from app.services.instructions import build_instruction
 from app.services.drafting import draft_section as _draft
 from app.services.retrieval import retrieve_project_context
+from app.services.digests import digest_context, digests_ready
+from app.core.config import DIGEST_CONTEXT_TOKENS
 
 router = APIRouter(prefix="/rfps", tags=["sections"])
 
@@ -25,19 +27,25 @@ def generate_instructions(
 ):
     """Generate structured Instruction Sheets for each outline item.
 
-    - Retrieves a few relevant RFP/KB snippets to tailor the guidance
+    - Tailors the guidance with the project's document digests (or, until
+      those are built, a few retrieved RFP/KB snippets)
     - Calls the project-aware LLM to produce a SectionInstruction JSON for each section
     - Persists the resulting JSON rows in `section_instructions` for history/auditing
     """
     if not body.outline:
         raise HTTPException(status_code=400, detail="Outline is empty")
 
-    # Pull context once (lightweight); each instruction is short and schema-validated
-    ctx_snips, _ = retrieve_project_context(project_id, use_kb=body.use_knowledge_base)
+    # Document digests (built after ingest) cover every document; each item sees the
+    # sections closest to its title first. Until they are ready, retrieve once instead.
+    collections = [project_id] + (["knowledge_base"] if body.use_knowledge_base else [])
+    ctx_snips: List[str] = []
+    if not digests_ready(db, collections):
+        ctx_snips, _ = retrieve_project_context(project_id, use_kb=body.use_knowledge_base)
 
     out: List[SectionInstruction] = []
     for item in body.outline:
-        instr = build_instruction(project_id, item.title, item.key, ctx_snips, db)
+        snips = digest_context(db, collections, DIGEST_CONTEXT_TOKENS, focus=item.title) or ctx_snips
+        instr = build_instruction(project_id, item.title, item.key, snips, db)
         out.append(instr)
         db.add(
             SectionInstructionRow(
@@ -17,6 +17,94 @@ db_dir = DB_DIRECTORY  # already defined elsewhere in your config
 EXAMPLES_DIRECTORY = os.getenv("EXAMPLES_DIRECTORY", "./proposal_examples/")
 EXAMPLES_COLLECTION = os.getenv("EXAMPLES_COLLECTION", "examples")
 
+# Background ingestion
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Ingest progress event streams poll job rows at this interval (seconds)
+INGEST_EVENTS_POLL_SECONDS = float(os.getenv("INGEST_EVENTS_POLL_SECONDS", "1.0"))
+# Queued/running jobs get a heartbeat this often; on startup, unfinished jobs
+# without one for INGEST_STALE_SECONDS (their worker died) are marked failed
+INGEST_HEARTBEAT_SECONDS = float(os.getenv("INGEST_HEARTBEAT_SECONDS", "60"))
+INGEST_STALE_SECONDS = int(os.getenv("INGEST_STALE_SECONDS", "600"))
+
+# Embedding backend for new collections: "openai[:<model>]" or "local:<sentence-transformers model>"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "openai")
+# Local (CPU) backend: texts per forward pass and torch intra-op threads
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "64"))
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", str(os.cpu_count() or 1)))
+
+# Embedding writer (chunks per request, requests in flight, retries per batch)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+
+# Content-addressed embedding cache shared by all collections
+EMBED_CACHE_DIRECTORY = os.getenv("EMBED_CACHE_DIRECTORY", "./embedding_cache")
+# Query vectors kept per process (LRU entries; 0 disables) and an optional
+# shared backend behind it: "" (none), "sqlite" (the embedding cache file,
+# shared by all workers) or "package.module:factory" returning an object
+# with get_many(keys) / put_many({key: vector})
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048"))
+QUERY_EMBED_CACHE_BACKEND = os.getenv("QUERY_EMBED_CACHE_BACKEND", "")
+# Extracted page text keyed by file hash + extractor version (empty disables)
+PARSED_TEXT_CACHE_DIRECTORY = os.getenv("PARSED_TEXT_CACHE_DIRECTORY", "./parsed_text_cache")
+
+# Uploads are streamed to disk in chunks; larger files are rejected (HTTP 413)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(250 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Bulk (multi-file / ZIP) uploads: files extracted concurrently, ZIP expansion cap
+BULK_EXTRACT_CONCURRENCY = int(os.getenv("BULK_EXTRACT_CONCURRENCY", "4"))
+BULK_MAX_UNCOMPRESSED_BYTES = int(os.getenv("BULK_MAX_UNCOMPRESSED_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Pages extracted ahead of the splitter/embedder (bounds ingest memory)
+INGEST_PAGE_BUFFER = int(os.getenv("INGEST_PAGE_BUFFER", "32"))
+# Streaming ingest reports page/chunk counts at most this often when nothing is embedded
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("PROGRESS_INTERVAL_SECONDS", "1.0"))
+
+# Chunking targets a token budget (cl100k_base) rather than a character count
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "350"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+
+# PDF text extraction (process pool size, min pages per pool task)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# Default text-extraction backend: "pypdf", "pdfminer" (pdfminer.six) or "pdfium" (pypdfium2)
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pypdf")
+
+# Per-document digests (built in the background after ingest) for outline and
+# instruction generation: model, tokens per section summary / document summary,
+# max input tokens per summarization call, and the digest context budget
+DIGEST_MODEL = os.getenv("DIGEST_MODEL", "gpt-4o-mini")
+DIGEST_WORKERS = int(os.getenv("DIGEST_WORKERS", "1"))
+DIGEST_SECTION_TOKENS = int(os.getenv("DIGEST_SECTION_TOKENS", "80"))
+DIGEST_SUMMARY_TOKENS = int(os.getenv("DIGEST_SUMMARY_TOKENS", "300"))
+DIGEST_INPUT_TOKENS = int(os.getenv("DIGEST_INPUT_TOKENS", "6000"))
+DIGEST_CONTEXT_TOKENS = int(os.getenv("DIGEST_CONTEXT_TOKENS", "6000"))
+
+# Parent-section retrieval: matched chunks are replaced by their enclosing
+# section when that section is at most this many tokens
+PARENT_SECTION_MAX_TOKENS = int(os.getenv("PARENT_SECTION_MAX_TOKENS", "1500"))
+
+# Example sections are sub-chunked for embedding; the examples collection's
+# default embedder (all-MiniLM-L6-v2) truncates input past ~256 word pieces
+EXAMPLE_CHUNK_TOKENS = int(os.getenv("EXAMPLE_CHUNK_TOKENS", "200"))
+EXAMPLE_CHUNK_OVERLAP_TOKENS = int(os.getenv("EXAMPLE_CHUNK_OVERLAP_TOKENS", "30"))
+# Multi-file example uploads: files extracted/sectioned concurrently
+EXAMPLE_INGEST_CONCURRENCY = int(os.getenv("EXAMPLE_INGEST_CONCURRENCY", "4"))
+
+# Logical collection -> physical Chroma collection lookups are cached for
+# this long per process; a re-embed migration keeps the old collection
+# around for at least twice this after switching
+VECTORSTORE_RESOLVE_TTL_SECONDS = float(os.getenv("VECTORSTORE_RESOLVE_TTL_SECONDS", "5"))
+# Re-embed migrations: chunks read per page from the old collection; a
+# migration whose row has not advanced for this long is considered dead
+REEMBED_PAGE_SIZE = int(os.getenv("REEMBED_PAGE_SIZE", "500"))
+MIGRATION_STALE_SECONDS = int(os.getenv("MIGRATION_STALE_SECONDS", "900"))
+
+# Repeated chunks are stored once. 0 collapses only text that is equal up to case
+# and whitespace; a larger SimHash distance (bits) also collapses near-copies whose
+# numbers, negations and modal verbs agree; negative disables
+NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "0"))
+
 # CORS
 origins = [
     "http://localhost:3000",
@@ -1,13 +1,18 @@
 # Auto-generated during refactor (complete blocks)
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import os, shutil, tempfile, traceback, re
+import os, tempfile, traceback, re
 import crud, models, schemas, auth
 from app.deps import get_db
-from app.core.config import PROJECTS_DIRECTORY, DB_DIRECTORY, KNOWLEDGE_BASE_DIRECTORY, APP_ENV
-from app.services.document_service import process_document, sanitize_name_for_directory, num_tokens_from_string
+from app.core.config import PROJECTS_DIRECTORY, KNOWLEDGE_BASE_DIRECTORY, APP_ENV
+from app.services.document_service import process_document, remove_source, sanitize_name_for_directory, num_tokens_from_string
+from app.services.uploads import save_upload
+from app.services import vectorstore
+from app.services.reembed import start_migration, MigrationInProgress
+from app.services.digests import schedule_digest
 
 router = APIRouter()
 
@@ -21,15 +26,18 @@ async def upload_to_knowledge_base(
     file_location = os.path.join(KNOWLEDGE_BASE_DIRECTORY, file.filename)
     
     try:
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-        
-        process_document(file_location, collection_name="knowledge_base")
+        await save_upload(file, file_location)
+
+        # ingest waits on the collection lock and embedding I/O; keep it off the event loop
+        await run_in_threadpool(process_document, file_location, collection_name="knowledge_base")
+        schedule_digest("knowledge_base", os.path.abspath(file_location))
 
         doc_create = schemas.KnowledgeBaseDocumentCreate(document_name=file.filename, description=description)
         crud.create_knowledge_base_document(db, doc_create)
 
         return {"info": f"File '{file.filename}' uploaded to the knowledge base."}
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -39,6 +47,26 @@ async def upload_to_knowledge_base(
 def get_knowledge_base_documents(db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     return crud.get_knowledge_base_documents(db)
 
+# Declared before /knowledge-base/{document_name} so the path is not taken as a document name
+@router.post("/knowledge-base/embedding-migration", response_model=schemas.VectorCollection, status_code=202)
+def migrate_knowledge_base_embeddings(
+    request: schemas.EmbeddingMigrationRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    try:
+        return start_migration(db, "knowledge_base", request.embedding_model)
+    except MigrationInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/knowledge-base/embedding-migration", response_model=schemas.VectorCollection)
+def get_knowledge_base_embedding_migration(db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    vectorstore.resolve("knowledge_base", fresh=True)
+    return crud.get_vector_collection(db, "knowledge_base")
+
 # FIX: Corrected the download endpoint path
 
 
@@ -59,9 +87,7 @@ async def delete_knowledge_base_document(document_name: str, db: Session = Depen
     file_path_to_delete = os.path.join(KNOWLEDGE_BASE_DIRECTORY, clean_document_name)
 
     try:
-        client = chromadb.PersistentClient(path=DB_DIRECTORY)
-        collection = client.get_collection(name="knowledge_base")
-        collection.delete(where={"source": os.path.join(KNOWLEDGE_BASE_DIRECTORY, document_name)})
+        remove_source("knowledge_base", file_path_to_delete)
         print(f"Deleted vectors for source: {document_name}")
     except Exception as e:
         print(f"Could not delete vectors for {document_name}: {e}")
@@ -1,24 +1,39 @@
 # Auto-generated (restored behavior + improved RAG + model registry + safe caps + outline/section + save/load)
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Set, Dict, Any
-import os, shutil, json, time, traceback
+import os, shutil, json, time, traceback, asyncio, tempfile
 import crud, models, schemas, auth
 from app.deps import get_db
-from app.core.config import PROJECTS_DIRECTORY, DB_DIRECTORY
+from app.core.config import (
+    PROJECTS_DIRECTORY, PARENT_SECTION_MAX_TOKENS, INGEST_EVENTS_POLL_SECONDS, DIGEST_CONTEXT_TOKENS,
+)
 from app.services.document_service import (
-    process_document,
+    collection_embeddings,
+    ensure_collection,
+    record_document,
+    register_existing_files,
+    remove_source,
     sanitize_name_for_directory,
     num_tokens_from_string,
 )
+from app.services.ingest_jobs import enqueue_document, enqueue_batch, batch_status, snapshot_events, FINISHED
+from app.services.uploads import save_upload, stage_zip, unique_path
+from app.services.embeddings import normalize_spec
+from app.services.pdf_extract import available_extractors, normalize_extractor
+from app.services import vectorstore
+from app.services.digests import digest_context
+from app.services.retrieval import multi_query_mmr
+from app.services.requirements import REQUIREMENTS_FUNCTION, match_requirements, requirement_documents
+from app.services.reembed import start_migration, MigrationInProgress
+from fastapi.concurrency import run_in_threadpool
 
 # Retrieval / LLM deps
 from sentence_transformers import CrossEncoder
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
-import chromadb
+from langchain_core.documents import Document
 
 router = APIRouter()
 
@@ -59,23 +74,120 @@ def _caps_for_model(model_name: str):
 def list_models():
     return list(MODEL_REGISTRY.values())
 
+@router.get("/pdf-extractors")
+def list_pdf_extractors():
+    return {"default": normalize_extractor(None), "available": available_extractors()}
+
 # --- Cross-encoder reranker ---
 rerank_model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
 
-def calc_max_output_tokens(prompt_text: str, model_name: str, safety_margin: int = 2000, target_min: int = 3000) -> int:
+def calc_max_output_tokens(
+    prompt_text: str,
+    model_name: str,
+    safety_margin: int = 2000,
+    target_min: int = 3000,
+    prompt_tokens: Optional[int] = None,
+) -> int:
     caps = _caps_for_model(model_name)
     ctx = caps["context_tokens"]
     max_out_cap = caps["max_completion_tokens"]
-    prompt_tokens = num_tokens_from_string(prompt_text, "cl100k_base")
+    if prompt_tokens is None:
+        prompt_tokens = num_tokens_from_string(prompt_text, "cl100k_base")
     available = max(1024, ctx - prompt_tokens - safety_margin)
     return min(max(target_min, min(available, max_out_cap)), max_out_cap)
 
-def build_retriever(collection_name: str, embeddings, k: int = 50, use_mmr: bool = True):
-    vectordb = Chroma(
-        persist_directory=DB_DIRECTORY,
-        embedding_function=embeddings,
-        collection_name=collection_name,
+# Context budgets per project context_size: max chunks and max context tokens
+CONTEXT_TOP_K = {"low": 10, "medium": 15, "high": 20}
+CONTEXT_TOKEN_BUDGET = {"low": 4000, "medium": 6000, "high": 8000}
+# The requirements prompt function reads the whole requirement index, up to this many tokens
+REQUIREMENTS_CONTEXT_TOKENS = 24000
+# Allowance for the fixed instruction text wrapped around each prompt
+PROMPT_TEMPLATE_TOKENS = 250
+
+def _doc_tokens(doc) -> int:
+    """Stored token count from ingest; encodes only legacy chunks without one."""
+    tokens = (doc.metadata or {}).get("tokens")
+    return int(tokens) if tokens is not None else num_tokens_from_string(doc.page_content)
+
+def _prompt_tokens(docs, *parts: str) -> int:
+    """Prompt size from stored chunk counts plus the (small) non-context parts."""
+    return sum(_doc_tokens(d) for d in docs) + num_tokens_from_string("\n".join(parts)) + PROMPT_TEMPLATE_TOKENS
+
+def _select_context(reranked_docs, kb_docs, context_size: str):
+    """Take reranked docs until the chunk or token budget is reached; keep a minimum share of RFP chunks."""
+    top_k = CONTEXT_TOP_K.get(context_size, 15)
+    budget = CONTEXT_TOKEN_BUDGET.get(context_size, 6000)
+    project_final, kb_final = [], []
+    used = 0
+    for doc in reranked_docs:
+        tokens = _doc_tokens(doc)
+        if used + tokens > budget and (project_final or kb_final):
+            break
+        (kb_final if doc in kb_docs else project_final).append(doc)
+        used += tokens
+        if len(project_final) + len(kb_final) >= top_k:
+            break
+    min_rfp = max(3, top_k // 3)
+    if len(project_final) < min_rfp and kb_final:
+        needed = min_rfp - len(project_final)
+        move = kb_final[:needed]
+        project_final.extend(move)
+        kb_final = kb_final[needed:]
+    return project_final, kb_final
+
+def _section_unit(section) -> Document:
+    header = f"[{section.section_path}]"
+    return Document(
+        page_content=f"{header}\n{section.text}",
+        metadata={
+            "source": section.source,
+            "page": section.page_start,
+            "section_path": section.section_path,
+            "parent_id": section.id,
+            "tokens": (section.tokens or 0) + num_tokens_from_string(header) + 1,
+        },
     )
+
+def _expand_to_sections(db: Session, project_final, kb_final, context_size: str):
+    """Replace matched chunks by their enclosing section, once per section.
+
+    Sections over PARENT_SECTION_MAX_TOKENS (or that no longer fit the
+    budget) keep the matched chunk instead; chunks ingested before section
+    detection have no parent_id and pass through unchanged.
+    """
+    budget = CONTEXT_TOKEN_BUDGET.get(context_size, 6000)
+    parent_ids = {(d.metadata or {}).get("parent_id") for d in project_final + kb_final} - {None}
+    sections = {s.id: s for s in crud.get_document_sections(db, list(parent_ids))}
+    seen: Set[str] = set()
+    used = 0
+
+    def _units(docs):
+        nonlocal used
+        out = []
+        for doc in docs:
+            pid = (doc.metadata or {}).get("parent_id")
+            if pid in seen:
+                continue
+            section = sections.get(pid)
+            candidates = [doc]
+            if section is not None and (section.tokens or 0) <= PARENT_SECTION_MAX_TOKENS:
+                candidates.insert(0, _section_unit(section))
+            for unit in candidates:
+                tokens = _doc_tokens(unit)
+                if used and used + tokens > budget:
+                    continue
+                out.append(unit)
+                used += tokens
+                if unit is not doc:
+                    seen.add(pid)
+                break
+        return out
+
+    return _units(project_final), _units(kb_final)
+
+def build_retriever(collection_name: str, embeddings, k: int = 50, use_mmr: bool = True):
+    # kept per process (see vectorstore.langchain_store); no client/collection setup per call
+    vectordb = vectorstore.langchain_store(collection_name, embeddings)
     if use_mmr:
         return vectordb.as_retriever(search_type="mmr", search_kwargs={"k": k, "lambda_mult": 0.5})
     return vectordb.as_retriever(search_kwargs={"k": k})
@@ -113,8 +225,24 @@ def create_rfp_project(
     db_project = crud.get_project_by_project_id(db, project_id=project_id)
     if db_project:
         raise HTTPException(status_code=400, detail=f"Project '{project.name}' already exists for this user.")
+    embedding_model = None
+    if project.embedding_model:
+        try:
+            embedding_model = normalize_spec(project.embedding_model)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    pdf_extractor = None
+    if project.pdf_extractor:
+        try:
+            pdf_extractor = normalize_extractor(project.pdf_extractor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     os.makedirs(os.path.join(PROJECTS_DIRECTORY, project_id), exist_ok=True)
-    project_create = schemas.RfpProjectCreate(name=project.name, project_id=project_id)
+    # Create the collection now so it records the project's embedding model
+    ensure_collection(project_id, embedding_model)
+    project_create = schemas.RfpProjectCreate(
+        name=project.name, project_id=project_id, embedding_model=embedding_model, pdf_extractor=pdf_extractor
+    )
     return crud.create_rfp_project(db=db, project=project_create, user_id=current_user.id)
 
 @router.get("/rfps/", response_model=List[schemas.RfpProject])
@@ -126,30 +254,287 @@ def get_rfp_projects(
 ):
     return crud.get_projects_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
 
-@router.post("/rfps/{project_id}/upload/")
+@router.post("/rfps/{project_id}/upload/", status_code=202)
 async def upload_to_project(
     project_id: str,
     file: UploadFile = File(...),
+    replaces: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user),
 ):
+    """
+    Save a document and queue it for ingestion.
+    Re-uploading an existing filename, or passing `replaces` (name of the
+    document this one supersedes, e.g. the RFP before Amendment 0003),
+    re-embeds only the changed chunks; the job's `summary` lists changed pages.
+    """
     db_project = crud.get_project_by_project_id(db, project_id)
     if not db_project or db_project.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="RFP project not found.")
     project_path = os.path.join(PROJECTS_DIRECTORY, project_id)
     os.makedirs(project_path, exist_ok=True)
+    # projects from before the document registry: list their files first
+    register_existing_files(project_id, project_path)
     file_location = os.path.join(project_path, file.filename)
+    replaces_location = None
+    if replaces:
+        replaces_location = os.path.join(project_path, os.path.basename(replaces))
+        if not os.path.isfile(replaces_location):
+            raise HTTPException(status_code=404, detail=f"Document to replace not found: {replaces}")
     try:
-        with open(file_location, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        size, sha256 = await save_upload(file, file_location)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
+    # Ingestion (extract/split/embed) runs in the background; poll the job for status
+    job = enqueue_document(
+        db, file_location, collection_name=project_id, document_name=file.filename, replaces=replaces_location
+    )
+    return {"filename": file.filename, "status": job.status, "job_id": job.id, "size": size, "sha256": sha256}
+
+@router.post("/rfps/{project_id}/upload-bulk/", status_code=202)
+async def upload_bulk_to_project(
+    project_id: str,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """
+    Upload a whole solicitation package: many files and/or ZIP archives.
+    ZIPs are flattened into the project folder; every PDF is ingested in one
+    pipelined batch (parallel extraction, shared embedding batches).
+    Non-PDF files are skipped and reported.
+    """
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided.")
+    project_path = os.path.join(PROJECTS_DIRECTORY, project_id)
+    os.makedirs(project_path, exist_ok=True)
+    register_existing_files(project_id, project_path)
+
+    # Everything lands in a staging dir first and is moved into the project only
+    # once the whole request arrived, so a bad file or archive leaves nothing behind.
+    # One `taken` set spans the request: no two uploads end up on the same path.
+    taken: Set[str] = set()
+    staged: List[tuple] = []
+    staging = tempfile.mkdtemp(prefix=".upload-", dir=project_path)
     try:
-        process_document(file_location, collection_name=project_id)
+        for i, f in enumerate(files):
+            name = os.path.basename(f.filename)
+            if name.lower().endswith(".zip"):
+                archive = os.path.join(staging, f".archive-{i}.zip")
+                await save_upload(f, archive)
+                staged.extend(await run_in_threadpool(stage_zip, archive, project_path, staging, taken))
+                os.remove(archive)
+            else:
+                target = unique_path(project_path, name, taken)
+                tmp = os.path.join(staging, os.path.basename(target))
+                await save_upload(f, tmp)
+                staged.append((tmp, target))
+        saved: List[str] = []
+        for tmp, target in staged:
+            os.replace(tmp, target)
+            saved.append(target)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Processing error: {e}")
-    return {"filename": file.filename, "status": "uploaded"}
+        raise HTTPException(status_code=500, detail=f"Failed to save files: {e}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    to_ingest, skipped = [], []
+    for path in saved:
+        if path.lower().endswith(".pdf"):
+            to_ingest.append((path, os.path.basename(path)))
+        else:
+            skipped.append(os.path.basename(path))
+            os.remove(path)
+    if not to_ingest:
+        raise HTTPException(status_code=400, detail="No PDF documents found in upload.")
+
+    batch_id = enqueue_batch(db, to_ingest, collection_name=project_id)
+    return {
+        "batch_id": batch_id,
+        "status": "queued",
+        "documents": [name for _, name in to_ingest],
+        "skipped": skipped,
+    }
+
+@router.get("/rfps/{project_id}/ingest-batches/{batch_id}", response_model=schemas.IngestBatch)
+def get_ingest_batch(
+    project_id: str,
+    batch_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    jobs = [j for j in crud.get_ingest_jobs_for_batch(db, batch_id) if j.collection_name == project_id]
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Ingest batch not found.")
+    return batch_status(batch_id, jobs)
+
+@router.get("/rfps/{project_id}/ingest-jobs/", response_model=List[schemas.IngestJob])
+def list_ingest_jobs(
+    project_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    return crud.get_ingest_jobs_for_collection(db, collection_name=project_id)
+
+@router.get("/rfps/{project_id}/ingest-jobs/{job_id}", response_model=schemas.IngestJob)
+def get_ingest_job(
+    project_id: str,
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    job = crud.get_ingest_job(db, job_id)
+    if not job or job.collection_name != project_id:
+        raise HTTPException(status_code=404, detail="Ingest job not found.")
+    return job
+
+@router.post("/rfps/{project_id}/embedding-migration", response_model=schemas.VectorCollection, status_code=202)
+def migrate_project_embeddings(
+    project_id: str,
+    request: schemas.EmbeddingMigrationRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """Re-embed the project's collection with another model in the background.
+    Queries keep using the current model until the new collection is complete."""
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    try:
+        return start_migration(db, project_id, request.embedding_model)
+    except MigrationInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/rfps/{project_id}/embedding-migration", response_model=schemas.VectorCollection)
+def get_project_embedding_migration(
+    project_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    vectorstore.resolve(project_id, fresh=True)
+    return crud.get_vector_collection(db, project_id)
+
+@router.get("/rfps/{project_id}/digests", response_model=List[schemas.DocumentDigest])
+def list_document_digests(
+    project_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """Background-built digests of the project's documents (any status)."""
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    return crud.get_document_digests(db, [project_id])
+
+@router.get("/rfps/{project_id}/requirements", response_model=List[schemas.RequirementStatement])
+def list_requirements(
+    project_id: str,
+    kind: Optional[str] = Query(None, description="evaluation | shall | must | required | reference"),
+    section: Optional[str] = Query(None, description="Uniform contract section letter, e.g. L or M"),
+    q: Optional[str] = Query(None, description="Rank by similarity to this text instead of document order"),
+    limit: int = Query(0, ge=0, description="Max rows (0 = all; default 20 with q)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """Requirement statements indexed at ingest (the complete set, in document order)."""
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    if q:
+        matches = match_requirements(db, project_id, [q], k=limit or 20, kind=kind, section=section)[0]
+        return [m["requirement"] for m in matches]
+    rows = crud.get_requirement_statements(db, project_id, kind=kind, section=section)
+    return rows[:limit] if limit else rows
+
+@router.post("/rfps/{project_id}/requirements/match", response_model=List[schemas.RequirementMatch])
+def match_project_requirements(
+    project_id: str,
+    request: schemas.RequirementMatchRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """Closest indexed requirements for each checklist / compliance-matrix item."""
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    matches = match_requirements(db, project_id, request.items, k=request.k, kind=request.kind, section=request.section)
+    return [{"item": item, "matches": m} for item, m in zip(request.items, matches)]
+
+# Comment line every ~15s keeps proxies from closing an idle stream
+SSE_HEARTBEAT_SECONDS = 15
+
+@router.get("/rfps/{project_id}/ingest-events")
+async def stream_ingest_events(
+    project_id: str,
+    request: Request,
+    job_id: Optional[str] = Query(None),
+    batch_id: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """
+    Server-sent events with per-document ingest progress: one event whenever
+    a job changes stage or counters (extracted N pages, split into M chunks,
+    embedded K/M, written). The event name is the job status.
+
+    Without filters the stream follows the project's recent jobs until the
+    client disconnects; with `job_id` or `batch_id` it ends (event "end")
+    once those jobs are finished. Progress is read from the job rows, so
+    any worker can serve the stream.
+    """
+    db_project = crud.get_project_by_project_id(db, project_id)
+    if not db_project or db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="RFP project not found.")
+    # Release the request's connection now; polls use their own short sessions
+    db.close()
+
+    async def _events():
+        last: Dict[str, tuple] = {}
+        quiet = 0.0
+        while not await request.is_disconnected():
+            events = await run_in_threadpool(snapshot_events, project_id, job_id, batch_id)
+            sent = False
+            for ev in reversed(events):  # oldest job first
+                key = (ev["status"], ev["pages"], ev["chunks_total"], ev["chunks_embedded"])
+                if last.get(ev["job_id"]) != key:
+                    last[ev["job_id"]] = key
+                    sent = True
+                    yield f"event: {ev['status']}\ndata: {json.dumps(ev, default=str)}\n\n"
+            if (job_id or batch_id) and events and all(ev["status"] in FINISHED for ev in events):
+                yield "event: end\ndata: {}\n\n"
+                return
+            quiet = 0.0 if sent else quiet + INGEST_EVENTS_POLL_SECONDS
+            if quiet >= SSE_HEARTBEAT_SECONDS:
+                quiet = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(INGEST_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/rfps/{project_id}/documents/")
 def list_project_documents(
@@ -160,14 +545,23 @@ def list_project_documents(
     db_project = crud.get_project_by_project_id(db, project_id)
     if not db_project or db_project.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="RFP project not found.")
-    project_path = os.path.join(PROJECTS_DIRECTORY, project_id)
-    documents = []
-    if os.path.isdir(project_path):
-        for fname in os.listdir(project_path):
-            fpath = os.path.join(PROJECTS_DIRECTORY, project_id, fname)
-            if os.path.isfile(fpath):
-                documents.append({"name": fname, "status": "Processed"})
-    return documents
+    rows = crud.get_ingested_documents(db, project_id)
+    if not rows and register_existing_files(project_id, os.path.join(PROJECTS_DIRECTORY, project_id)):
+        rows = crud.get_ingested_documents(db, project_id)
+    return [
+        {
+            "name": row.document_name,
+            "status": "Processed" if row.status == "done" else row.status.capitalize(),
+            "job_id": row.job_id,
+            "error": row.error,
+            "pages": row.pages,
+            "chunks": row.chunks,
+            "size_bytes": row.size_bytes,
+            "content_hash": row.content_hash,
+            "finished_at": row.finished_at,
+        }
+        for row in rows
+    ]
 
 @router.get("/rfps/{project_id}/documents/{document_name}")
 def get_project_document(
@@ -197,11 +591,13 @@ def delete_project_document(
         raise HTTPException(status_code=404, detail="RFP project not found.")
     file_path_to_delete = os.path.join(PROJECTS_DIRECTORY, project_id, document_name)
     try:
-        client = chromadb.PersistentClient(path=DB_DIRECTORY)
-        collection = client.get_collection(name=project_id)
-        collection.delete(where={"source": file_path_to_delete})
-    except Exception:
-        pass
+        # drops the registry row once its vectors are gone
+        remove_source(project_id, file_path_to_delete)
+    except Exception as e:
+        logger.error("Deleting %s from '%s' failed:\n%s", document_name, project_id, traceback.format_exc())
+        # keep file and registry row, so the document stays listed and a retry can clean up
+        record_document(project_id, file_path_to_delete, status="failed", error=f"Delete failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete document: {e}")
     try:
         if os.path.isfile(file_path_to_delete):
             os.remove(file_path_to_delete)
@@ -212,7 +608,6 @@ def delete_project_document(
 # app/routers/rfp_routes.py
 import os, shutil, stat, logging
 from fastapi import HTTPException
-import chromadb
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -243,24 +638,23 @@ def delete_project(
             raise HTTPException(status_code=404, detail="RFP project not found.")
         steps.append("project_loaded")
 
-        # 1) Best-effort: remove Chroma collection
+        # 1) Best-effort: remove Chroma collection(s), including any migration copy
         try:
-            client = chromadb.PersistentClient(path=DB_DIRECTORY)
-            try:
-                coll = client.get_collection(name=project_id)
-                try:
-                    coll.delete(where={})
-                except Exception:
-                    pass
-                try:
-                    client.delete_collection(name=project_id)
-                except Exception:
-                    pass
+            if vectorstore.drop(project_id):
                 steps.append("chroma_deleted")
-            except Exception as e:
-                steps.append(f"chroma_not_found_or_error:{e}")
+            else:
+                steps.append("chroma_not_found")
         except Exception as e:
             steps.append(f"chroma_client_error:{e}")
+        try:
+            crud.delete_document_sections(db, project_id)
+            crud.delete_requirement_statements(db, project_id)
+            crud.delete_document_digests(db, project_id)
+            crud.delete_ingested_documents(db, project_id)
+            crud.delete_chunk_fingerprints(db, project_id)
+            steps.append("sections_deleted")
+        except Exception as e:
+            steps.append(f"sections_error:{e}")
 
         # 2) Best-effort: delete project folder (Windows-safe)
         project_path = os.path.join(PROJECTS_DIRECTORY, project_id)
@@ -341,6 +735,7 @@ def get_settings(
         model_name=db_project.model_name,
         temperature=db_project.temperature,
         context_size=db_project.context_size,
+        pdf_extractor=db_project.pdf_extractor,
     )
 
 @router.post("/rfps/{project_id}/settings", response_model=schemas.RfpProject)
@@ -350,6 +745,11 @@ def update_settings(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user),
 ):
+    if settings.pdf_extractor is not None:
+        try:
+            settings.pdf_extractor = normalize_extractor(settings.pdf_extractor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     db_project = crud.update_settings(db, project_id, settings, user_id=current_user.id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -418,6 +818,7 @@ async def query_project(
     if not db_project or db_project.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="RFP project not found.")
 
+    prompt_function = None
     if request.prompt_function_id:
         prompt_function = crud.get_prompt_function(db, function_id=request.prompt_function_id)
         if not prompt_function:
@@ -433,57 +834,51 @@ async def query_project(
     try:
         crud.create_chat_message(db, message=schemas.ChatMessageCreate(message_type="query", text=user_message_text), project_id=db_project.id)
 
-        embeddings = OpenAIEmbeddings()
-        planner_llm = ChatOpenAI(model_name=db_project.model_name, temperature=0.1, max_tokens=400)
+        # Requirement listings read the complete index built at ingest instead of
+        # top-k chunks: nothing is missed and no query expansion/retrieval runs
+        requirement_docs = []
+        if prompt_function is not None and prompt_function.function_name == REQUIREMENTS_FUNCTION:
+            requirement_docs = requirement_documents(db, project_id, REQUIREMENTS_CONTEXT_TOKENS)
+        if requirement_docs:
+            project_final, kb_final = requirement_docs, []
+        else:
+            planner_llm = ChatOpenAI(model_name=db_project.model_name, temperature=0.1, max_tokens=400)
 
-        queries = expand_queries(query_text, planner_llm, n=3)
+            queries = expand_queries(query_text, planner_llm, n=3)
 
-        project_docs_all, kb_docs_all = [], []
-        for q in queries:
-            proj_ret = build_retriever(project_id, embeddings, k=50, use_mmr=True)
-            project_docs_all.extend(proj_ret.get_relevant_documents(q))
+            # One embedding call for all variants, one search per collection
+            query_vectors = {}
+            project_docs_all = multi_query_mmr(project_id, queries, k=50, vectors=query_vectors)
+            kb_docs_all = []
             if request.use_knowledge_base:
                 try:
-                    kb_ret = build_retriever("knowledge_base", embeddings, k=50, use_mmr=True)
-                    kb_docs_all.extend(kb_ret.get_relevant_documents(q))
+                    kb_docs_all = multi_query_mmr("knowledge_base", queries, k=50, vectors=query_vectors)
                 except Exception:
                     pass
 
-        def unique_docs(docs):
-            seen = set()
-            uniq = []
-            for d in docs:
-                key = (d.page_content, d.metadata.get("source"), d.metadata.get("page"))
-                if key not in seen:
-                    uniq.append(d)
-                    seen.add(key)
-            return uniq
-
-        project_docs = unique_docs(project_docs_all)
-        kb_docs = unique_docs(kb_docs_all)
-
-        all_docs = project_docs + kb_docs
-        if all_docs:
-            pairs = [[query_text, d.page_content] for d in all_docs]
-            scores = rerank_model.predict(pairs)
-            reranked_docs = [doc for _, doc in sorted(zip(scores, all_docs), key=lambda x: x[0], reverse=True)]
-        else:
-            reranked_docs = []
-
-        context_size_map = {"low": 10, "medium": 15, "high": 20}
-        top_k = context_size_map.get(db_project.context_size, 15)
-
-        project_final, kb_final = [], []
-        for doc in reranked_docs:
-            (kb_final if doc in kb_docs else project_final).append(doc)
-            if len(project_final) + len(kb_final) >= top_k:
-                break
-        min_rfp = max(3, top_k // 3)
-        if len(project_final) < min_rfp and kb_final:
-            needed = min_rfp - len(project_final)
-            move = kb_final[:needed]
-            project_final.extend(move)
-            kb_final = kb_final[needed:]
+            def unique_docs(docs):
+                seen = set()
+                uniq = []
+                for d in docs:
+                    key = (d.page_content, d.metadata.get("source"), d.metadata.get("page"))
+                    if key not in seen:
+                        uniq.append(d)
+                        seen.add(key)
+                return uniq
+
+            project_docs = unique_docs(project_docs_all)
+            kb_docs = unique_docs(kb_docs_all)
+
+            all_docs = project_docs + kb_docs
+            if all_docs:
+                pairs = [[query_text, d.page_content] for d in all_docs]
+                scores = rerank_model.predict(pairs)
+                reranked_docs = [doc for _, doc in sorted(zip(scores, all_docs), key=lambda x: x[0], reverse=True)]
+            else:
+                reranked_docs = []
+
+            project_final, kb_final = _select_context(reranked_docs, kb_docs, db_project.context_size)
+            project_final, kb_final = _expand_to_sections(db, project_final, kb_final, db_project.context_size)
 
         project_context = "\n".join(d.page_content for d in project_final)
         knowledge_base_context = "\n".join(d.page_content for d in kb_final)
@@ -533,7 +928,10 @@ async def query_project(
 - Aim for at least 1,000–2,000 words if the question warrants it.
 **RESPONSE:**"""
 
-        max_out = calc_max_output_tokens(prompt_text, model_name=db_project.model_name, safety_margin=2000, target_min=3000)
+        prompt_tokens = _prompt_tokens(project_final + kb_final, db_project.system_prompt, chat_history_tuples, query_text)
+        max_out = calc_max_output_tokens(
+            prompt_text, model_name=db_project.model_name, safety_margin=2000, target_min=3000, prompt_tokens=prompt_tokens
+        )
         llm = ChatOpenAI(model_name=db_project.model_name, temperature=db_project.temperature, max_tokens=max_out)
         result = llm.invoke([HumanMessage(content=prompt_text)])
         answer_text = result.content if hasattr(result, "content") else str(result)
@@ -559,19 +957,25 @@ async def proposal_outline(
         raise HTTPException(status_code=404, detail="RFP project not found.")
 
     base_topic = request.query or "Draft a comprehensive proposal"
-    embeddings = OpenAIEmbeddings()
     planner_llm = ChatOpenAI(model_name=db_project.model_name, temperature=0.1, max_tokens=800)
 
-    proj_ret = build_retriever(project_id, embeddings, k=30, use_mmr=True)
-    proj_docs = proj_ret.get_relevant_documents(base_topic)
-    kb_docs = []
-    if request.use_knowledge_base:
-        try:
-            kb_ret = build_retriever("knowledge_base", embeddings, k=30, use_mmr=True)
-            kb_docs = kb_ret.get_relevant_documents(base_topic)
-        except Exception:
-            pass
-    context_outline = "\n".join(d.page_content for d in (proj_docs + kb_docs)[:12])
+    # Precomputed document digests cover the whole package; retrieve only until they are ready
+    collections = [project_id] + (["knowledge_base"] if request.use_knowledge_base else [])
+    digests = digest_context(db, collections, DIGEST_CONTEXT_TOKENS, focus=base_topic)
+    if digests:
+        context_outline = "\n\n".join(digests)
+    else:
+        proj_emb = collection_embeddings(project_id)
+        proj_ret = build_retriever(project_id, proj_emb, k=30, use_mmr=True)
+        proj_docs = proj_ret.get_relevant_documents(base_topic)
+        kb_docs = []
+        if request.use_knowledge_base:
+            try:
+                kb_ret = build_retriever("knowledge_base", collection_embeddings("knowledge_base"), k=30, use_mmr=True)
+                kb_docs = kb_ret.get_relevant_documents(base_topic)
+            except Exception:
+                pass
+        context_outline = "\n".join(d.page_content for d in (proj_docs + kb_docs)[:12])
 
     outline_prompt = f"""{db_project.system_prompt}
 
@@ -620,23 +1024,21 @@ async def proposal_section(
         raise HTTPException(status_code=404, detail="RFP project not found.")
 
     topic = query or "Draft a comprehensive proposal"
-    embeddings = OpenAIEmbeddings()
     planner_llm = ChatOpenAI(model_name=db_project.model_name, temperature=0.1, max_tokens=400)
 
     # Multi-query expansion around the section
     section_query_base = f"{topic} :: Section: {section_title}"
     q_variants = expand_queries(section_query_base, planner_llm, n=3)
 
-    proj_cands, kb_cands = [], []
-    for q in q_variants:
-        proj_ret = build_retriever(project_id, embeddings, k=50, use_mmr=True)
-        proj_cands.extend(proj_ret.get_relevant_documents(q))
-        if use_knowledge_base:
-            try:
-                kb_ret = build_retriever("knowledge_base", embeddings, k=50, use_mmr=True)
-                kb_cands.extend(kb_ret.get_relevant_documents(q))
-            except Exception:
-                pass
+    # One embedding call for all variants, one search per collection
+    query_vectors = {}
+    proj_cands = multi_query_mmr(project_id, q_variants, k=50, vectors=query_vectors)
+    kb_cands = []
+    if use_knowledge_base:
+        try:
+            kb_cands = multi_query_mmr("knowledge_base", q_variants, k=50, vectors=query_vectors)
+        except Exception:
+            pass
 
     def unique_docs(docs):
         seen = set()
@@ -659,20 +1061,8 @@ async def proposal_section(
     else:
         reranked = []
 
-    context_size_map = {"low": 10, "medium": 15, "high": 20}
-    top_k = context_size_map.get(db_project.context_size, 15)
-
-    proj_final, kb_final = [], []
-    for d in reranked:
-        (kb_final if d in kb_docs else proj_final).append(d)
-        if len(proj_final) + len(kb_final) >= top_k:
-            break
-    min_rfp = max(3, top_k // 3)
-    if len(proj_final) < min_rfp and kb_final:
-        needed = min_rfp - len(proj_final)
-        move = kb_final[:needed]
-        proj_final.extend(move)
-        kb_final = kb_final[needed:]
+    proj_final, kb_final = _select_context(reranked, kb_docs, db_project.context_size)
+    proj_final, kb_final = _expand_to_sections(db, proj_final, kb_final, db_project.context_size)
 
     proj_ctx = "\n".join(d.page_content for d in proj_final)
     kb_ctx = "\n".join(d.page_content for d in kb_final)
@@ -698,7 +1088,10 @@ async def proposal_section(
 Return valid HTML that can be displayed inside a rich text editor without additional post-processing.
 Use <h3>, <h4>, <p>, <ul>, <ol>, <table>, <thead>, <tbody>, <tr>, <th>, <td> tags appropriately.
 """
-    max_out = calc_max_output_tokens(section_prompt, model_name=db_project.model_name, safety_margin=2000, target_min=1200)
+    prompt_tokens = _prompt_tokens(proj_final + kb_final, db_project.system_prompt, section_title)
+    max_out = calc_max_output_tokens(
+        section_prompt, model_name=db_project.model_name, safety_margin=2000, target_min=1200, prompt_tokens=prompt_tokens
+    )
     section_llm = ChatOpenAI(model_name=db_project.model_name, temperature=db_project.temperature, max_tokens=max_out)
     res = section_llm.invoke([HumanMessage(content=section_prompt)])
     html = res.content if hasattr(res, "content") else str(res)
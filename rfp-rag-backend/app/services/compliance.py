@@ -13,10 +13,13 @@ Notes
   that surfaces likely gaps for a human to verify.
 - You can later extend this with an LLM justification step (e.g., explain
   where/how the requirement is addressed) without changing the return shape.
+- Callers may pass the RFP requirement each item was matched to (from the
+  requirement index built at ingest); it is returned as `requirement` so the
+  result doubles as a compliance-matrix row with page/section citations.
 """
 from __future__ import annotations
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 import re
 from bs4 import BeautifulSoup
 
@@ -31,8 +34,11 @@ def _tokens(line: str) -> List[str]:
     return re.findall(r"[a-zA-Z0-9]+", (line or "").lower())
 
 
-def check_compliance(html: str, checklist: List[str]) -> List[Dict[str, object]]:
-    """Return a list of {item, met, method} dicts.
+def check_compliance(
+    html: str, checklist: List[str], requirements: Optional[List[Optional[dict]]] = None
+) -> List[Dict[str, object]]:
+    """Return a list of {item, met, method} dicts (plus `requirement` when
+    `requirements`, parallel to `checklist`, has a match for the item).
 
     Heuristic: take up to the first 6 non-trivial tokens from each item
     (>=3 chars) and require that all are present in the draft text.
@@ -40,9 +46,12 @@ def check_compliance(html: str, checklist: List[str]) -> List[Dict[str, object]]
     text = _to_text(html)
     out: List[Dict[str, object]] = []
 
-    for item in checklist or []:
+    for i, item in enumerate(checklist or []):
         toks = [t for t in _tokens(item) if len(t) >= 3][:6]
         met = bool(toks) and all(t in text for t in toks)
-        out.append({"item": item, "met": met, "method": "keyword"})
+        row: Dict[str, object] = {"item": item, "met": met, "method": "keyword"}
+        if requirements and i < len(requirements) and requirements[i]:
+            row["requirement"] = requirements[i]
+        out.append(row)
 
     return out
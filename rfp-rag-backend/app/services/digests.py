@@ -0,0 +1,286 @@
+"""Per-document digests, built in the background after ingest.
+
+Outline and instruction generation used to run a fresh MMR retrieval per
+call and show the planner a dozen raw excerpts, so they were slow, costly
+and blind to most of the solicitation. Instead, each ingested document gets
+a compact digest, stored in `document_digests`:
+
+- sections: every detected section (path, pages) with a one- or two-line
+  summary of at most DIGEST_SECTION_TOKENS
+- evaluation_factors: evaluation statements from the requirement index
+  (kind "evaluation" or found in Section M); no LLM involved
+- summary: a document summary of at most DIGEST_SUMMARY_TOKENS, written
+  from the section summaries
+
+`digest_context` packs the digests of one or more collections into a
+token-bounded context covering the whole document set.
+
+Notes
+- Digests are keyed by (collection, source) and carry a hash of the text
+  they were built from; re-ingesting an unchanged document is a no-op.
+- Documents without detected headings are summarized in page windows; page
+  text comes from the parsed-text cache, so nothing is parsed again.
+- Status lives on the row so any gunicorn worker can report it. Digests
+  are used only once every document the registry (`ingested_documents`)
+  lists as ingested in the requested collections has a ready one; until
+  then callers fall back to retrieval, which sees every document.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+from app.core.config import (
+    DIGEST_INPUT_TOKENS,
+    DIGEST_MODEL,
+    DIGEST_SECTION_TOKENS,
+    DIGEST_SUMMARY_TOKENS,
+    DIGEST_WORKERS,
+)
+from app.services.document_service import collection_extractor, num_tokens_from_string
+from app.services.pdf_extract import extract_page_texts
+
+logger = logging.getLogger("uvicorn.error")
+
+# Summarization is API bound and never urgent; keep it off the ingest pool
+_executor = ThreadPoolExecutor(max_workers=max(1, DIGEST_WORKERS), thread_name_prefix="digest")
+
+MAX_EVALUATION_FACTORS = 40
+# smallest budget worth rendering a digest into (name, summary and a few sections)
+_MIN_SHARE_TOKENS = 200
+_PAGES_PER_WINDOW = 5
+_LINE_RE = re.compile(r"^\s*\[(\d+)\]\s*(.+)$")
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+SECTION_PROMPT = """Summarize each numbered section of a solicitation document.
+For every section write one line: its number in brackets, then at most {words} words
+on what it asks of or tells the offeror (deliverables, limits, criteria, dates).
+Example: [2] Technical volume limited to 30 pages; must describe staffing and transition.
+
+{sections}"""
+
+SUMMARY_PROMPT = """Below are section summaries of the solicitation document "{name}".
+Write a summary of at most {words} words: what is being procured, what the offeror
+must submit, and how proposals will be evaluated. Plain prose, no headings.
+
+{sections}"""
+
+
+def digest_id(collection_name: str, source: str) -> str:
+    return hashlib.sha256(f"{collection_name}\x00{source}".encode("utf-8")).hexdigest()[:32]
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if num_tokens_from_string(text) <= max_tokens:
+        return text
+    # ~4 characters per token; trim until it fits
+    cut = text[: max_tokens * 4]
+    while cut and num_tokens_from_string(cut) > max_tokens:
+        cut = cut[: int(len(cut) * 0.9)]
+    return cut
+
+
+def _units(db: Session, collection_name: str, source: str) -> List[dict]:
+    """What to summarize: detected sections, else page windows."""
+    sections = crud.get_document_sections_for_source(db, collection_name, source)
+    if sections:
+        return [
+            {"path": s.section_path, "page_start": s.page_start, "page_end": s.page_end, "text": s.text or ""}
+            for s in sections
+        ]
+    pages = extract_page_texts(source, extractor=collection_extractor(collection_name))
+    return [
+        {
+            "path": f"Pages {i + 1}-{min(i + _PAGES_PER_WINDOW, len(pages))}",
+            "page_start": i,
+            "page_end": min(i + _PAGES_PER_WINDOW, len(pages)) - 1,
+            "text": "\n".join(pages[i : i + _PAGES_PER_WINDOW]),
+        }
+        for i in range(0, len(pages), _PAGES_PER_WINDOW)
+    ]
+
+
+def _summarize_sections(llm_for, units: List[dict]) -> None:
+    """Fill unit["summary"], packing as many sections per call as DIGEST_INPUT_TOKENS allows."""
+    per_unit = max(200, DIGEST_INPUT_TOKENS // 4)
+    batches: List[List[int]] = [[]]
+    used = 0
+    for i, unit in enumerate(units):
+        unit["excerpt"] = _truncate(unit["text"], per_unit)
+        tokens = num_tokens_from_string(unit["excerpt"])
+        if batches[-1] and used + tokens > DIGEST_INPUT_TOKENS:
+            batches.append([])
+            used = 0
+        batches[-1].append(i)
+        used += tokens
+    words = max(10, int(DIGEST_SECTION_TOKENS * 0.75))
+    for batch in batches:
+        if not batch:
+            continue
+        body = "\n\n".join(f"[{n + 1}] {units[i]['path']}\n{units[i]['excerpt']}" for n, i in enumerate(batch))
+        llm = llm_for(DIGEST_SECTION_TOKENS * len(batch) + 50)
+        reply = llm.invoke([HumanMessage(content=SECTION_PROMPT.format(words=words, sections=body))])
+        text = reply.content if hasattr(reply, "content") else str(reply)
+        for line in text.splitlines():
+            m = _LINE_RE.match(line)
+            if m and 1 <= int(m.group(1)) <= len(batch):
+                units[batch[int(m.group(1)) - 1]]["summary"] = _truncate(m.group(2).strip(), DIGEST_SECTION_TOKENS)
+    for unit in units:
+        unit.pop("excerpt", None)
+        unit.setdefault("summary", "")
+
+
+def _evaluation_factors(db: Session, collection_name: str, source: str) -> List[str]:
+    rows = crud.get_requirement_statements(db, collection_name, source=source)
+    factors = [r.text for r in rows if r.kind == "evaluation" or r.section_letter == "M"]
+    return factors[:MAX_EVALUATION_FACTORS]
+
+
+def build_digest(collection_name: str, source: str) -> None:
+    """Build (or refresh) the digest of one ingested document."""
+    did = digest_id(collection_name, source)
+    db = SessionLocal()
+    try:
+        units = _units(db, collection_name, source)
+        content_hash = hashlib.sha256("\x00".join(u["text"] for u in units).encode("utf-8")).hexdigest()
+        row = crud.get_document_digest(db, did)
+        if row is not None and row.status == "done" and row.content_hash == content_hash:
+            return
+        crud.upsert_document_digest(db, did, collection_name, source, status="running", error=None)
+
+        def _llm(max_tokens: int) -> ChatOpenAI:
+            return ChatOpenAI(model_name=DIGEST_MODEL, temperature=0, max_tokens=max_tokens)
+
+        units = [u for u in units if u["text"].strip()]
+        _summarize_sections(_llm, units)
+        sections = [{k: u[k] for k in ("path", "page_start", "page_end", "summary")} for u in units]
+        summary = ""
+        if units:
+            listing = "\n".join(f"- {s['path']}: {s['summary']}" for s in sections)
+            reply = _llm(DIGEST_SUMMARY_TOKENS).invoke([HumanMessage(content=SUMMARY_PROMPT.format(
+                name=os.path.basename(source),
+                words=int(DIGEST_SUMMARY_TOKENS * 0.75),
+                sections=_truncate(listing, DIGEST_INPUT_TOKENS),
+            ))])
+            summary = reply.content if hasattr(reply, "content") else str(reply)
+        factors = _evaluation_factors(db, collection_name, source)
+        digest = {"summary": summary, "sections": sections, "evaluation_factors": factors}
+        crud.upsert_document_digest(
+            db,
+            did,
+            collection_name,
+            source,
+            status="done",
+            content_hash=content_hash,
+            model=DIGEST_MODEL,
+            tokens=num_tokens_from_string(render_digest(digest, source)),
+            **digest,
+        )
+    except Exception as e:
+        logger.error("Digest of %s in '%s' failed:\n%s", source, collection_name, traceback.format_exc())
+        db.rollback()
+        crud.upsert_document_digest(db, did, collection_name, source, status="failed", error=str(e))
+    finally:
+        db.close()
+
+
+def schedule_digest(collection_name: str, source: str) -> None:
+    """Queue a digest (re)build for a document that was just ingested."""
+    _executor.submit(build_digest, collection_name, source)
+
+
+# ---------------------------
+# Reading digests
+# ---------------------------
+
+def _words(text: str) -> set:
+    return set(_WORD_RE.findall((text or "").lower()))
+
+
+def render_digest(digest, source: str, focus: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+    """Plain-text rendering of a digest (row or dict). With `focus`, the
+    sections sharing most words with it come first; with `max_tokens`, the
+    whole rendering (head included) fits it: sections that do not fit are
+    dropped, and a head that alone is too long is cut."""
+    get = digest.get if isinstance(digest, dict) else lambda k: getattr(digest, k)
+    head = [f"Document: {os.path.basename(source)}"]
+    if get("summary"):
+        head.append(f"Summary: {get('summary')}")
+    factors = get("evaluation_factors") or []
+    if factors:
+        head.append("Evaluation factors:\n" + "\n".join(f"- {f}" for f in factors))
+    sections = list(get("sections") or [])
+    if focus:
+        wanted = _words(focus)
+        sections.sort(key=lambda s: -len(wanted & _words(f"{s.get('path')} {s.get('summary')}")))
+    text = "\n".join(head)
+    if sections:
+        text += "\nSections:"
+    used = num_tokens_from_string(text)
+    if max_tokens is not None and used > max_tokens:
+        return _truncate(text, max_tokens)
+    lines = []
+    for s in sections:
+        line = f"- {s.get('path')}: {s.get('summary')}" if s.get("summary") else f"- {s.get('path')}"
+        tokens = num_tokens_from_string(line) + 1
+        if max_tokens is not None and used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join([text] + lines) if lines else text
+
+
+def _covering_digests(db: Session, collection_names: List[str]) -> list:
+    """Ready digests of `collection_names`, or [] while any ingested document
+    of those collections (e.g. a project file whose digest is still being
+    built) has none."""
+    rows = crud.get_document_digests(db, collection_names, status="done")
+    if not rows:
+        return []
+    have = {(r.collection_name, os.path.abspath(r.source)) for r in rows}
+    for name in collection_names:
+        for doc in crud.get_ingested_documents(db, name):
+            if doc.status == "done" and (name, os.path.abspath(doc.source)) not in have:
+                return []
+    return rows
+
+
+def digests_ready(db: Session, collection_names: List[str]) -> bool:
+    return bool(_covering_digests(db, collection_names))
+
+
+def digest_context(
+    db: Session, collection_names: List[str], max_tokens: int, focus: Optional[str] = None
+) -> List[str]:
+    """Rendered digests of every ready document in `collection_names`, one
+    string per document, together at most `max_tokens`. Each document gets an
+    even share of what the previous ones left (at least _MIN_SHARE_TOKENS);
+    documents are dropped once the budget runs out. Empty unless every
+    ingested document has a ready digest (see `_covering_digests`)."""
+    rows = _covering_digests(db, collection_names)
+    out: List[str] = []
+    remaining = max_tokens
+    for i, r in enumerate(rows):
+        if remaining <= 0 or (out and remaining < _MIN_SHARE_TOKENS):
+            break
+        share = min(remaining, max(_MIN_SHARE_TOKENS, remaining // (len(rows) - i)))
+        text = render_digest(r, r.source, focus=focus, max_tokens=share)
+        tokens = num_tokens_from_string(text)
+        if tokens > share:
+            # per-line counts can drift from the joined text by a token or two
+            text = _truncate(text, share)
+            tokens = num_tokens_from_string(text)
+        out.append(text)
+        remaining -= tokens
+    return out
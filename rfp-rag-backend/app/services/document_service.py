@@ -1,14 +1,36 @@
 # Auto-generated (improved chunking for better RAG + token helper)
 import os
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from app.core.config import DB_DIRECTORY
+from app.core.config import (
+    BULK_EXTRACT_CONCURRENCY, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS,
+    INGEST_PAGE_BUFFER, PROGRESS_INTERVAL_SECONDS,
+)
+from app.services.embedding_writer import EmbeddingWriter
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.embeddings import collection_embedding_model, get_embeddings, get_query_embeddings
+from app.services.pdf_extract import iter_pdf_pages, normalize_extractor
+from app.services.text_cache import file_digest
+from app.services.headings import SectionTracker
+from app.services.requirements import RequirementCollector
+from app.services.near_dup import simhash, to_hex, from_hex
+from app.services.near_dup_store import NearDuplicates, delete_or_promote, drop_source_refs, ensure_fingerprints
+from app.services import vectorstore
+from database import SessionLocal
+import crud
 import tiktoken
 import re
 import unicodedata
+import logging
+import hashlib
+import time
+
+logger = logging.getLogger("uvicorn.error")
 
 def sanitize_name_for_directory(name: str) -> str:
     # Keep legacy behavior but make it robust
@@ -27,42 +49,732 @@ def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> i
 
 def _split_documents(pages) -> List:
     """
-    Split pages using a larger chunk size and smart separators so long-form
-    generations have cohesive context blocks.
+    Split pages into chunks of roughly CHUNK_TOKENS tokens using smart
+    separators so long-form generations have cohesive context blocks.
+    Each chunk's token count is stored in metadata["tokens"] so prompt
+    assembly can budget context without re-encoding the text.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1400,
-        chunk_overlap=200,
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="cl100k_base",
+        chunk_size=CHUNK_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
         separators=["\n## ", "\n# ", "\n\n", "\n", " "],
     )
-    return splitter.split_documents(pages)
+    splits = splitter.split_documents(pages)
+    for d in splits:
+        d.metadata["tokens"] = num_tokens_from_string(d.page_content)
+    return splits
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def chunk_id(collection_name: str, metadata: dict) -> str:
+    """Deterministic vector id: the same chunk of the same file/page in the
+    same collection always maps to the same id, so re-ingest is an upsert."""
+    source = os.path.normcase(os.path.abspath(metadata.get("source") or ""))
+    key = "\x00".join([collection_name, source, str(metadata.get("page", "")), metadata["chunk_hash"]])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def document_id(collection_name: str, source: str) -> str:
+    """Registry id of a file in a collection (`ingested_documents`)."""
+    source = os.path.normcase(os.path.abspath(source))
+    return hashlib.sha256(f"{collection_name}\x00{source}".encode("utf-8")).hexdigest()[:32]
+
+
+def record_document(collection_name: str, source: str, **fields) -> None:
+    """Create or update the registry row of a file in a collection."""
+    db = SessionLocal()
+    try:
+        crud.upsert_ingested_document(
+            db, document_id(collection_name, source), collection_name, os.path.abspath(source), **fields
+        )
+    finally:
+        db.close()
+
+
+def _record_started(collection_name: str, file_path: str) -> None:
+    record_document(
+        collection_name, file_path,
+        document_name=os.path.basename(file_path), status="processing", error=None,
+        started_at=datetime.now(timezone.utc), finished_at=None,
+        size_bytes=os.path.getsize(file_path), content_hash=file_digest(file_path),
+    )
+
+
+def _record_failed(collection_name: str, file_path: str, error: Exception) -> None:
+    record_document(
+        collection_name, file_path,
+        document_name=os.path.basename(file_path), status="failed", error=str(error),
+        finished_at=datetime.now(timezone.utc),
+    )
+
+
+def register_existing_files(collection_name: str, directory: str) -> int:
+    """Register files ingested before the registry existed (status "done",
+    vector ids unknown). Only runs while the collection has no rows at all;
+    returns the number of files registered."""
+    db = SessionLocal()
+    try:
+        if crud.get_ingested_documents(db, collection_name) or not os.path.isdir(directory):
+            return 0
+        count = 0
+        for fname in sorted(os.listdir(directory)):
+            path = os.path.abspath(os.path.join(directory, fname))
+            if os.path.isfile(path) and not fname.endswith(".part"):
+                crud.upsert_ingested_document(
+                    db, document_id(collection_name, path), collection_name, path,
+                    document_name=fname, status="done", size_bytes=os.path.getsize(path),
+                )
+                count += 1
+        return count
+    finally:
+        db.close()
+
+
+def _registered_ids(collection_name: str, sources: Iterable[str]) -> Dict[str, Optional[List[str]]]:
+    """Vector ids each source owns per the registry (None: unknown, e.g. legacy rows)."""
+    db = SessionLocal()
+    try:
+        out: Dict[str, Optional[List[str]]] = {}
+        for src in dict.fromkeys(sources):
+            row = crud.get_ingested_document(db, document_id(collection_name, src))
+            out[src] = list(row.chunk_ids) if row is not None and row.chunk_ids is not None else None
+        return out
+    finally:
+        db.close()
+
+
+def _existing_chunks(
+    collection, sources: List[str], registered: Optional[Dict[str, Optional[List[str]]]] = None
+) -> Tuple[List[str], List[str], List[dict]]:
+    """Return (ids, documents, metadatas) already stored for any of `sources`.
+
+    Sources with registered ids are fetched by id; others fall back to a
+    metadata filter on `source`.
+    """
+    ids: List[str] = []
+    docs: List[str] = []
+    metas: List[dict] = []
+    for src in dict.fromkeys(sources):
+        known = (registered or {}).get(src)
+        if known is None:
+            pages = [collection.get(where={"source": src}, include=["documents", "metadatas"])]
+        else:
+            pages = [collection.get(ids=known[i : i + 500], include=["documents", "metadatas"])
+                     for i in range(0, len(known), 500)]
+        for got in pages:
+            for cid, doc, meta in zip(got.get("ids") or [], got.get("documents") or [], got.get("metadatas") or []):
+                if (meta or {}).get("source") != src:
+                    continue  # handed to another document since
+                ids.append(cid)
+                docs.append(doc)
+                metas.append(meta)
+    return ids, docs, metas
+
+
+def _page_diff(new_by_page: Dict[int, str], old_by_page: Dict[int, str]) -> Dict[str, List[int]]:
+    """Compare page fingerprints of the new version against the stored one.
+
+    Page numbers in the result are 1-based. Content that merely moved to a
+    different page number is not reported as changed.
+    """
+    old_hashes = set(old_by_page.values())
+    new_hashes = set(new_by_page.values())
+    return {
+        "pages_changed": sorted(n + 1 for n, h in new_by_page.items() if h not in old_hashes),
+        "pages_removed": sorted(n + 1 for n, h in old_by_page.items() if h not in new_hashes),
+    }
+
+
+def _index_existing(old_ids: List[str], old_docs: List[str], old_metas: List[dict]) -> Dict[str, List[Tuple[str, dict]]]:
+    """Stored chunks by content hash, so new chunks can be matched as they are split."""
+    available: Dict[str, List[Tuple[str, dict]]] = defaultdict(list)
+    for i, doc, meta in zip(old_ids, old_docs, old_metas):
+        available[(meta or {}).get("chunk_hash") or _hash_text(doc)].append((i, meta or {}))
+    return available
+
+
+def _delete_or_promote(collection, ids: List[str], gone_sources: Iterable[str] = (), shadows: List = ()) -> int:
+    """`near_dup_store.delete_or_promote`, keeping the registry's vector ids
+    of documents that took over a vector in step. Returns the number kept."""
+    taken_over = delete_or_promote(collection, ids, gone_sources, shadows)
+    if taken_over:
+        logical = vectorstore.logical_name(collection)
+        db = SessionLocal()
+        try:
+            crud.add_ingested_document_chunk_ids(
+                db, {document_id(logical, src): held for src, held in taken_over.items()}
+            )
+        finally:
+            db.close()
+    return sum(len(held) for held in taken_over.values())
+
+
+def remove_source(collection_name: str, source: str) -> None:
+    """Delete a document's vectors (and sections) from a collection, keeping
+    near-duplicate refs elsewhere consistent."""
+    source = os.path.abspath(source)
+    with vectorstore.collection_lock(collection_name):
+        collection = _get_collection(collection_name)
+        ensure_fingerprints(collection)
+        owned = _registered_ids(collection_name, [source])[source]
+        # a running re-embed migration holds a second copy that must forget it too
+        _remove_source_vectors(collection, source, owned, vectorstore.shadow_collections(collection_name))
+        db = SessionLocal()
+        try:
+            crud.delete_ingested_documents(db, collection_name, source)
+            crud.delete_document_sections(db, collection_name, source)
+            crud.delete_requirement_statements(db, collection_name, source)
+            crud.delete_document_digests(db, collection_name, source)
+        finally:
+            db.close()
+
+
+def _remove_source_vectors(collection, source: str, owned: Optional[List[str]] = None, shadows: List = ()) -> None:
+    """`owned`: the source's vector ids from the registry (None: find them by metadata)."""
+    drop_source_refs(collection, source, shadows)
+    if owned is None:
+        owned = collection.get(where={"source": source}).get("ids") or []
+    _delete_or_promote(collection, owned, gone_sources=[source], shadows=shadows)
+
+
+# progress(status, **counts) — used by background jobs to report stage changes
+ProgressCallback = Callable[..., None]
+
+
+def _noop_progress(status: str, **counts) -> None:
+    return None
+
+
+class _DocumentStream:
+    """Ingest of one file into a collection, fed one page at a time.
+
+    Pages go through heading segmentation and splitting as they arrive, and
+    each new chunk is matched against what the collection already holds for
+    this file (or the version it `replaces`). `feed` returns only the chunks
+    that still need embedding, so they can be written while later pages are
+    being extracted. Memory is bounded by the pages in flight plus per-chunk
+    bookkeeping (ids and metadata), not by the document's full text; section
+    texts are the exception and are kept until `finish`.
+    """
+
+    def __init__(self, file_path: str, collection, near_dups: NearDuplicates, replaces: Optional[str] = None):
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        self.file_path = file_path
+        self.source = os.path.abspath(file_path)
+        self.collection = collection
+        self.near_dups = near_dups
+        # sources whose stored chunks/sections this ingest replaces
+        self.previous = [self.source] + ([os.path.abspath(replaces)] if replaces else [])
+
+        # New version of a known document? Re-embed only what changed.
+        registered = _registered_ids(vectorstore.logical_name(collection), self.previous)
+        old_ids, old_docs, old_metas = _existing_chunks(collection, self.previous, registered)
+        self._available = _index_existing(old_ids, old_docs, old_metas)
+        self._old_pages: Dict[int, str] = {
+            int(m["page"]): m["page_hash"]
+            for m in old_metas
+            if m and m.get("page_hash") is not None and m.get("page") is not None
+        }
+        self.summary: Dict[str, object] = {"mode": "incremental" if old_ids else "new"}
+        # old chunks only absorb near-duplicates once they are known to survive
+        near_dups.exclude(old_ids)
+        near_dups.forget_sources(self.previous)
 
-def process_document(file_path: str, collection_name: str) -> None:
+        # Cut pages at detected headings so no chunk straddles two sections;
+        # each segment carries section_path/parent_id for parent-section retrieval
+        self._tracker = SectionTracker(namespace=f"{vectorstore.logical_name(collection)}\x00{self.source}")
+        # "shall"/"must"/evaluation sentences, indexed for requirement listings and checklists
+        self._requirements = RequirementCollector(
+            namespace=f"{vectorstore.logical_name(collection)}\x00{self.source}", source=self.source
+        )
+        self._page_hashes: Dict[int, str] = {}
+        self.pages = 0
+        self.chunks_total = 0
+        self.unchanged = 0
+        # new chunks folded into an existing near-duplicate instead of embedded
+        self.collapsed = 0
+        self.to_update: List[Tuple[str, dict]] = []
+        self.to_delete: List[str] = []
+        self.sections: List[dict] = []
+        self.fresh_ids: List[str] = []
+        # stored chunks this version keeps as they are
+        self.kept_ids: List[str] = []
+        self.extract_s = 0.0
+        self.split_s = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.unchanged + self.collapsed
+
+    def feed(self, page) -> List:
+        """Split one page; returns its chunks that need embedding."""
+        started = time.perf_counter()
+        # Fingerprint pages so a later version of this file can be diffed
+        page.metadata["page_hash"] = _hash_text(page.page_content)
+        self._page_hashes[int(page.metadata.get("page", self.pages))] = page.metadata["page_hash"]
+        self.pages += 1
+
+        fresh = []
+        logical = vectorstore.logical_name(self.collection)
+        segments = self._tracker.segment(page)
+        self._requirements.feed(segments)
+        splits = _split_documents(segments)
+        for d in splits:
+            # Ensure source is the absolute path for consistent deletions later
+            d.metadata["source"] = os.path.abspath(d.metadata.get("source") or self.source)
+            d.metadata["chunk_hash"] = _hash_text(d.page_content)
+            d.metadata["simhash"] = to_hex(simhash(d.page_content))
+        # one lookup per page for the stored chunks its new chunks could duplicate
+        self.near_dups.load(
+            from_hex(d.metadata["simhash"]) for d in splits if d.metadata["chunk_hash"] not in self._available
+        )
+        for d in splits:
+            self.chunks_total += 1
+            bucket = self._available.get(d.metadata["chunk_hash"])
+            if bucket:
+                # Unchanged chunks keep their vectors; only page/source metadata may move
+                old_id, old_meta = bucket.pop()
+                self.kept_ids.append(old_id)
+                self.unchanged += 1
+                self.near_dups.restore(old_id)
+                if any(old_meta.get(k) != v for k, v in d.metadata.items()):
+                    self.to_update.append((old_id, d.metadata))
+            elif self.near_dups.admit(d):
+                fresh.append(d)
+                self.fresh_ids.append(chunk_id(logical, d.metadata))
+            else:
+                self.collapsed += 1
+        self.split_s += time.perf_counter() - started
+        return fresh
+
+    def chunks(self, pages: Iterable) -> Iterator:
+        """Feed `pages` in order, yielding chunks to embed as soon as each page is split."""
+        it = iter(pages)
+        while True:
+            started = time.perf_counter()
+            page = next(it, None)
+            self.extract_s += time.perf_counter() - started
+            if page is None:
+                return
+            yield from self.feed(page)
+
+    def finish(self) -> None:
+        """All pages fed: settle which stored chunks are gone and build section rows."""
+        self.to_delete = [i for bucket in self._available.values() for i, _ in bucket]
+        self._available.clear()
+        if self.summary["mode"] == "incremental":
+            self.summary.update(_page_diff(self._page_hashes, self._old_pages))
+        self.sections = [
+            {
+                "id": rec.id,
+                "source": self.source,
+                "section_path": rec.section_path,
+                "text": rec.text,
+                "tokens": num_tokens_from_string(rec.text),
+                "page_start": rec.page_start,
+                "page_end": rec.page_end,
+            }
+            for rec in self._tracker.sections()
+        ]
+        self.summary["sections"] = len(self.sections)
+        self.summary["timings"] = {"extract_s": round(self.extract_s, 3), "split_s": round(self.split_s, 3)}
+
+    def apply(self, written: int, embeddings=None) -> Dict[str, object]:
+        """Finish once the new chunks are written; returns the diff summary.
+        `embeddings` (the collection's model) embeds the requirement index."""
+        collection = self.collection
+        for i in range(0, len(self.to_update), 500):
+            part = self.to_update[i : i + 500]
+            collection.update(ids=[u[0] for u in part], metadatas=[u[1] for u in part])
+        # Drop vectors for chunks that no longer exist (after adds, so search never sees a gap)
+        _delete_or_promote(collection, self.to_delete, gone_sources=self.previous)
+        requirements = self._requirements.rows(embeddings, collection_embedding_model(collection))
+        logical = vectorstore.logical_name(collection)
+        db = SessionLocal()
+        try:
+            # kept chunks that moved page (or file, for `replaces`) keep their fingerprints under the new owner
+            crud.move_chunk_fingerprints(
+                db, logical, {cid: (meta.get("source"), meta.get("page")) for cid, meta in self.to_update}
+            )
+            crud.replace_document_sections(db, logical, self.previous, self.sections)
+            crud.replace_requirement_statements(db, logical, self.previous, requirements)
+        finally:
+            db.close()
+        self.summary.update(
+            {
+                "chunks_added": written,
+                "chunks_removed": len(self.to_delete),
+                "chunks_unchanged": self.unchanged,
+                "chunks_collapsed": self.collapsed,
+                "requirements": len(requirements),
+            }
+        )
+        return self.summary
+
+    def record(self) -> None:
+        """Mark the file indexed in the registry, with the exact vector ids it
+        owns; registry rows of the versions it replaced are dropped."""
+        logical = vectorstore.logical_name(self.collection)
+        owned = list(dict.fromkeys(self.kept_ids + self.fresh_ids))
+        db = SessionLocal()
+        try:
+            for src in self.previous:
+                if src != self.source:
+                    crud.delete_ingested_documents(db, logical, src)
+            crud.upsert_ingested_document(
+                db, document_id(logical, self.source), logical, self.source,
+                document_name=os.path.basename(self.source), status="done", error=None,
+                pages=self.pages, chunks=len(owned), chunk_ids=owned,
+                timings=self.summary.get("timings"), finished_at=datetime.now(timezone.utc),
+            )
+        finally:
+            db.close()
+
+    def abandon(self) -> None:
+        """Ingest failed part-way: remove what was written, keep the stored version."""
+        self.near_dups.abandon(self.source, self.previous)
+        for i in range(0, len(self.fresh_ids), 500):
+            self.collection.delete(ids=self.fresh_ids[i : i + 500])
+
+
+def _get_collection(collection_name: str, embedding_model: Optional[str] = None):
+    """Get or create the physical collection currently serving `collection_name`;
+    a new one records `embedding_model` (default EMBEDDING_MODEL) as the model
+    its vectors are built with. Resolved fresh, so writes follow a migration switch."""
+    return vectorstore.get_collection(collection_name, embedding_model, fresh=True)
+
+
+def ensure_collection(collection_name: str, embedding_model: Optional[str] = None) -> str:
+    """Create a collection up front (e.g. with its project) so it records the
+    chosen embedding model. Returns the model spec it is bound to."""
+    return collection_embedding_model(_get_collection(collection_name, embedding_model))
+
+
+def collection_embeddings(collection_name: str):
+    """Embeddings for the model a collection was built with (for queries)."""
+    return get_query_embeddings(vectorstore.resolve(collection_name).embedding_model)
+
+
+def collection_extractor(collection_name: str) -> str:
+    """PDF extractor for a collection: its project's choice, else PDF_EXTRACTOR."""
+    db = SessionLocal()
+    try:
+        project = crud.get_project_by_project_id(db, collection_name)
+        return normalize_extractor(project.pdf_extractor if project else None)
+    finally:
+        db.close()
+
+
+def process_document(
+    file_path: str,
+    collection_name: str,
+    progress: Optional[ProgressCallback] = None,
+    replaces: Optional[str] = None,
+    extractor: Optional[str] = None,
+) -> dict:
     """
     Load a PDF, split into chunks, and add to (or create) a Chroma collection.
     Persist to disk so future runs can retrieve.
+
+    The file is streamed: pages are extracted, split and embedded in bounded
+    batches, and each batch is written as soon as it is ready, so memory
+    does not grow with the document and early pages are searchable while
+    later ones are still being processed.
+
+    If the collection already holds vectors for this file (same path) or for
+    `replaces` (path of the previous version, e.g. the pre-amendment RFP),
+    the upload is treated as a new version: only added/changed chunks are
+    embedded, vectors for removed chunks are deleted once the whole file has
+    been read, and the result carries a page-level diff summary. Vector ids
+    are derived from the chunk (see `chunk_id`) and written with upserts, so
+    a retried or repeated ingest never stores a second copy.
+
+    `progress` is called with the current stage ("extracting", "splitting",
+    "embedding", "writing") and counters (pages, chunks_total,
+    chunks_embedded, cache_hits, cache_misses) as the pipeline advances;
+    while streaming, pages and chunks_total are the counts so far.
+    `extractor` names the PDF backend (default: the project's, see
+    `collection_extractor`). Returns the final counters; the summary
+    includes per-stage timings and the extractor used. Ingests and removals
+    on one collection run one at a time (`vectorstore.collection_lock`).
     """
-    if not os.path.isfile(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
+    progress = progress or _noop_progress
+    extractor = extractor or collection_extractor(collection_name)
+    # one writer per collection at a time: near-duplicate refs are read-modify-write
+    with vectorstore.collection_lock(collection_name):
+        collection = _get_collection(collection_name)
+        if os.path.isfile(file_path):
+            _record_started(collection_name, file_path)
+        try:
+            return _process_document(file_path, collection_name, collection, progress, replaces, extractor)
+        except Exception as e:
+            if os.path.isfile(file_path):
+                _record_failed(collection_name, file_path, e)
+            raise
 
-    # Load pages with metadata (source, page)
-    loader = PyPDFLoader(file_path)
-    pages = loader.load()  # returns Documents with metadata
 
-    # Split into chunks
-    splits = _split_documents(pages)
+def _process_document(
+    file_path: str,
+    collection_name: str,
+    collection,
+    progress: ProgressCallback,
+    replaces: Optional[str],
+    extractor: str,
+) -> dict:
+    progress("extracting")
+    near_dups = NearDuplicates(collection, id_fn=lambda meta: chunk_id(collection_name, meta))
+    stream = _DocumentStream(file_path, collection, near_dups, replaces)
 
-    # Ensure source is the absolute path for consistent deletions later
-    abs_src = os.path.abspath(file_path)
-    for d in splits:
-        d.metadata = d.metadata or {}
-        d.metadata["source"] = os.path.abspath(d.metadata.get("source") or abs_src)
-
-    embeddings = OpenAIEmbeddings()
-    vectordb = Chroma(
-        persist_directory=DB_DIRECTORY,
-        embedding_function=embeddings,
-        collection_name=collection_name,
+    # Embed in bounded concurrent batches; each batch is written as soon as it is ready.
+    # Repeat content (boilerplate shared across projects/KB) is served from the cache.
+    embeddings = CachedEmbeddings(get_embeddings(collection_embedding_model(collection)))
+
+    def _report(status: str, written: int) -> None:
+        progress(
+            status,
+            pages=stream.pages,
+            chunks_total=stream.chunks_total,
+            chunks_embedded=stream.done + written,
+            cache_hits=embeddings.hits,
+            cache_misses=embeddings.misses,
+        )
+
+    def _pages():
+        reported = time.monotonic()
+        for i, page in enumerate(iter_pdf_pages(file_path, extractor=extractor)):  # text extracted across a process pool
+            if i == 0:
+                progress("splitting")
+            elif time.monotonic() - reported >= PROGRESS_INTERVAL_SECONDS:
+                # unchanged pages produce no batches; keep page counts moving anyway
+                reported = time.monotonic()
+                _report("embedding", writer.written)
+            yield page
+
+    writer = EmbeddingWriter(
+        collection,
+        embeddings,
+        on_batch=lambda n, batch: _report("embedding", n),
+        id_fn=lambda d: chunk_id(collection_name, d.metadata),
+    )
+    stream_started = time.perf_counter()
+    written = writer.write(stream.chunks(_pages()))
+    _report("writing", written)
+    write_started = time.perf_counter()
+    stream.finish()
+    near_dups.flush(collection)
+    summary = stream.apply(written, embeddings)
+    summary["extractor"] = extractor
+    if written:
+        vectorstore.record_dimension(collection_name, collection)
+    summary["timings"].update(
+        embed_s=round(write_started - stream_started - stream.extract_s - stream.split_s, 3),
+        write_s=round(time.perf_counter() - write_started, 3),
+    )
+    stream.record()
+
+    logger.info(
+        "Ingested %s into '%s': %s, embedding cache hit rate %.0f%%",
+        os.path.basename(file_path), collection_name, summary, embeddings.hit_rate * 100,
+    )
+    return {
+        "pages": stream.pages,
+        "chunks_total": stream.chunks_total,
+        "chunks_embedded": stream.done + written,
+        **embeddings.stats(),
+        "summary": summary,
+    }
+
+
+# end-of-file marker on the bulk page queue
+_END = object()
+
+
+def process_documents(
+    file_paths: List[str],
+    collection_name: str,
+    progress_for: Optional[Callable[[str], ProgressCallback]] = None,
+    extractor: Optional[str] = None,
+) -> Dict[str, dict]:
+    """
+    Ingest many files (e.g. a whole solicitation package) as one pipeline.
+
+    Files are extracted concurrently into a bounded page queue; each page is
+    split as it arrives and its new chunks join a single embedding stream,
+    so batches span files and there is one write stream into the
+    collection. `progress_for(file_path)` returns the progress callback for
+    that file; a file that fails to extract is reported as "failed" (and
+    whatever it had written is removed) without stopping the others.
+
+    Returns {file_path: counters-or-error} in the same shape as `process_document`.
+    """
+    progress_for = progress_for or (lambda _path: _noop_progress)
+    extractor = extractor or collection_extractor(collection_name)
+    with vectorstore.collection_lock(collection_name):
+        return _process_documents(file_paths, collection_name, progress_for, extractor)
+
+
+def _process_documents(
+    file_paths: List[str],
+    collection_name: str,
+    progress_for: Callable[[str], ProgressCallback],
+    extractor: str,
+) -> Dict[str, dict]:
+    collection = _get_collection(collection_name)
+    by_source = {os.path.abspath(p): p for p in file_paths}
+    streams: Dict[str, _DocumentStream] = {}
+    finished: List[str] = []
+    abandoned: List[_DocumentStream] = []
+    reported: Dict[str, float] = {}
+    results: Dict[str, dict] = {}
+    embedded: Dict[str, int] = defaultdict(int)
+    embeddings = CachedEmbeddings(get_embeddings(collection_embedding_model(collection)))
+    near_dups = NearDuplicates(collection, id_fn=lambda meta: chunk_id(collection_name, meta))
+    pages: "queue.Queue" = queue.Queue(maxsize=max(1, INGEST_PAGE_BUFFER))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _extract(path: str) -> None:
+        try:
+            for page in iter_pdf_pages(path, extractor=extractor):
+                if not _put((path, page)):
+                    return
+            _put((path, _END))
+        except Exception as e:
+            _put((path, e))
+
+    def _fail(path: str, error: Exception) -> None:
+        logger.error("Extraction failed for %s: %s", path, error)
+        results[path] = {"error": str(error)}
+        if os.path.isfile(path):
+            _record_failed(collection_name, path, error)
+        stream = streams.pop(path, None)
+        if stream is not None:
+            # its chunks may still be in flight; undone once the writer is drained
+            abandoned.append(stream)
+        progress_for(path)("failed", error=str(error))
+
+    def _new_chunks():
+        # Pages arrive interleaved across files; every stream is fed on this (the writer's) thread
+        remaining = len(file_paths)
+        while remaining:
+            waited = time.perf_counter()
+            path, item = pages.get()
+            if path in streams:
+                streams[path].extract_s += time.perf_counter() - waited
+            if item is _END or isinstance(item, Exception):
+                remaining -= 1
+                if isinstance(item, Exception):
+                    _fail(path, item)
+                elif path in streams:
+                    finished.append(path)
+                elif path not in results:
+                    # no pages at all: still record an (empty) ingest
+                    try:
+                        streams[path] = _DocumentStream(path, collection, near_dups)
+                        finished.append(path)
+                    except Exception as e:
+                        _fail(path, e)
+                continue
+            if path in results:
+                continue  # already failed
+            stream = streams.get(path)
+            if stream is None:
+                try:
+                    stream = streams[path] = _DocumentStream(path, collection, near_dups)
+                except Exception as e:
+                    _fail(path, e)
+                    continue
+                progress_for(path)("splitting")
+            fresh = stream.feed(item)
+            now = time.monotonic()
+            if now - reported.get(path, 0.0) >= PROGRESS_INTERVAL_SECONDS:
+                # pages with nothing new to embed would otherwise report nothing
+                reported[path] = now
+                progress_for(path)(
+                    "embedding", pages=stream.pages, chunks_total=stream.chunks_total,
+                    chunks_embedded=stream.done + embedded[path],
+                )
+            yield from fresh
+
+    def _on_batch(_written: int, batch) -> None:
+        counts: Dict[str, int] = defaultdict(int)
+        for d in batch:
+            counts[d.metadata["source"]] += 1
+        for src, n in counts.items():
+            path = by_source.get(src, src)
+            embedded[path] += n
+            stream = streams.get(path)
+            if stream is None:
+                continue
+            progress_for(path)(
+                "embedding",
+                pages=stream.pages,
+                chunks_total=stream.chunks_total,
+                chunks_embedded=stream.done + embedded[path],
+                cache_hits=embeddings.hits,
+                cache_misses=embeddings.misses,
+            )
+
+    for p in file_paths:
+        if os.path.isfile(p):
+            _record_started(collection_name, p)
+        progress_for(p)("extracting")
+    writer = EmbeddingWriter(
+        collection, embeddings, on_batch=_on_batch, id_fn=lambda d: chunk_id(collection_name, d.metadata)
+    )
+    embed_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, BULK_EXTRACT_CONCURRENCY), thread_name_prefix="extract") as pool:
+        for p in file_paths:
+            pool.submit(_extract, p)
+        try:
+            writer.write(_new_chunks())
+        finally:
+            # unblock extractors if the writer gave up early
+            stop.set()
+    for stream in abandoned:
+        stream.abandon()
+    for path in finished:
+        stream = streams[path]
+        progress_for(path)(
+            "writing", pages=stream.pages, chunks_total=stream.chunks_total,
+            chunks_embedded=stream.done + embedded[path],
+        )
+    write_started = time.perf_counter()
+    for path in finished:
+        streams[path].finish()
+    near_dups.flush(collection)
+    if writer.written:
+        vectorstore.record_dimension(collection_name, collection)
+
+    for path in finished:
+        stream = streams[path]
+        summary = stream.apply(embedded[path], embeddings)
+        summary["extractor"] = extractor
+        # embedding overlaps extraction across the batch, so embed_s is the batch's wall time
+        summary["timings"].update(
+            embed_s=round(write_started - embed_started, 3), write_s=round(time.perf_counter() - write_started, 3)
+        )
+        stream.record()
+        results[path] = {
+            "pages": stream.pages,
+            "chunks_total": stream.chunks_total,
+            "chunks_embedded": stream.done + embedded[path],
+            "summary": summary,
+        }
+    logger.info(
+        "Bulk ingested %d/%d files into '%s' (%d chunks written), embedding cache hit rate %.0f%%",
+        len(finished), len(file_paths), collection_name, writer.written, embeddings.hit_rate * 100,
     )
-    vectordb.add_documents(splits)
-    vectordb.persist()
+    return results
@@ -17,6 +17,7 @@ from .patterns import extract_patterns
 from .llm import chat_html_project
 from .similarity import max_sentence_similarity
 from .compliance import check_compliance
+from .requirements import match_requirements
 from app.schemas.sections import SectionInstruction, DraftResp
 
 # System guidance for drafting
@@ -41,6 +42,30 @@ Write the full section now.
 """
 
 
+def _checklist_requirements(project_id: str, checklist: list[str], db: Session | None) -> list[dict | None]:
+    """Closest indexed RFP requirement per checklist item (None when nothing is indexed)."""
+    if db is None or not checklist:
+        return []
+    try:
+        matches = match_requirements(db, project_id, checklist, k=1)
+    except Exception:
+        # the checks are advisory; drafting must not fail on them
+        return []
+    return [
+        {
+            "id": m[0]["requirement"].id,
+            "text": m[0]["requirement"].text,
+            "kind": m[0]["requirement"].kind,
+            "page": m[0]["requirement"].page,
+            "section_path": m[0]["requirement"].section_path,
+            "score": m[0]["score"],
+        }
+        if m
+        else None
+        for m in matches
+    ]
+
+
 def draft_section(
     project_id: str,
     instruction: SectionInstruction,
@@ -85,7 +110,9 @@ def draft_section(
 
     # 4) Checks: similarity vs examples (to avoid copying) + checklist coverage
     sim = max_sentence_similarity(html, ex_passages)
-    comp = check_compliance(html, instruction.compliance_checklist)
+    comp = check_compliance(
+        html, instruction.compliance_checklist, _checklist_requirements(project_id, instruction.compliance_checklist, db)
+    )
 
     # 5) Provenance
     sources = [
@@ -0,0 +1,316 @@
+"""Content-addressed, on-disk embedding cache.
+
+The same boilerplate (FAR clauses, Section L language, corporate capability
+docs) is uploaded to many projects and to the knowledge base. Vectors are
+cached by sha256(embedding model + chunk text) so repeat content is never
+sent to the embedding provider twice, whichever collection it lands in.
+
+Implementation details
+- Storage is a single SQLite file (WAL mode) so all gunicorn workers and
+  ingest threads can share it; each thread gets its own connection.
+- Vectors are stored as packed float32 (what Chroma keeps anyway).
+- `CachedEmbeddings` wraps any LangChain `Embeddings` and keeps hit/miss
+  counters so callers can report a hit rate per ingest.
+
+Search queries have their own cache: prompt functions send the same long
+prompt text on every run and users re-ask near-identical questions.
+`QueryEmbeddings` serves query vectors from an in-process LRU keyed by
+(normalized text, model), optionally backed by a shared store
+(QUERY_EMBED_CACHE_BACKEND) so all workers benefit; `query_cache_stats`
+reports its hits and misses.
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import EMBED_CACHE_DIRECTORY, QUERY_EMBED_CACHE_BACKEND, QUERY_EMBED_CACHE_SIZE
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def embedding_model_name(embeddings: Embeddings) -> str:
+    """Best-effort identifier for the model behind an Embeddings instance."""
+    for attr in ("model", "model_name"):
+        val = getattr(embeddings, attr, None)
+        if isinstance(val, str) and val:
+            return val
+    return embeddings.__class__.__name__
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _pack(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    arr = array("f")
+    arr.frombytes(blob)
+    return arr.tolist()
+
+
+class EmbeddingCache:
+    """Thread-safe key → vector store backed by SQLite."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        out: Dict[str, List[float]] = {}
+        conn = self._conn()
+        # stay well under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            part = list(keys[i : i + 500])
+            marks = ",".join("?" * len(part))
+            for key, blob in conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part):
+                out[key] = _unpack(blob)
+        return out
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        if not items:
+            return
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(k, _pack(v)) for k, v in items.items()],
+            )
+
+
+_default_cache: EmbeddingCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache instance (created lazily)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(os.path.join(EMBED_CACHE_DIRECTORY, "embeddings.sqlite3"))
+        return _default_cache
+
+
+class CachedEmbeddings(Embeddings):
+    """Read-through cache around another Embeddings for `embed_documents`.
+
+    Query embeddings pass straight through to the wrapped instance.
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache | None = None):
+        self.base = base
+        # CPU backends ask the writer for fewer parallel batches
+        if hasattr(base, "max_concurrency"):
+            self.max_concurrency = base.max_concurrency
+        self.cache = cache or get_embedding_cache()
+        self.model = embedding_model_name(base)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return (self.hits / total) if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {"cache_hits": self.hits, "cache_misses": self.misses, "cache_hit_rate": round(self.hit_rate, 4)}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once, even if repeated in the batch
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+
+# ---------------------------
+# Query embeddings
+# ---------------------------
+
+def normalize_query(text: str) -> str:
+    """Cache identity of a query: NFKC, case-folded, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query vectors, with an optional shared `backend`
+    (anything with get_many/put_many, e.g. `EmbeddingCache`) behind it.
+
+    Backend errors are logged and treated as misses: a cache must never
+    fail a search.
+    """
+
+    def __init__(self, max_entries: int, backend=None):
+        self.max_entries = max(0, max_entries)
+        self.backend = backend
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _remember(self, items: Dict[str, List[float]]) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            for key, vec in items.items():
+                self._lru[key] = vec
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        wanted = list(dict.fromkeys(keys))
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in wanted:
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vec
+        local = len(found)
+        shared: Dict[str, List[float]] = {}
+        missing = [k for k in wanted if k not in found]
+        if missing and self.backend is not None:
+            try:
+                shared = self.backend.get_many(missing)
+            except Exception as e:
+                logger.warning("Shared query-embedding cache read failed: %s", e)
+            self._remember(shared)
+            found.update(shared)
+        with self._lock:
+            self.hits += local
+            self.shared_hits += len(shared)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        self._remember(items)
+        if self.backend is not None and items:
+            try:
+                self.backend.put_many(items)
+            except Exception as e:
+                logger.warning("Shared query-embedding cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.shared_hits) / total, 4) if total else 0.0,
+            }
+
+
+def _query_backend(spec: str):
+    """Shared backend named by QUERY_EMBED_CACHE_BACKEND, or None. A spec
+    that cannot be loaded is logged once and the cache runs without a
+    backend; searches must not fail over a cache setting."""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    try:
+        if spec == "sqlite":
+            return get_embedding_cache()
+        module, _, factory = spec.partition(":")
+        backend = getattr(importlib.import_module(module), factory or "get_backend")()
+        if not all(callable(getattr(backend, name, None)) for name in ("get_many", "put_many")):
+            raise TypeError(f"{type(backend).__name__} has no get_many/put_many")
+        return backend
+    except Exception as e:
+        logger.error("Invalid QUERY_EMBED_CACHE_BACKEND %r, using the in-process cache only: %s", spec, e)
+        return None
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Process-wide query-embedding cache (created lazily; the backend spec
+    is resolved once, on first use)."""
+    global _query_cache
+    with _default_lock:
+        if _query_cache is None:
+            _query_cache = QueryEmbeddingCache(QUERY_EMBED_CACHE_SIZE, _query_backend(QUERY_EMBED_CACHE_BACKEND))
+        return _query_cache
+
+
+def query_cache_stats() -> Dict[str, float]:
+    return get_query_cache().stats()
+
+
+class QueryEmbeddings(Embeddings):
+    """Embeddings for search queries, served from the query cache.
+
+    Both methods take queries; whatever the cache misses is embedded in one
+    `embed_documents` call on the wrapped instance.
+    """
+
+    def __init__(self, base: Embeddings, cache: QueryEmbeddingCache | None = None):
+        self.base = base
+        self.cache = cache or get_query_cache()
+        self.model = embedding_model_name(base)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # namespaced: the vector of the original text is stored under its normalized form
+        keys = [cache_key(f"{self.model}\x00query", normalize_query(t)) for t in texts]
+        found = self.cache.get_many(keys)
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,127 @@
+"""Batched, concurrent embedding writer for Chroma collections.
+
+Chunks are grouped into fixed-size batches and embedded by a small thread
+pool (bounded number of in-flight embedding requests). Each batch is written
+to the collection as soon as its embeddings come back, so a failure late in
+a large ingest does not discard the work already done.
+
+Notes
+- Embedding calls run on worker threads; collection writes and progress
+  callbacks stay on the calling thread (SQL sessions are not thread-safe).
+- A failing batch is retried with exponential backoff before the whole
+  write is aborted.
+- Writes are upserts: with deterministic ids (`id_fn`), re-writing the same
+  chunk replaces it instead of adding a copy.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from uuid import uuid4
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import EMBED_BATCH_SIZE, EMBED_MAX_CONCURRENCY, EMBED_MAX_RETRIES
+
+logger = logging.getLogger("uvicorn.error")
+
+Batch = List[Document]
+
+
+def _batched(docs: Iterable[Document], size: int) -> Iterator[Batch]:
+    it = iter(docs)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class EmbeddingWriter:
+    """Embed documents in batches and add them to a chromadb collection.
+
+    Args:
+        collection: chromadb Collection to write into.
+        embeddings: LangChain Embeddings used for `embed_documents`.
+        batch_size: chunks per embedding request.
+        max_concurrency: max embedding requests in flight at once.
+        max_retries: retries per batch after the first failure.
+        on_batch: called with (running count of written chunks, the batch just written).
+        id_fn: returns the vector id for a document; random UUIDs by default.
+    """
+
+    def __init__(
+        self,
+        collection,
+        embeddings: Embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        on_batch: Optional[Callable[[int, Batch], None]] = None,
+        id_fn: Optional[Callable[[Document], str]] = None,
+    ):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        # Backends may cap parallel requests (e.g. local CPU models)
+        self.max_concurrency = max(1, min(max_concurrency, getattr(embeddings, "max_concurrency", max_concurrency)))
+        self.max_retries = max(0, max_retries)
+        self.on_batch = on_batch
+        self.id_fn = id_fn or (lambda _doc: str(uuid4()))
+        self.written = 0
+
+    def _embed_with_retry(self, batch: Batch) -> List[List[float]]:
+        texts = [d.page_content for d in batch]
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("Embedding batch failed (%s); retrying in %ss", e, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def _write_batch(self, batch: Batch, vectors: List[List[float]]) -> None:
+        self.collection.upsert(
+            ids=[self.id_fn(d) for d in batch],
+            embeddings=vectors,
+            documents=[d.page_content for d in batch],
+            metadatas=[d.metadata or {} for d in batch],
+        )
+        self.written += len(batch)
+        if self.on_batch:
+            self.on_batch(self.written, batch)
+
+    def write(self, docs: Iterable[Document]) -> int:
+        """Embed and write all `docs`. Returns the number of chunks written.
+
+        `docs` is consumed lazily, so at most `max_concurrency` batches are
+        held in memory at any time.
+        """
+        pending: Dict[Future, Batch] = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed") as pool:
+            try:
+                for batch in _batched(docs, self.batch_size):
+                    if len(pending) >= self.max_concurrency:
+                        self._drain(pending, return_when=FIRST_COMPLETED)
+                    pending[pool.submit(self._embed_with_retry, batch)] = batch
+                while pending:
+                    self._drain(pending, return_when=FIRST_COMPLETED)
+            except Exception:
+                for fut in pending:
+                    fut.cancel()
+                raise
+        return self.written
+
+    def _drain(self, pending: Dict[Future, Batch], return_when) -> None:
+        done, _ = wait(list(pending), return_when=return_when)
+        for fut in done:
+            batch = pending.pop(fut)
+            self._write_batch(batch, fut.result())
@@ -0,0 +1,149 @@
+"""Embedding backends, selectable per collection.
+
+A backend is named by a spec string:
+
+- "openai" or "openai:<model>": OpenAI API through `langchain_openai`
+- "local:<model>": a sentence-transformers model run in-process on CPU
+  (e.g. "local:all-MiniLM-L6-v2", "local:BAAI/bge-small-en-v1.5")
+
+Both return LangChain `Embeddings`, so the ingest writer, the embedding
+cache and the LangChain `Chroma` retriever work unchanged.
+
+Each Chroma collection records the spec it was built with in its metadata
+(`embedding_model`); writes and queries for that collection always use it.
+New collections take their project's choice or `EMBEDDING_MODEL`.
+
+Notes
+- Local models are loaded lazily, once per process, and run with
+  `LOCAL_EMBED_THREADS` intra-op threads. They advertise
+  `max_concurrency = 1` so the ingest writer does not run several CPU-bound
+  batches at once and oversubscribe the cores.
+- Instances are cached per spec; OpenAI clients reuse their HTTP pool.
+- Searches embed through `get_query_embeddings`, which adds the
+  query-embedding cache (see `app.services.embedding_cache`).
+"""
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import EMBEDDING_MODEL, LOCAL_EMBED_BATCH_SIZE, LOCAL_EMBED_THREADS
+from app.services.embedding_cache import QueryEmbeddings
+
+BACKENDS = ("openai", "local")
+# Legacy collections (no recorded model) were all written with OpenAI
+LEGACY_EMBEDDING_MODEL = "openai"
+
+
+def parse_spec(spec: str) -> Tuple[str, str]:
+    """Split "backend:model" and validate it. Raises ValueError."""
+    backend, _, model = (spec or "").strip().partition(":")
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'; expected one of {', '.join(BACKENDS)}.")
+    if backend == "local" and not model:
+        raise ValueError("Local embedding spec needs a model name, e.g. 'local:all-MiniLM-L6-v2'.")
+    return backend, model
+
+
+def normalize_spec(spec: str) -> str:
+    backend, model = parse_spec(spec)
+    return f"{backend}:{model}" if model else backend
+
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def _load_sentence_transformer(model_name: str):
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            import torch
+            from sentence_transformers import SentenceTransformer
+
+            torch.set_num_threads(max(1, LOCAL_EMBED_THREADS))
+            model = _models[model_name] = SentenceTransformer(model_name, device="cpu")
+        return model
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers model on CPU with batched inference."""
+
+    # one CPU-bound batch at a time; parallelism comes from torch threads
+    max_concurrency = 1
+
+    def __init__(self, model_name: str, batch_size: int = LOCAL_EMBED_BATCH_SIZE):
+        self.model_name = model_name
+        self.model = f"local:{model_name}"
+        self.batch_size = max(1, batch_size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = _load_sentence_transformer(self.model_name).encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+_instances: Dict[str, Embeddings] = {}
+_instances_lock = threading.Lock()
+
+
+def get_embeddings(spec: str = EMBEDDING_MODEL) -> Embeddings:
+    """Process-wide Embeddings instance for `spec`."""
+    spec = normalize_spec(spec)
+    with _instances_lock:
+        emb = _instances.get(spec)
+        if emb is None:
+            backend, model = parse_spec(spec)
+            if backend == "local":
+                emb = LocalEmbeddings(model)
+            else:
+                from langchain_openai import OpenAIEmbeddings
+
+                emb = OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+            _instances[spec] = emb
+        return emb
+
+
+_query_instances: Dict[str, Embeddings] = {}
+
+
+def get_query_embeddings(spec: str = EMBEDDING_MODEL) -> Embeddings:
+    """Process-wide Embeddings for search queries with `spec`, served from the
+    query-embedding cache."""
+    spec = normalize_spec(spec)
+    with _instances_lock:
+        emb = _query_instances.get(spec)
+    if emb is None:
+        emb = QueryEmbeddings(get_embeddings(spec))
+        with _instances_lock:
+            emb = _query_instances.setdefault(spec, emb)
+    return emb
+
+
+def collection_embedding_model(collection, default: str | None = None) -> str:
+    """Spec recorded on a chromadb collection; records one if missing.
+
+    Empty collections get `default` (or EMBEDDING_MODEL); collections that
+    already hold vectors but no record predate this and were built with OpenAI.
+    """
+    meta = dict(collection.metadata or {})
+    spec = meta.get("embedding_model")
+    if spec:
+        return spec
+    spec = normalize_spec(default or EMBEDDING_MODEL) if collection.count() == 0 else LEGACY_EMBEDDING_MODEL
+    meta["embedding_model"] = spec
+    collection.modify(metadata=meta)
+    return spec
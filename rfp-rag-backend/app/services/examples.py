@@ -2,55 +2,72 @@
 
 Responsibilities
 - Save uploaded files into EXAMPLES_DIRECTORY
-- Extract text (PDF or DOCX; fallback to plain text)
+- Extract text (PDF or DOCX; fallback to plain text), through the
+  parsed-text cache so a file already parsed elsewhere is not parsed again
 - Slice into rough sections and persist to SQL (proposal_examples, example_sections)
-- Upsert section texts into the Chroma `EXAMPLES_COLLECTION` with useful metadata
+- Sub-chunk section texts and add them to the Chroma `EXAMPLES_COLLECTION`
+  with useful metadata (each chunk carries its `section_id`)
 
 Notes
 - Section splitting is intentionally simple (regex on common headings) but
   can be upgraded later (LLM-aided classifier) without changing call sites.
-- We index section-level texts so retrieval for a given `section_key` is clean.
+- Chunks are filtered by `section_key` so retrieval for a given section is
+  clean; chunk size stays inside the embedder's input window, so long
+  sections are no longer silently truncated.
+- Section rows are bulk-inserted in one transaction with `tokens` filled in.
+- Multi-file uploads (`ingest_example_files`) extract files concurrently
+  and embed their chunks in shared batches; the upload route runs them as a
+  background ingest batch with one status endpoint.
 """
 from __future__ import annotations
 
+import importlib.metadata
+import logging
 import os
 import re
-from typing import List, Tuple
-from uuid import uuid4
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
 
-from chromadb import PersistentClient
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from sqlalchemy.orm import Session
 
-from app.core.config import DB_DIRECTORY, EXAMPLES_DIRECTORY, EXAMPLES_COLLECTION
+from app.core.config import (
+    EXAMPLES_DIRECTORY,
+    EXAMPLES_COLLECTION,
+    EXAMPLE_CHUNK_TOKENS,
+    EXAMPLE_CHUNK_OVERLAP_TOKENS,
+    EMBED_BATCH_SIZE,
+    EXAMPLE_INGEST_CONCURRENCY,
+)
+from database import SessionLocal
 from app.models.examples import ProposalExample, ExampleSection
+from app.services.document_service import num_tokens_from_string
+from app.services import text_cache, vectorstore
+from app.services.pdf_extract import extract_page_texts
 
 # Lightweight extractors
-from pypdf import PdfReader
 import docx
 
-# Single persistent Chroma client
-_client = PersistentClient(path=DB_DIRECTORY)
-
+logger = logging.getLogger("uvicorn.error")
 
 def _ensure_examples_collection():
-    try:
-        return _client.get_collection(EXAMPLES_COLLECTION)
-    except Exception:
-        return _client.create_collection(EXAMPLES_COLLECTION)
+    return vectorstore.default_collection(EXAMPLES_COLLECTION)
 
 
 # ---------------------------
 # Text extraction
 # ---------------------------
 
-def _extract_text_pdf(path: str) -> str:
-    reader = PdfReader(path)
-    return "\n".join([p.extract_text() or "" for p in reader.pages])
-
-
 def _extract_text_docx(path: str) -> str:
-    d = docx.Document(path)
-    return "\n".join([p.text for p in d.paragraphs])
+    def _parse():
+        d = docx.Document(path)
+        return ["\n".join([p.text for p in d.paragraphs])]
+
+    # cached like PDF pages (one "page" per document)
+    version = f"python-docx-{importlib.metadata.version('python-docx')}"
+    return "\n".join(text_cache.read_through(path, version, _parse))
 
 
 # ---------------------------
@@ -113,20 +130,27 @@ def _split_sections(text: str) -> List[Tuple[str, str]]:
     return sections or [("full_document", text)]
 
 
+def _subchunk(body: str) -> List[str]:
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="cl100k_base",
+        chunk_size=EXAMPLE_CHUNK_TOKENS,
+        chunk_overlap=EXAMPLE_CHUNK_OVERLAP_TOKENS,
+        separators=["\n\n", "\n", ". ", " "],
+    )
+    return [c for c in splitter.split_text(body) if c.strip()] or [body]
+
+
 # ---------------------------
 # Ingest pipeline
 # ---------------------------
 
-def ingest_example_file(db: Session, file_path: str, meta: dict) -> str:
-    """Persist an uploaded example and index its sections into Chroma.
+def create_example(db: Session, file_path: str, meta: dict) -> ProposalExample:
+    """Move an uploaded file into EXAMPLES_DIRECTORY and create its (queued) row.
 
     Args:
         db: SQLAlchemy session
         file_path: temporary path of the uploaded file
         meta: dict with optional keys (title, client_type, domain, contract_vehicle, complexity_tier, tags)
-
-    Returns:
-        The new example's UUID string.
     """
     os.makedirs(EXAMPLES_DIRECTORY, exist_ok=True)
     filename = os.path.basename(file_path)
@@ -145,7 +169,6 @@ def ingest_example_file(db: Session, file_path: str, meta: dict) -> str:
             except Exception:
                 pass
 
-    # Create DB row for the example
     ex = ProposalExample(
         title=meta.get("title") or filename,
         source_path=target,
@@ -159,54 +182,264 @@ def ingest_example_file(db: Session, file_path: str, meta: dict) -> str:
     db.add(ex)
     db.commit()
     db.refresh(ex)
+    return ex
 
-    # Extract text per file type
-    lower = filename.lower()
+
+def _extract_text(path: str) -> Tuple[str, int]:
+    """(text, pages) of an example file, by file type."""
+    lower = path.lower()
     if lower.endswith(".pdf"):
-        text = _extract_text_pdf(target)
-    elif lower.endswith(".docx"):
-        text = _extract_text_docx(target)
-    else:
-        with open(target, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
-
-    # Split and persist sections
+        pages = extract_page_texts(path)
+        return "\n".join(pages), len(pages)
+    if lower.endswith(".docx"):
+        return _extract_text_docx(path), 1
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read(), 1
+
+
+def _prepare_example(db: Session, ex: ProposalExample) -> Tuple[List[str], List[str], List[dict], int]:
+    """Extract and section one example; persist its section rows and return
+    the Chroma payloads (ids, documents, metadatas) plus its page count."""
+    text, pages = _extract_text(ex.source_path)
+
+    # Split and persist sections (one bulk insert, one transaction)
     sections = _split_sections(text)
-    col = _ensure_examples_collection()
 
+    rows: List[dict] = []
     ids: List[str] = []
     docs: List[str] = []
     metas: List[dict] = []
 
+    # Chroma rejects None metadata values, so only set filters that are present
+    base_meta = {
+        k: v
+        for k, v in {
+            "example_id": str(ex.id),
+            "client_type": ex.client_type,
+            "domain": ex.domain,
+            "contract_vehicle": ex.contract_vehicle,
+            "complexity_tier": ex.complexity_tier,
+        }.items()
+        if v is not None
+    }
+
     for section_key, body in sections:
-        row = ExampleSection(example_id=ex.id, section_key=section_key, text=body)
-        db.add(row)
-        # Prepare Chroma payloads
-        ids.append(str(uuid4()))
-        docs.append(body)
-        metas.append(
+        section_id = uuid4()
+        rows.append(
             {
-                "example_id": str(ex.id),
+                "id": section_id,
+                "example_id": ex.id,
                 "section_key": section_key,
-                "client_type": ex.client_type,
-                "domain": ex.domain,
-                "contract_vehicle": ex.contract_vehicle,
-                "complexity_tier": ex.complexity_tier,
+                "text": body,
+                "tokens": num_tokens_from_string(body),
             }
         )
-
+        # Prepare Chroma payloads: one entry per sub-chunk, linked to its section row
+        for i, chunk in enumerate(_subchunk(body)):
+            ids.append(str(uuid4()))
+            docs.append(chunk)
+            metas.append(
+                {
+                    **base_meta,
+                    "section_id": str(section_id),
+                    "section_key": section_key,
+                    "chunk_index": i,
+                    "tokens": num_tokens_from_string(chunk),
+                }
+            )
+
+    db.bulk_insert_mappings(ExampleSection, rows)
     db.commit()
+    return ids, docs, metas, pages
 
-    # Vectorize section bodies
-    if docs:
-        try:
-            col.add(ids=ids, documents=docs, metadatas=metas)
-        except Exception:
-            # If Chroma throws on malformed docs, skip indexing but keep DB rows
-            pass
+
+def _index_chunks(col, ids: List[str], docs: List[str], metas: List[dict]) -> Optional[str]:
+    """Add one batch to the examples collection (embedded by its default
+    embedder). Returns None on success, else the error, which is logged
+    rather than raised so the caller can mark the examples failed."""
+    try:
+        col.add(ids=ids, documents=docs, metadatas=metas)
+        return None
+    except Exception as e:
+        owners = sorted({m.get("example_id") for m in metas})
+        logger.warning("Indexing %d example chunks (%s) failed: %s", len(ids), ", ".join(owners), e)
+        return str(e) or type(e).__name__
+
+
+def _drop_chunks(col, example_id: str) -> None:
+    """Remove what a failed example had indexed, so search never sees part of it."""
+    try:
+        col.delete(where={"example_id": example_id})
+    except Exception as e:
+        logger.warning("Could not remove indexed chunks of example %s: %s", example_id, e)
+
+
+def _set_status(db: Session, example_id: str, status: str) -> None:
+    ex = db.query(ProposalExample).filter(ProposalExample.id == UUID(example_id)).first()
+    if ex is not None:
+        ex.ingest_status = status
+        db.commit()
+
+
+def fail_unfinished(db: Session, source_path: str) -> None:
+    """Mark the example stored at `source_path` failed if its ingest never
+    finished (the worker running it died)."""
+    ex = db.query(ProposalExample).filter(ProposalExample.source_path == source_path).first()
+    if ex is not None and ex.ingest_status not in ("done", "failed"):
+        ex.ingest_status = "failed"
+        db.commit()
+
+
+def ingest_example_file(db: Session, file_path: str, meta: dict) -> str:
+    """Persist an uploaded example and index its sections into Chroma.
+
+    Args:
+        db: SQLAlchemy session
+        file_path: temporary path of the uploaded file
+        meta: dict with optional keys (title, client_type, domain, contract_vehicle, complexity_tier, tags)
+
+    Returns:
+        The new example's UUID string.
+
+    Raises:
+        RuntimeError: indexing failed; the example is kept with ingest_status "failed".
+    """
+    ex = create_example(db, file_path, meta)
+    ids, docs, metas, _pages = _prepare_example(db, ex)
+    col = _ensure_examples_collection()
+
+    # Vectorize section chunks in batches
+    for i in range(0, len(docs), EMBED_BATCH_SIZE):
+        error = _index_chunks(col, ids[i : i + EMBED_BATCH_SIZE], docs[i : i + EMBED_BATCH_SIZE], metas[i : i + EMBED_BATCH_SIZE])
+        if error is not None:
+            _drop_chunks(col, str(ex.id))
+            _set_status(db, str(ex.id), "failed")
+            raise RuntimeError(f"Indexing example {ex.id} failed: {error}")
 
     ex.ingest_status = "done"
     db.add(ex)
     db.commit()
 
     return str(ex.id)
+
+
+def _noop_progress(status: str, **counts) -> None:
+    pass
+
+
+def ingest_example_files(
+    example_ids: List[str],
+    progress_for: Optional[Callable[[str], Callable[..., None]]] = None,
+) -> Dict[str, dict]:
+    """Ingest many already-created examples (see `create_example`) as one pipeline.
+
+    Up to EXAMPLE_INGEST_CONCURRENCY files are extracted and sectioned at a
+    time; their chunks join one stream that is embedded in EMBED_BATCH_SIZE
+    batches spanning files, so a library of short proposals costs a few
+    full batches instead of one small batch per file. An example is "done"
+    once its last chunk is written; one that fails to extract, or whose
+    chunks fail to index, is reported as "failed" (its indexed chunks are
+    removed) without stopping the others. `progress_for(example_id)`
+    returns that example's progress callback (status, **counters).
+
+    Returns {example_id: counters-or-error}.
+    """
+    progress_for = progress_for or (lambda _id: _noop_progress)
+    col = _ensure_examples_collection()
+    results: Dict[str, dict] = {}
+    remaining: Dict[str, int] = {}
+    buffer: List[Tuple[str, str, dict]] = []
+    failed: Set[str] = set()
+
+    def _prepare(example_id: str):
+        db = SessionLocal()
+        try:
+            ex = db.query(ProposalExample).filter(ProposalExample.id == UUID(example_id)).first()
+            if ex is None:
+                raise FileNotFoundError(f"Example {example_id} not found")
+            ex.ingest_status = "processing"
+            db.commit()
+            return _prepare_example(db, ex)
+        except Exception:
+            db.rollback()
+            _set_status(db, example_id, "failed")
+            raise
+        finally:
+            db.close()
+
+    def _finish(example_id: str) -> None:
+        result = results[example_id]
+        db = SessionLocal()
+        try:
+            _set_status(db, example_id, "done")
+        finally:
+            db.close()
+        progress_for(example_id)("done", **result)
+
+    def _fail(example_id: str, error: str) -> None:
+        failed.add(example_id)
+        results[example_id] = {"error": error}
+        db = SessionLocal()
+        try:
+            _set_status(db, example_id, "failed")
+        finally:
+            db.close()
+        progress_for(example_id)("failed", error=error)
+
+    def _flush(batch: List[Tuple[str, str, dict]]) -> None:
+        # chunks of an example that already failed are not written
+        batch = [b for b in batch if b[2]["example_id"] not in failed]
+        if not batch:
+            return
+        written: Dict[str, int] = defaultdict(int)
+        for _cid, _doc, meta in batch:
+            written[meta["example_id"]] += 1
+        error = _index_chunks(col, [b[0] for b in batch], [b[1] for b in batch], [b[2] for b in batch])
+        if error is not None:
+            # every example in the batch is incomplete now
+            for example_id in written:
+                _drop_chunks(col, example_id)
+                _fail(example_id, error)
+            return
+        for example_id, n in written.items():
+            results[example_id]["chunks_embedded"] += n
+            remaining[example_id] -= n
+            if remaining[example_id]:
+                progress_for(example_id)("embedding", **results[example_id])
+            else:
+                _finish(example_id)
+
+    for example_id in example_ids:
+        progress_for(example_id)("extracting")
+    with ThreadPoolExecutor(
+        max_workers=max(1, EXAMPLE_INGEST_CONCURRENCY), thread_name_prefix="example"
+    ) as pool:
+        futures = {pool.submit(_prepare, example_id): example_id for example_id in example_ids}
+        # chunks are embedded on this thread while other files are still being extracted
+        for future in as_completed(futures):
+            example_id = futures[future]
+            try:
+                ids, docs, metas, pages = future.result()
+            except Exception as e:
+                logger.error("Example ingest failed for %s: %s", example_id, e)
+                results[example_id] = {"error": str(e)}
+                progress_for(example_id)("failed", error=str(e))
+                continue
+            results[example_id] = {"pages": pages, "chunks_total": len(ids), "chunks_embedded": 0}
+            remaining[example_id] = len(ids)
+            if not ids:
+                _finish(example_id)
+                continue
+            progress_for(example_id)("embedding", **results[example_id])
+            buffer.extend(zip(ids, docs, metas))
+            while len(buffer) >= EMBED_BATCH_SIZE:
+                _flush(buffer[:EMBED_BATCH_SIZE])
+                del buffer[:EMBED_BATCH_SIZE]
+    if buffer:
+        _flush(buffer)
+    logger.info(
+        "Ingested %d/%d examples (%d chunks)",
+        sum(1 for r in results.values() if "error" not in r), len(example_ids),
+        sum(r.get("chunks_total", 0) for r in results.values()),
+    )
+    return results
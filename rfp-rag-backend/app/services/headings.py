@@ -0,0 +1,157 @@
+"""Heading detection and section tracking for solicitation documents.
+
+RFPs are deeply structured (Section L, L.4, L.4.2, C.3.1, 3.1.2 ...). This
+module recognizes heading lines while pages are read in order, and cuts each
+page into segments that belong to exactly one section. Every segment is
+tagged with:
+
+- `section_path`: human-readable breadcrumb, e.g.
+  "SECTION L Instructions > L.4 Proposal Volumes > L.4.2 Technical Volume"
+- `parent_id`: stable id of the innermost section, used to fetch the whole
+  enclosing section at retrieval time (parent-document retrieval)
+
+The accumulated section texts are available from `SectionTracker.sections()`
+once all pages have been fed.
+
+Notes
+- Detection is regex based and deliberately conservative: long lines,
+  sentences (trailing period/comma) and table-of-contents entries (dot
+  leaders or trailing page numbers) are not treated as headings.
+- Text before the first heading has no section and no `parent_id`.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# "SECTION L - INSTRUCTIONS, CONDITIONS AND NOTICES TO OFFERORS"
+_SECTION_RE = re.compile(r"^SECTION\s+([A-M])\b[\s\-–—:.]*(.*)$", re.IGNORECASE)
+# "L.4.2 Technical Volume", "C.3.1. Scope"
+_LETTERED_RE = re.compile(r"^([A-M])\.(\d{1,2}(?:\.\d{1,2}){0,4})\.?\s+([A-Z(].*)$")
+# "3.1.2 Program Management", "4. EVALUATION FACTORS"
+_NUMBERED_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,4})\.?\s+([A-Z(].*)$")
+# table-of-contents lines: dot leaders or a trailing page number
+_TOC_RE = re.compile(r"(\.{4,}|\s\d{1,4}$)")
+
+MAX_HEADING_CHARS = 100
+MAX_TITLE_CHARS = 80
+
+
+@dataclass
+class _Heading:
+    parts: Tuple[str, ...]
+    label: str
+    is_section_root: bool = False
+
+
+@dataclass
+class SectionRecord:
+    id: str
+    section_path: str
+    page_start: int
+    page_end: int
+    texts: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(t for t in self.texts if t.strip())
+
+
+def parse_heading(line: str) -> Optional[_Heading]:
+    """Return a heading descriptor if `line` looks like a section heading."""
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS or line.endswith((".", ",", ";")) or _TOC_RE.search(line):
+        return None
+    m = _SECTION_RE.match(line)
+    if m:
+        letter = m.group(1).upper()
+        title = m.group(2).strip()[:MAX_TITLE_CHARS]
+        return _Heading((letter,), f"SECTION {letter} {title}".strip(), is_section_root=True)
+    m = _LETTERED_RE.match(line)
+    if m:
+        letter, num, title = m.group(1), m.group(2), m.group(3)
+        return _Heading((letter,) + tuple(num.split(".")), f"{letter}.{num} {title[:MAX_TITLE_CHARS]}")
+    m = _NUMBERED_RE.match(line)
+    if m:
+        num, title = m.group(1), m.group(2)
+        # a bare "1 Something" is too ambiguous unless the title is upper-case
+        if "." not in num and not title.isupper():
+            return None
+        return _Heading(tuple(num.split(".")), f"{num} {title[:MAX_TITLE_CHARS]}")
+    return None
+
+
+class SectionTracker:
+    """Feed pages in order; get back per-section segments.
+
+    Args:
+        namespace: prefix that makes parent ids unique (e.g. collection + source).
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._stack: List[_Heading] = []
+        self._records: Dict[str, SectionRecord] = {}
+
+    def _push(self, h: _Heading) -> None:
+        if h.is_section_root:
+            self._stack = [h]
+            return
+        # keep only ancestors: "SECTION X" roots survive numeric children,
+        # otherwise an entry must be a numbering prefix of the new heading
+        while self._stack:
+            top = self._stack[-1]
+            is_prefix = len(top.parts) < len(h.parts) and h.parts[: len(top.parts)] == top.parts
+            if is_prefix or (top.is_section_root and not h.parts[0].isalpha()):
+                break
+            if top.is_section_root and h.parts[0] == top.parts[0]:
+                break
+            self._stack.pop()
+        self._stack.append(h)
+
+    def _current(self) -> Tuple[Optional[str], Optional[str]]:
+        if not self._stack:
+            return None, None
+        path = " > ".join(h.label for h in self._stack)
+        key = "/".join(".".join(h.parts) for h in self._stack)
+        pid = hashlib.sha256(f"{self.namespace}\x00{key}".encode("utf-8")).hexdigest()[:32]
+        return path, pid
+
+    def segment(self, page: Document) -> List[Document]:
+        """Split one page into Documents that each sit inside a single section."""
+        page_no = int(page.metadata.get("page", 0))
+        segments: List[Document] = []
+        buf: List[str] = []
+
+        def _flush() -> None:
+            text = "\n".join(buf)
+            buf.clear()
+            if not text.strip():
+                return
+            path, pid = self._current()
+            meta = dict(page.metadata)
+            if pid:
+                meta["section_path"] = path
+                meta["parent_id"] = pid
+                rec = self._records.get(pid)
+                if rec is None:
+                    rec = self._records[pid] = SectionRecord(pid, path, page_no, page_no)
+                rec.texts.append(text)
+                rec.page_end = page_no
+            segments.append(Document(page_content=text, metadata=meta))
+
+        for line in (page.page_content or "").splitlines():
+            heading = parse_heading(line)
+            if heading:
+                _flush()
+                self._push(heading)
+            buf.append(line)
+        _flush()
+        return segments
+
+    def sections(self) -> List[SectionRecord]:
+        return list(self._records.values())
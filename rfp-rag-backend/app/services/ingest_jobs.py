@@ -0,0 +1,374 @@
+"""Background ingestion jobs for uploaded documents.
+
+Uploads are saved to disk and handed to a bounded worker pool so the HTTP
+request returns immediately with a job id. The worker runs the normal
+`process_document` pipeline and records its progress on an `ingest_jobs` row:
+
+    queued -> extracting -> splitting -> embedding -> writing -> done | failed
+
+Job state lives in SQL (not in memory) so any gunicorn worker can answer a
+status request (or stream progress events), regardless of which worker is
+running the job. A finished document gets its digest (see
+`app.services.digests`) built in the background.
+
+The worker that queued a job bumps its row's `updated_at` every
+INGEST_HEARTBEAT_SECONDS until it finishes. Jobs live only in that worker's
+pool, so on startup `recover_stale_jobs` marks failed every unfinished job
+(and its registry row) whose heartbeat stopped INGEST_STALE_SECONDS ago.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+from app.core.config import EXAMPLES_COLLECTION, INGEST_HEARTBEAT_SECONDS, INGEST_STALE_SECONDS, INGEST_WORKERS
+from app.services.digests import schedule_digest
+from app.services.document_service import process_document, process_documents, record_document
+from app.services.examples import create_example, fail_unfinished, ingest_example_files
+
+logger = logging.getLogger("uvicorn.error")
+
+# Process-wide pool; bounded so a burst of uploads cannot starve the web workers
+_executor = ThreadPoolExecutor(max_workers=max(1, INGEST_WORKERS), thread_name_prefix="ingest")
+
+
+# Running stages in pipeline order, then terminal states
+STAGES = ("queued", "extracting", "splitting", "embedding", "writing")
+FINISHED = ("done", "failed")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Jobs this process has queued or is running; their rows get a heartbeat
+_live: Set[str] = set()
+_live_lock = threading.Lock()
+_heartbeat: Optional[threading.Thread] = None
+
+
+def _beat() -> None:
+    while True:
+        time.sleep(INGEST_HEARTBEAT_SECONDS)
+        with _live_lock:
+            job_ids = list(_live)
+        if not job_ids:
+            continue
+        db = SessionLocal()
+        try:
+            crud.touch_ingest_jobs(db, job_ids)
+        except Exception as e:
+            logger.warning("Ingest heartbeat failed: %s", e)
+            db.rollback()
+        finally:
+            db.close()
+
+
+def _track(job_ids: Iterable[str]) -> None:
+    global _heartbeat
+    with _live_lock:
+        _live.update(job_ids)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="ingest-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+def _untrack(job_ids: Iterable[str]) -> None:
+    with _live_lock:
+        _live.difference_update(job_ids)
+
+
+def _is_stale(ts: Optional[datetime]) -> bool:
+    """No heartbeat since `ts` for longer than INGEST_STALE_SECONDS (the worker died)."""
+    if ts is None:
+        return True
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (_now() - ts).total_seconds() > INGEST_STALE_SECONDS
+
+
+def recover_stale_jobs() -> int:
+    """Mark failed the unfinished jobs whose worker died, and the registry rows
+    (or examples) they were ingesting; the uploaded files stay on disk, so
+    they can be uploaded again. Returns the number of jobs failed."""
+    error = "Interrupted: the worker running this job stopped."
+    db = SessionLocal()
+    try:
+        stale = [j for j in crud.get_unfinished_ingest_jobs(db) if _is_stale(j.updated_at or j.created_at)]
+        for job in stale:
+            crud.update_ingest_job(db, job.id, status="failed", error=error, finished_at=_now())
+            if job.collection_name == EXAMPLES_COLLECTION:
+                fail_unfinished(db, job.file_path)
+        stale_ids = {j.id for j in stale}
+        for doc in crud.get_ingested_documents_with_status(db, ["queued", "processing"]):
+            # rows without a job come from synchronous ingests (e.g. the knowledge base)
+            orphaned = doc.job_id in stale_ids or (
+                doc.job_id is None and _is_stale(doc.started_at or doc.created_at)
+            )
+            if orphaned:
+                crud.upsert_ingested_document(
+                    db, doc.id, doc.collection_name, doc.source, status="failed", error=error, finished_at=_now()
+                )
+    finally:
+        db.close()
+    if stale:
+        logger.warning("Marked %d interrupted ingest job(s) failed", len(stale))
+    return len(stale)
+
+
+def enqueue_document(
+    db: Session,
+    file_path: str,
+    collection_name: str,
+    document_name: str,
+    replaces: Optional[str] = None,
+):
+    """Create a queued job row and schedule ingestion. Returns the job row.
+
+    `replaces` is the path of a previous version of this document; its
+    vectors are diffed against the new file and the old file is removed
+    once ingestion succeeds.
+    """
+    job = crud.create_ingest_job(
+        db,
+        job_id=uuid4().hex,
+        collection_name=collection_name,
+        document_name=document_name,
+        file_path=file_path,
+        replaces=replaces,
+    )
+    record_document(collection_name, file_path, document_name=document_name, status="queued", job_id=job.id)
+    _track([job.id])
+    _executor.submit(_run_job, job.id, file_path, collection_name, replaces)
+    return job
+
+
+def _run_job(job_id: str, file_path: str, collection_name: str, replaces: Optional[str] = None) -> None:
+    db = SessionLocal()
+    try:
+        crud.update_ingest_job(db, job_id, status="extracting", started_at=_now())
+
+        def _progress(status: str, **counts) -> None:
+            crud.update_ingest_job(db, job_id, status=status, **counts)
+
+        result = process_document(file_path, collection_name=collection_name, progress=_progress, replaces=replaces)
+        if replaces and os.path.abspath(replaces) != os.path.abspath(file_path):
+            crud.delete_document_digests(db, collection_name, os.path.abspath(replaces))
+            if os.path.isfile(replaces):
+                os.remove(replaces)
+        crud.update_ingest_job(db, job_id, status="done", summary=result.get("summary"), finished_at=_now())
+        schedule_digest(collection_name, os.path.abspath(file_path))
+    except Exception as e:
+        logger.error("Ingest job %s failed:\n%s", job_id, traceback.format_exc())
+        db.rollback()
+        crud.update_ingest_job(db, job_id, status="failed", error=str(e), finished_at=_now())
+    finally:
+        _untrack([job_id])
+        db.close()
+
+
+def enqueue_batch(db: Session, files: List[Tuple[str, str]], collection_name: str) -> str:
+    """Queue many (file_path, document_name) pairs as one pipelined ingest.
+
+    Each file still gets its own job row (sharing a `batch_id`) so per-document
+    status works as usual; a path listed twice is queued once. Returns the
+    batch id.
+    """
+    batch_id = uuid4().hex
+    jobs: Dict[str, str] = {}  # job id -> file path
+    queued = set()
+    for file_path, document_name in files:
+        if os.path.abspath(file_path) in queued:
+            continue
+        queued.add(os.path.abspath(file_path))
+        job = crud.create_ingest_job(
+            db,
+            job_id=uuid4().hex,
+            collection_name=collection_name,
+            document_name=document_name,
+            file_path=file_path,
+            batch_id=batch_id,
+        )
+        record_document(collection_name, file_path, document_name=document_name, status="queued", job_id=job.id)
+        jobs[job.id] = file_path
+    _track(jobs)
+    _executor.submit(_run_batch, jobs, collection_name)
+    return batch_id
+
+
+def _run_batch(jobs: Dict[str, str], collection_name: str) -> None:
+    db = SessionLocal()
+    job_for = {file_path: job_id for job_id, file_path in jobs.items()}
+    try:
+        for job_id in jobs:
+            crud.update_ingest_job(db, job_id, status="extracting", started_at=_now())
+
+        def _progress_for(file_path: str):
+            job_id = job_for[file_path]
+
+            def _progress(status: str, **counts) -> None:
+                if status == "failed":
+                    counts["finished_at"] = _now()
+                crud.update_ingest_job(db, job_id, status=status, **counts)
+
+            return _progress
+
+        results = process_documents(list(job_for), collection_name=collection_name, progress_for=_progress_for)
+        for file_path, result in results.items():
+            if "error" not in result:
+                crud.update_ingest_job(
+                    db, job_for[file_path], status="done", summary=result.get("summary"), finished_at=_now()
+                )
+                schedule_digest(collection_name, os.path.abspath(file_path))
+    except Exception as e:
+        logger.error("Ingest batch for '%s' failed:\n%s", collection_name, traceback.format_exc())
+        db.rollback()
+        for job_id, file_path in jobs.items():
+            job = crud.get_ingest_job(db, job_id)
+            if job and job.status not in ("done", "failed"):
+                crud.update_ingest_job(db, job_id, status="failed", error=str(e), finished_at=_now())
+                record_document(collection_name, file_path, status="failed", error=str(e), finished_at=_now())
+    finally:
+        _untrack(jobs)
+        db.close()
+
+
+def enqueue_example_batch(db: Session, files: List[Tuple[str, dict]]) -> Tuple[str, List[str]]:
+    """Create example rows for uploaded (file_path, meta) pairs and queue them
+    as one pipelined ingest. Jobs live in the EXAMPLES_COLLECTION namespace
+    and share a `batch_id`. Returns (batch_id, example ids)."""
+    batch_id = uuid4().hex
+    jobs = {}
+    for file_path, meta in files:
+        ex = create_example(db, file_path, meta)
+        job = crud.create_ingest_job(
+            db,
+            job_id=uuid4().hex,
+            collection_name=EXAMPLES_COLLECTION,
+            document_name=os.path.basename(ex.source_path),
+            file_path=ex.source_path,
+            batch_id=batch_id,
+        )
+        jobs[str(ex.id)] = job.id
+    _track(jobs.values())
+    _executor.submit(_run_example_batch, jobs)
+    return batch_id, list(jobs)
+
+
+def _run_example_batch(jobs: dict) -> None:
+    db = SessionLocal()
+    try:
+        for job_id in jobs.values():
+            crud.update_ingest_job(db, job_id, status="extracting", started_at=_now())
+
+        def _progress_for(example_id: str):
+            job_id = jobs[example_id]
+
+            def _progress(status: str, **counts) -> None:
+                if status in FINISHED:
+                    counts["finished_at"] = _now()
+                crud.update_ingest_job(db, job_id, status=status, **counts)
+
+            return _progress
+
+        ingest_example_files(list(jobs), progress_for=_progress_for)
+    except Exception as e:
+        logger.error("Example ingest batch failed:\n%s", traceback.format_exc())
+        db.rollback()
+        for job_id in jobs.values():
+            job = crud.get_ingest_job(db, job_id)
+            if job and job.status not in FINISHED:
+                crud.update_ingest_job(db, job_id, status="failed", error=str(e), finished_at=_now())
+    finally:
+        _untrack(jobs.values())
+        db.close()
+
+
+def batch_status(batch_id: str, jobs: list) -> dict:
+    """Aggregate per-document job rows into one batch progress report."""
+    statuses = [j.status for j in jobs]
+    if all(s in FINISHED for s in statuses):
+        status = "failed" if statuses and all(s == "failed" for s in statuses) else "done"
+    else:
+        # report the least advanced stage that is still running
+        status = next((s for s in STAGES if s in statuses), "queued")
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "documents": len(jobs),
+        "documents_done": statuses.count("done"),
+        "documents_failed": statuses.count("failed"),
+        "pages": sum(j.pages or 0 for j in jobs),
+        "chunks_total": sum(j.chunks_total or 0 for j in jobs),
+        "chunks_embedded": sum(j.chunks_embedded or 0 for j in jobs),
+        "jobs": jobs,
+    }
+
+
+def _stage_message(job) -> str:
+    total = job.chunks_total or 0
+    if job.status == "splitting":
+        return f"extracted {job.pages or 0} pages"
+    if job.status == "embedding":
+        return f"split into {total} chunks, embedded {job.chunks_embedded or 0}/{total}"
+    if job.status == "writing":
+        return f"embedded {job.chunks_embedded or 0}/{total}, writing"
+    if job.status == "done":
+        return f"written ({total} chunks from {job.pages or 0} pages)"
+    if job.status == "failed":
+        return f"failed: {job.error}"
+    return job.status
+
+
+def job_event(job) -> Dict[str, object]:
+    """Serializable progress event for one job row."""
+    started = job.started_at
+    end = job.finished_at or _now()
+    if started is not None and started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return {
+        "job_id": job.id,
+        "batch_id": job.batch_id,
+        "document_name": job.document_name,
+        "status": job.status,
+        "message": _stage_message(job),
+        "pages": job.pages or 0,
+        "chunks_total": job.chunks_total or 0,
+        "chunks_embedded": job.chunks_embedded or 0,
+        "cache_hits": job.cache_hits or 0,
+        "elapsed_s": round((end - started).total_seconds(), 1) if started else None,
+        "timings": (job.summary or {}).get("timings") if job.status == "done" else None,
+    }
+
+
+def snapshot_events(collection_name: str, job_id: Optional[str] = None, batch_id: Optional[str] = None) -> List[dict]:
+    """Current progress events for a collection's recent jobs (or one job/batch).
+
+    Uses a short-lived session so long-running event streams do not pin a
+    database connection between polls.
+    """
+    db = SessionLocal()
+    try:
+        if job_id:
+            job = crud.get_ingest_job(db, job_id)
+            jobs = [job] if job else []
+        elif batch_id:
+            jobs = crud.get_ingest_jobs_for_batch(db, batch_id)
+        else:
+            jobs = crud.get_ingest_jobs_for_collection(db, collection_name)
+        return [job_event(j) for j in jobs if j.collection_name == collection_name]
+    finally:
+        db.close()
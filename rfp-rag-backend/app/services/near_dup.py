@@ -0,0 +1,113 @@
+"""SimHash near-duplicate detection for chunks.
+
+Solicitation packages repeat the same clauses across the RFP, the SOW and
+every amendment, and chunk overlap adds more repetition on top. Each chunk
+gets a 64-bit SimHash over word 3-shingles; two chunks whose fingerprints
+differ in at most `max_distance` bits are candidate duplicates (whether they
+are collapsed is decided on their text, see `app.services.near_dup_store`).
+
+Lookup uses the pigeonhole trick: the fingerprint is cut into
+`max_distance + 1` bands, and two fingerprints within that distance must
+agree exactly on at least one band. So a lookup only compares against
+entries that share a band, never against the whole index. `band_keys`
+names those bands as strings, so stored fingerprints can be kept in a
+table indexed by band and only the matching buckets loaded.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+
+import numpy as np
+
+BITS = 64
+_WORD_RE = re.compile(r"\w+")
+
+V = TypeVar("V")
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash of `text` (case/punctuation/whitespace insensitive)."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) >= shingle:
+        features = [" ".join(words[i : i + shingle]) for i in range(len(words) - shingle + 1)]
+    else:
+        features = [" ".join(words)]
+    hashes = np.fromiter((_feature_hash(f) for f in features), dtype="<u8", count=len(features))
+    # per-bit vote over all features; explicit little-endian keeps results portable
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    winners = bits.sum(axis=0, dtype=np.int64) * 2 > len(features)
+    return int(np.packbits(winners, bitorder="little").view("<u8")[0])
+
+
+def to_hex(h: int) -> str:
+    return f"{h:016x}"
+
+
+def from_hex(s: str) -> int:
+    return int(s, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex(Generic[V]):
+    """Banded index of fingerprints → values for near-duplicate lookup."""
+
+    def __init__(self, max_distance: int = 6):
+        self.max_distance = max(0, max_distance)
+        n_bands = self.max_distance + 1
+        width, extra = divmod(BITS, n_bands)
+        self._bands: List[Tuple[int, int]] = []
+        shift = 0
+        for i in range(n_bands):
+            w = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << w) - 1))
+            shift += w
+        self._buckets: Dict[Tuple[int, int], Set[Hashable]] = defaultdict(set)
+        self._entries: Dict[Hashable, Tuple[int, V]] = {}
+
+    def _keys(self, h: int):
+        return [(i, (h >> shift) & mask) for i, (shift, mask) in enumerate(self._bands)]
+
+    def band_keys(self, h: int) -> List[str]:
+        """Bucket names of `h`; they include the band count, so keys stored
+        under another `max_distance` never match."""
+        n_bands = len(self._bands)
+        return [f"{n_bands}:{i}:{value:x}" for i, value in self._keys(h)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Hashable, h: int, value: V) -> None:
+        self.remove(key)
+        self._entries[key] = (h, value)
+        for band in self._keys(h):
+            self._buckets[band].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in self._keys(entry[0]):
+            self._buckets[band].discard(key)
+
+    def find(self, h: int) -> Optional[V]:
+        """Closest stored value within `max_distance` bits of `h`, if any."""
+        best: Optional[Tuple[int, V]] = None
+        for band in self._keys(h):
+            for key in self._buckets.get(band, ()):
+                other, value = self._entries[key]
+                d = hamming(h, other)
+                if d <= self.max_distance and (best is None or d < best[0]):
+                    best = (d, value)
+                    if d == 0:
+                        return value
+        return best[1] if best else None
@@ -0,0 +1,399 @@
+"""Near-duplicate bookkeeping of a collection's stored chunks.
+
+Ingest collapses repeated chunks into one stored vector (see
+`app.services.near_dup` for the fingerprints). This module keeps the state
+that makes that safe across documents:
+
+- `chunk_fingerprints`: SimHash bands of every stored chunk, so a new chunk
+  only loads the stored chunks it could match, never the whole collection.
+- `chunk_refs`: the [source, page] of every chunk folded into a stored one.
+  They are mirrored on the vector as `refs` (JSON string) and `dup_count`.
+
+A match on fingerprints alone is not enough to collapse: legal text differs
+in a word ("shall" / "shall not", a date) while the SimHash barely moves. So
+with `NEAR_DUP_MAX_DISTANCE=0` (the default) only chunks whose text is equal
+after normalizing case and whitespace are collapsed. A larger distance also
+collapses near-copies, but only when their numbers, negations and modal
+verbs ("shall", "may", ...) are the same, in the same order.
+
+Notes
+- Deleting a vector that still stands in for other documents hands it to
+  its first remaining ref instead (`delete_or_promote`).
+- Callers hold `vectorstore.collection_lock`: refs are read-modify-write.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import re
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import crud
+from app.core.config import NEAR_DUP_MAX_DISTANCE
+from app.services import vectorstore
+from app.services.near_dup import SimHashIndex, from_hex
+from database import SessionLocal
+
+# words that flip or weaken a clause, plus numbers (dates, amounts, counts)
+_VARIANT_RE = re.compile(
+    r"\d[\d,.:/-]*|\b(?:not|no|never|nor|neither|none|without|cannot|\w+n't"
+    r"|shall|must|may|should|will|might|required|optional)\b"
+)
+
+
+def _load_refs(meta: Optional[dict]) -> List[list]:
+    try:
+        return json.loads((meta or {}).get("refs") or "[]")
+    except ValueError:
+        return []
+
+
+def _ref_meta(refs: List[list]) -> dict:
+    # Chroma metadata values must be scalars, so refs are stored as a JSON string
+    return {"refs": json.dumps(refs), "dup_count": 1 + len(refs)}
+
+
+def _refs_by_chunk(rows) -> Dict[str, List[list]]:
+    refs: Dict[str, List[list]] = defaultdict(list)
+    for r in rows:
+        refs[r.chunk_id].append([r.source, r.page])
+    return refs
+
+
+def _band_index() -> SimHashIndex:
+    return SimHashIndex(max(0, NEAR_DUP_MAX_DISTANCE))
+
+
+def _text_keys(text: str) -> Tuple[str, str]:
+    """(normalized text hash, hash of its numbers/negations/modals in order)."""
+    normalized = " ".join((text or "").lower().split())
+    variant = "\x00".join(_VARIANT_RE.findall(normalized))
+    return (
+        hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+        hashlib.sha256(variant.encode("utf-8")).hexdigest(),
+    )
+
+
+def ensure_fingerprints(collection) -> None:
+    """Index a collection's fingerprints and refs in SQL from its Chroma
+    metadata, once: for collections ingested before they were kept there,
+    or after NEAR_DUP_MAX_DISTANCE changed the band layout. Callers hold
+    the collection lock."""
+    logical = vectorstore.logical_name(collection)
+    index = _band_index()
+    n_bands = index.max_distance + 1
+    db = SessionLocal()
+    try:
+        row = crud.get_vector_collection(db, logical)
+        if row is None or row.fingerprint_bands == n_bands:
+            return
+        crud.delete_chunk_fingerprints(db, logical)
+        offset = 0
+        while True:
+            got = collection.get(include=["metadatas"], limit=500, offset=offset)
+            ids = got.get("ids") or []
+            if not ids:
+                break
+            offset += len(ids)
+            rows, refs = [], {}
+            for cid, meta in zip(ids, got.get("metadatas") or []):
+                if not meta or not meta.get("simhash"):
+                    continue
+                rows.append({
+                    "chunk_id": cid, "simhash": meta["simhash"], "source": meta.get("source"),
+                    "page": meta.get("page"), "band_keys": index.band_keys(from_hex(meta["simhash"])),
+                })
+                if _load_refs(meta):
+                    refs[cid] = _load_refs(meta)
+            crud.add_chunk_fingerprints(db, logical, rows)
+            crud.set_chunk_refs(db, logical, refs)
+        crud.update_vector_collection(db, logical, fingerprint_bands=n_bands)
+    finally:
+        db.close()
+
+
+class NearDuplicates:
+    """Collapse duplicate chunks into one stored vector per ingest run.
+
+    Only the stored chunks that share a band with a new chunk are loaded
+    (see `load`). A new chunk that matches a stored (or earlier admitted)
+    chunk is not embedded; its [source, page] is appended to that chunk's
+    `refs` instead. Admitted chunks are remembered by their metadata and
+    text keys only, so the index does not hold on to chunk text while a
+    large document streams through.
+
+    Args:
+        collection: chromadb collection being written.
+        id_fn: vector id of a chunk, from its metadata.
+        max_distance: SimHash bits two chunks may differ in; negative
+            collapses nothing but exact repeats on one page.
+    """
+
+    def __init__(self, collection, id_fn: Callable[[dict], str], max_distance: int = NEAR_DUP_MAX_DISTANCE):
+        self.enabled = max_distance >= 0
+        self.index: SimHashIndex = SimHashIndex(max(0, max_distance))
+        self.collection = collection
+        self.id_fn = id_fn
+        self.logical = vectorstore.logical_name(collection)
+        # stored chunks loaded so far, in Chroma metadata form (simhash/source/page/refs)
+        self.stored: Dict[str, dict] = {}
+        self.dirty: Set[str] = set()
+        self.new_canonicals: List[dict] = []
+        self._new_keys: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        # admitted new chunks (index key -> metadata); fingerprinted in SQL on flush
+        self._admitted: Dict[Tuple[str, int], dict] = {}
+        # text keys (see `_text_keys`) of admitted chunks and of stored chunks read back
+        self._text: Dict[object, Tuple[str, str]] = {}
+        self._seq = itertools.count()
+        self._forgotten: Dict[str, List[Tuple[str, list]]] = defaultdict(list)
+        self._exact: Set[Tuple] = set()
+        self._bands_loaded: Set[str] = set()
+        self._excluded: Set[str] = set()
+        if self.enabled:
+            ensure_fingerprints(collection)
+
+    def _remember(self, db, rows) -> None:
+        """Load stored chunks (fingerprint rows) not seen yet, with their refs."""
+        fresh = {r.chunk_id: r for r in rows if r.chunk_id not in self.stored}
+        if not fresh:
+            return
+        refs = _refs_by_chunk(crud.get_chunk_refs(db, self.logical, chunk_ids=list(fresh)))
+        for cid, r in fresh.items():
+            self.stored[cid] = {"simhash": r.simhash, "source": r.source, "page": r.page, **_ref_meta(refs.get(cid, []))}
+            if cid not in self._excluded:
+                self.index.add(cid, from_hex(r.simhash), cid)
+
+    def load(self, hashes: Iterable[int]) -> None:
+        """Load the stored chunks that could match any of `hashes` (same band)."""
+        if not self.enabled:
+            return
+        keys = [k for h in hashes for k in self.index.band_keys(h) if k not in self._bands_loaded]
+        if not keys:
+            return
+        keys = list(dict.fromkeys(keys))
+        self._bands_loaded.update(keys)
+        db = SessionLocal()
+        try:
+            for i in range(0, len(keys), 500):
+                self._remember(db, crud.get_chunk_fingerprints(db, self.logical, band_keys=keys[i : i + 500]))
+        finally:
+            db.close()
+
+    def _load_holders(self, sources: Set[str]) -> None:
+        """Load the stored chunks that hold refs to `sources`."""
+        if not self.enabled:
+            return
+        db = SessionLocal()
+        try:
+            held = {r.chunk_id for r in crud.get_chunk_refs(db, self.logical, sources=list(sources))}
+            held -= set(self.stored)
+            if held:
+                self._remember(db, crud.get_chunk_fingerprints(db, self.logical, chunk_ids=list(held)))
+        finally:
+            db.close()
+
+    def _same_text(self, match, keys: Tuple[str, str]) -> bool:
+        """Whether a fingerprint match may absorb a chunk with text `keys`."""
+        held = self._text.get(match)
+        if held is None:
+            got = self.collection.get(ids=[match], include=["documents"])
+            docs = got.get("documents") or []
+            if not docs or docs[0] is None:
+                return False
+            held = self._text[match] = _text_keys(docs[0])
+        if self.index.max_distance == 0:
+            return held[0] == keys[0]
+        return held[1] == keys[1]
+
+    def exclude(self, ids: Iterable[str]) -> None:
+        """Vectors that may be deleted must not absorb new chunks."""
+        for cid in ids:
+            self._excluded.add(cid)
+            self.index.remove(cid)
+
+    def restore(self, cid: str) -> None:
+        """A stored chunk turned out unchanged; it may absorb new chunks again."""
+        self._excluded.discard(cid)
+        meta = self.stored.get(cid)
+        if meta is not None:
+            self.index.add(cid, from_hex(meta["simhash"]), cid)
+
+    def _drop_refs(self, sources: Set[str], record: bool) -> None:
+        for cid, meta in self.stored.items():
+            refs = _load_refs(meta)
+            kept = [r for r in refs if r[0] not in sources]
+            if len(kept) != len(refs):
+                if record:
+                    for r in refs:
+                        if r[0] in sources:
+                            self._forgotten[r[0]].append((cid, r))
+                meta.update(_ref_meta(kept))
+                self.dirty.add(cid)
+        for meta in self.new_canonicals:
+            refs = _load_refs(meta)
+            kept = [r for r in refs if r[0] not in sources]
+            if len(kept) != len(refs):
+                meta.update(_ref_meta(kept))
+
+    def forget_sources(self, sources: Iterable[str]) -> None:
+        """Drop refs to `sources`; re-ingesting them re-adds what still exists."""
+        sources = set(sources)
+        self._load_holders(sources)
+        self._drop_refs(sources, record=True)
+
+    def abandon(self, source: str, previous: Iterable[str]) -> None:
+        """Undo a document whose ingest failed part-way: forget what it added
+        and give back the refs its earlier version held."""
+        for key in self._new_keys.pop(source, []):
+            self.index.remove(key)
+            self._admitted.pop(key, None)
+            self._text.pop(key, None)
+        self.new_canonicals = [m for m in self.new_canonicals if m.get("source") != source]
+        self._drop_refs({source}, record=False)
+        for src in previous:
+            for cid, ref in self._forgotten.pop(src, []):
+                meta = self.stored[cid]
+                refs = _load_refs(meta)
+                if ref not in refs:
+                    meta.update(_ref_meta(refs + [ref]))
+                    self.dirty.add(cid)
+
+    def admit(self, doc) -> bool:
+        """True if `doc` must be embedded; False if it was folded into another chunk."""
+        if not self.enabled:
+            # exact repeats on one page share a chunk id; write them once
+            key = (doc.metadata.get("source"), doc.metadata.get("page"), doc.metadata["chunk_hash"])
+            if key in self._exact:
+                return False
+            self._exact.add(key)
+            return True
+        h = from_hex(doc.metadata["simhash"])
+        self.load([h])
+        keys = _text_keys(doc.page_content)
+        match = self.index.find(h)
+        if match is None or not self._same_text(match, keys):
+            key = ("new", next(self._seq))
+            self.index.add(key, h, key)
+            self._new_keys[doc.metadata.get("source")].append(key)
+            self._admitted[key] = doc.metadata
+            self._text[key] = keys
+            return True
+        target = self.stored[match] if isinstance(match, str) else self._admitted[match]
+        ref = [doc.metadata.get("source"), doc.metadata.get("page")]
+        refs = _load_refs(target)
+        if ref not in refs and ref != [target.get("source"), target.get("page")]:
+            target.update(_ref_meta(refs + [ref]))
+            if isinstance(match, str):
+                self.dirty.add(match)
+            elif all(m is not target for m in self.new_canonicals):
+                self.new_canonicals.append(target)
+        return False
+
+    def flush(self, collection) -> None:
+        """Write changed refs, and fingerprints of admitted chunks, once all
+        new chunks are stored."""
+        refs = {cid: _load_refs(self.stored[cid]) for cid in self.dirty}
+        for meta in self.new_canonicals:
+            refs[self.id_fn(meta)] = _load_refs(meta)
+        fingerprints = [
+            {
+                "chunk_id": self.id_fn(meta), "simhash": meta["simhash"],
+                "source": meta.get("source"), "page": meta.get("page"),
+                "band_keys": self.index.band_keys(from_hex(meta["simhash"])),
+            }
+            for meta in self._admitted.values()
+        ]
+        # update() merges keys, so only refs/dup_count are touched
+        updates = [(cid, _ref_meta(held)) for cid, held in refs.items()]
+        for i in range(0, len(updates), 500):
+            part = updates[i : i + 500]
+            collection.update(ids=[u[0] for u in part], metadatas=[u[1] for u in part])
+        if fingerprints or refs:
+            db = SessionLocal()
+            try:
+                crud.add_chunk_fingerprints(db, self.logical, fingerprints)
+                crud.set_chunk_refs(db, self.logical, refs)
+            finally:
+                db.close()
+        # admitted chunks are stored now: index them by vector id like any stored chunk
+        for key, meta in self._admitted.items():
+            cid = self.id_fn(meta)
+            self.index.remove(key)
+            self.stored[cid] = {
+                "simhash": meta["simhash"], "source": meta.get("source"), "page": meta.get("page"),
+                **_ref_meta(_load_refs(meta)),
+            }
+            self.index.add(cid, from_hex(meta["simhash"]), cid)
+            self._text[cid] = self._text.pop(key)
+        self.dirty.clear()
+        self.new_canonicals.clear()
+        self._admitted.clear()
+        self._new_keys.clear()
+
+
+def delete_or_promote(
+    collection, ids: List[str], gone_sources: Iterable[str] = (), shadows: List = ()
+) -> Dict[str, List[str]]:
+    """Delete vectors by id (from `collection` and any `shadows` copies). A
+    vector that still stands in for near-duplicates elsewhere is handed to
+    its first remaining ref instead. Returns {new owner source: vector ids
+    it took over}."""
+    gone = set(gone_sources)
+    logical = vectorstore.logical_name(collection)
+    keep: Dict[str, dict] = {}
+    owners: Dict[str, Tuple[str, Optional[int]]] = {}
+    remaining: Dict[str, List[list]] = {}
+    taken_over: Dict[str, List[str]] = defaultdict(list)
+    db = SessionLocal()
+    try:
+        for i in range(0, len(ids), 500):
+            part = ids[i : i + 500]
+            current = {r.chunk_id: r.source for r in crud.get_chunk_fingerprints(db, logical, chunk_ids=part)}
+            refs = _refs_by_chunk(crud.get_chunk_refs(db, logical, chunk_ids=part))
+            for cid in part:
+                held = [r for r in refs.get(cid, []) if r[0] not in gone and r[0] != current.get(cid)]
+                if held:
+                    (src, page), rest = held[0], held[1:]
+                    # section/page fingerprints belonged to the old owner
+                    keep[cid] = {"source": src, "page": page, **_ref_meta(rest), "parent_id": None,
+                                 "section_path": None, "page_hash": None}
+                    owners[cid] = (src, page)
+                    remaining[cid] = rest
+                    taken_over[src].append(cid)
+        to_delete = [cid for cid in ids if cid not in keep]
+        for physical in [collection, *shadows]:
+            kept = list(keep.items())
+            for i in range(0, len(kept), 500):
+                part = kept[i : i + 500]
+                physical.update(ids=[k for k, _ in part], metadatas=[m for _, m in part])
+            for i in range(0, len(to_delete), 500):
+                physical.delete(ids=to_delete[i : i + 500])
+        if owners:
+            crud.move_chunk_fingerprints(db, logical, owners)
+            crud.set_chunk_refs(db, logical, remaining)
+        if to_delete:
+            crud.delete_chunk_fingerprints(db, logical, to_delete)
+    finally:
+        db.close()
+    return dict(taken_over)
+
+
+def drop_source_refs(collection, source: str, shadows: List = ()) -> None:
+    """Remove `source` from the refs of every vector that stands in for it."""
+    logical = vectorstore.logical_name(collection)
+    db = SessionLocal()
+    try:
+        holders = [r.chunk_id for r in crud.get_chunk_refs(db, logical, sources=[source])]
+        refs = _refs_by_chunk(crud.get_chunk_refs(db, logical, chunk_ids=holders)) if holders else {}
+        kept = {cid: [r for r in refs.get(cid, []) if r[0] != source] for cid in dict.fromkeys(holders)}
+        if kept:
+            crud.set_chunk_refs(db, logical, kept)
+    finally:
+        db.close()
+    updates = [(cid, _ref_meta(held)) for cid, held in kept.items()]
+    for physical in [collection, *shadows]:
+        for i in range(0, len(updates), 500):
+            part = updates[i : i + 500]
+            physical.update(ids=[u[0] for u in part], metadatas=[u[1] for u in part])
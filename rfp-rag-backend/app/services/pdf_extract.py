@@ -0,0 +1,255 @@
+"""Parallel PDF text extraction with interchangeable backends.
+
+Backends ("extractors") trade speed for layout fidelity differently:
+
+- "pypdf": pure Python, always installed (the default)
+- "pdfminer": pdfminer.six layout analysis; slower, better reading order
+  on multi-column pages
+- "pdfium": pypdfium2 bindings to Chromium's PDFium; much faster on large
+  or scanned-and-OCR'd documents
+
+Optional backends are imported lazily, inside the process that uses them.
+Projects pick one (`rfp_projects.pdf_extractor`), otherwise `PDF_EXTRACTOR`
+applies; `scripts/benchmark_extractors.py` compares them on sample files.
+
+Pages are split into contiguous ranges and extracted by a shared process
+pool; results are reassembled in page order so `page` metadata matches what
+`PyPDFLoader` would produce. Pages are yielded as they come back
+(`iter_page_texts`), so ingest can split and embed the first pages while
+later ones are still being extracted; at most a few ranges per worker are
+in flight at once.
+
+Notes
+- Page texts are cached on disk by file hash + extractor version (see
+  `app.services.text_cache`); re-processing a known file skips parsing.
+- Small documents (fewer pages than `PDF_PAGES_PER_TASK`) are extracted
+  inline; pool start-up would cost more than it saves.
+- The pool uses the "spawn" start method: forking a web worker that already
+  runs ingest/embedding threads is not safe.
+- This module keeps its imports light because every pool process imports it.
+"""
+from __future__ import annotations
+
+import importlib.metadata
+import importlib.util
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core.config import PDF_EXTRACT_WORKERS, PDF_EXTRACTOR, PDF_PAGES_PER_TASK
+from app.services import text_cache
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+
+def _pypdf_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _pypdf_range(path: str, start: int, stop: int) -> List[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _pdfminer_count(path: str) -> int:
+    from pdfminer.pdfpage import PDFPage
+
+    with open(path, "rb") as fp:
+        return sum(1 for _ in PDFPage.get_pages(fp))
+
+
+def _pdfminer_range(path: str, start: int, stop: int) -> List[str]:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    texts = [
+        "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+        for layout in extract_pages(path, page_numbers=set(range(start, stop)))
+    ]
+    # pages pdfminer could not lay out still occupy their slot
+    return texts + [""] * (stop - start - len(texts))
+
+
+def _pdfium_count(path: str) -> int:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _pdfium_range(path: str, start: int, stop: int) -> List[str]:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    texts: List[str] = []
+    try:
+        for i in range(start, stop):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                texts.append(textpage.get_text_range() or "")
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+    return texts
+
+
+class _Extractor(NamedTuple):
+    module: str
+    distribution: str
+    count: Callable[[str], int]
+    extract_range: Callable[[str, int, int], List[str]]
+
+
+EXTRACTORS: Dict[str, _Extractor] = {
+    "pypdf": _Extractor("pypdf", "pypdf", _pypdf_count, _pypdf_range),
+    "pdfminer": _Extractor("pdfminer", "pdfminer.six", _pdfminer_count, _pdfminer_range),
+    "pdfium": _Extractor("pypdfium2", "pypdfium2", _pdfium_count, _pdfium_range),
+}
+
+
+def normalize_extractor(name: Optional[str]) -> str:
+    """Validate an extractor name (None = PDF_EXTRACTOR). Raises ValueError
+    if it is unknown or its package is not installed."""
+    name = (name or PDF_EXTRACTOR).strip().lower()
+    backend = EXTRACTORS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown PDF extractor '{name}'; expected one of {', '.join(EXTRACTORS)}.")
+    if importlib.util.find_spec(backend.module) is None:
+        raise ValueError(f"PDF extractor '{name}' needs the '{backend.distribution}' package.")
+    return name
+
+
+def available_extractors() -> List[str]:
+    return [n for n, b in EXTRACTORS.items() if importlib.util.find_spec(b.module) is not None]
+
+
+def extractor_version(name: Optional[str] = None) -> str:
+    """"<name>-<package version>", e.g. "pypdf-4.2.0"; changes whenever the output may change."""
+    name = normalize_extractor(name)
+    return f"{name}-{importlib.metadata.version(EXTRACTORS[name].distribution)}"
+
+
+# ---------------------------
+# Pool
+# ---------------------------
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _extract_range(extractor: str, path: str, start: int, stop: int) -> List[str]:
+    # runs in pool processes; the backend is looked up (and imported) there
+    return EXTRACTORS[extractor].extract_range(path, start, stop)
+
+
+def _page_ranges(n_pages: int, workers: int) -> List[Tuple[int, int]]:
+    # A few tasks per worker keeps cores busy when some pages are much slower than others
+    per_task = max(PDF_PAGES_PER_TASK, -(-n_pages // (workers * 4)))
+    return [(s, min(s + per_task, n_pages)) for s in range(0, n_pages, per_task)]
+
+
+def _iter_inline(extractor: str, path: str, start: int, stop: int) -> Iterator[str]:
+    for s in range(start, stop, PDF_PAGES_PER_TASK):
+        yield from _extract_range(extractor, path, s, min(s + PDF_PAGES_PER_TASK, stop))
+
+
+def _iter_extracted(path: str, workers: Optional[int], extractor: str) -> Iterator[str]:
+    n_pages = EXTRACTORS[extractor].count(path)
+    workers = max(1, min(workers or PDF_EXTRACT_WORKERS, PDF_EXTRACT_WORKERS))
+    if workers == 1 or n_pages <= PDF_PAGES_PER_TASK:
+        yield from _iter_inline(extractor, path, 0, n_pages)
+        return
+
+    ranges = deque(_page_ranges(n_pages, workers))
+    in_flight = deque()
+    next_page = 0
+    try:
+        pool = _get_pool()
+        while ranges or in_flight:
+            # keep every worker busy, but never run far ahead of the consumer
+            while ranges and len(in_flight) < workers * 2:
+                s, e = ranges.popleft()
+                in_flight.append(pool.submit(_extract_range, extractor, path, s, e))
+            texts = in_flight.popleft().result()
+            next_page += len(texts)
+            yield from texts
+    except BrokenProcessPool:
+        # A pool process died (e.g. OOM-killed); rebuild the pool for the next
+        # caller and finish this document inline
+        _reset_pool()
+        yield from _iter_inline(extractor, path, next_page, n_pages)
+    finally:
+        # consumer stopped early (or failed): drop ranges nobody will read
+        for fut in in_flight:
+            fut.cancel()
+
+
+def iter_page_texts(
+    path: str, workers: Optional[int] = None, extractor: Optional[str] = None, cache: bool = True
+) -> Iterator[str]:
+    """Yield the text of every page of `path`, in page order.
+
+    Reads through the parsed-text cache: a file whose content was already
+    extracted with this extractor version is not opened by the PDF parser.
+    """
+    extractor = normalize_extractor(extractor)
+    if not cache:
+        yield from _iter_extracted(path, workers, extractor)
+        return
+    yield from text_cache.read_through(
+        path, extractor_version(extractor), lambda: _iter_extracted(path, workers, extractor)
+    )
+
+
+def extract_page_texts(
+    path: str, workers: Optional[int] = None, extractor: Optional[str] = None, cache: bool = True
+) -> List[str]:
+    """Return the text of every page of `path`, in page order."""
+    return list(iter_page_texts(path, workers, extractor, cache))
+
+
+def iter_pdf_pages(path: str, workers: Optional[int] = None, extractor: Optional[str] = None) -> Iterator:
+    """Streaming `PyPDFLoader(path).lazy_load()`: one Document per page with
+    `source` and 0-based `page` metadata."""
+    from langchain_core.documents import Document
+
+    for i, text in enumerate(iter_page_texts(path, workers, extractor)):
+        yield Document(page_content=text, metadata={"source": path, "page": i})
+
+
+def load_pdf_pages(path: str, workers: Optional[int] = None, extractor: Optional[str] = None) -> List:
+    """Drop-in for `PyPDFLoader(path).load()`."""
+    return list(iter_pdf_pages(path, workers, extractor))
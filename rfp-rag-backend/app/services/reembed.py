@@ -0,0 +1,261 @@
+"""Background re-embedding of a collection into another embedding model.
+
+The old physical collection keeps serving queries and ingests while a new
+one is built next to it:
+
+    queued -> copying -> syncing -> reconciling -> done | failed
+
+- copying: page through the old collection and embed every chunk with the
+  new model into the new collection (same ids, same metadata)
+- syncing: diff the two by id and apply what changed meanwhile (adds,
+  deletes, metadata edits)
+- switch: one UPDATE of the `vector_collections` row points the logical
+  name at the new collection and model; readers pick it up within
+  `VECTORSTORE_RESOLVE_TTL_SECONDS`
+- reconciling: once ingest jobs that started before the switch are done,
+  any source whose chunks still differ between the two collections is
+  ingested again from its file into the new one (ingest is incremental and
+  idempotent), then the old collection is deleted
+
+Progress is recorded on the row so any gunicorn worker can report it.
+Deletions (`remove_source`) apply to both physical collections while a
+migration is in flight.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from langchain_core.documents import Document
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal
+from app.core.config import MIGRATION_STALE_SECONDS, REEMBED_PAGE_SIZE, VECTORSTORE_RESOLVE_TTL_SECONDS
+from app.services import vectorstore
+from app.services.document_service import process_document, remove_source
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.embedding_writer import EmbeddingWriter
+from app.services.embeddings import get_embeddings, normalize_spec
+
+logger = logging.getLogger("uvicorn.error")
+
+# One migration at a time per process; each one is CPU/API heavy
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reembed")
+
+RUNNING = ("queued", "copying", "syncing", "reconciling")
+_JOB_POLL_SECONDS = 2.0
+
+
+class MigrationInProgress(RuntimeError):
+    pass
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _is_stale(ts: Optional[datetime]) -> bool:
+    """No progress since `ts` for longer than MIGRATION_STALE_SECONDS (the worker died)."""
+    if ts is None:
+        return True
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (_now() - ts).total_seconds() > MIGRATION_STALE_SECONDS
+
+
+def start_migration(db: Session, collection_name: str, embedding_model: str):
+    """Queue a re-embed of `collection_name` into `embedding_model`. Returns the row.
+
+    Raises ValueError for a bad spec or when the collection already uses that
+    model, MigrationInProgress when another migration is still running.
+    """
+    spec = normalize_spec(embedding_model)
+    vectorstore.resolve(collection_name, fresh=True)  # registers legacy collections
+    row = crud.get_vector_collection(db, collection_name)
+    if row.migration_status in RUNNING and not _is_stale(row.updated_at):
+        raise MigrationInProgress(f"A migration of '{collection_name}' is already {row.migration_status}.")
+    if row.migration_status in RUNNING and row.pending_physical_name:
+        # abandoned by a dead worker before it switched
+        vectorstore.delete_physical(row.pending_physical_name)
+    if spec == row.embedding_model:
+        raise ValueError(f"'{collection_name}' is already embedded with {spec}.")
+    row = crud.update_vector_collection(
+        db,
+        collection_name,
+        pending_physical_name=f"{collection_name[:40]}_v{uuid4().hex[:8]}",
+        pending_embedding_model=spec,
+        migration_status="queued",
+        migration_done=0,
+        migration_total=0,
+        migration_error=None,
+    )
+    vectorstore.invalidate(collection_name)
+    _executor.submit(_run_migration, collection_name)
+    return row
+
+
+def _pages(collection, include: List[str], ids: Optional[List[str]] = None) -> Iterator[dict]:
+    """Yield `get` results page by page (all chunks, or just `ids`)."""
+    if ids is not None:
+        for i in range(0, len(ids), REEMBED_PAGE_SIZE):
+            yield collection.get(ids=ids[i : i + REEMBED_PAGE_SIZE], include=include)
+        return
+    offset = 0
+    while True:
+        got = collection.get(limit=REEMBED_PAGE_SIZE, offset=offset, include=include)
+        if not got.get("ids"):
+            return
+        yield got
+        offset += len(got["ids"])
+
+
+def _copy(source, target, embeddings, ids: Optional[List[str]] = None, on_batch=None) -> int:
+    """Embed chunks of `source` (all, or `ids`) with `embeddings` into `target`, keeping ids."""
+    original_ids: Dict[int, str] = {}
+
+    def _docs() -> Iterator[Document]:
+        for got in _pages(source, ["documents", "metadatas"], ids):
+            for cid, text, meta in zip(got["ids"], got.get("documents") or [], got.get("metadatas") or []):
+                doc = Document(page_content=text or "", metadata=dict(meta or {}))
+                original_ids[id(doc)] = cid
+                yield doc
+
+    writer = EmbeddingWriter(target, embeddings, on_batch=on_batch, id_fn=lambda d: original_ids.pop(id(d)))
+    return writer.write(_docs())
+
+
+def _all_metadatas(collection) -> Dict[str, dict]:
+    out: Dict[str, dict] = {}
+    for got in _pages(collection, ["metadatas"]):
+        out.update(zip(got["ids"], (m or {} for m in got.get("metadatas") or [])))
+    return out
+
+
+def _sync(source, target, embeddings) -> Dict[str, int]:
+    """Make `target` hold exactly the chunks (and metadata) of `source`."""
+    old = _all_metadatas(source)
+    new = _all_metadatas(target)
+    missing = [cid for cid in old if cid not in new]
+    extra = [cid for cid in new if cid not in old]
+    # update() merges keys, so keys the source no longer has are cleared explicitly
+    changed = [
+        (cid, {**{k: None for k in new[cid] if k not in old[cid]}, **old[cid]})
+        for cid in old
+        if cid in new and new[cid] != old[cid]
+    ]
+    added = _copy(source, target, embeddings, ids=missing) if missing else 0
+    for i in range(0, len(extra), REEMBED_PAGE_SIZE):
+        target.delete(ids=extra[i : i + REEMBED_PAGE_SIZE])
+    for i in range(0, len(changed), REEMBED_PAGE_SIZE):
+        part = changed[i : i + REEMBED_PAGE_SIZE]
+        target.update(ids=[c[0] for c in part], metadatas=[c[1] for c in part])
+    return {"added": added, "deleted": len(extra), "updated": len(changed)}
+
+
+def _by_source(metadatas: Dict[str, dict]) -> Dict[str, Dict[str, dict]]:
+    out: Dict[str, Dict[str, dict]] = defaultdict(dict)
+    for cid, meta in metadatas.items():
+        out[meta.get("source") or ""][cid] = meta
+    return out
+
+
+def _reconcile(db: Session, collection_name: str, old, new, switched_at: datetime) -> int:
+    """Bring sources written into the old collection around the switch up to date
+    in the new one. Returns the number of sources re-ingested or removed."""
+    # readers in other workers may still hold the old binding until their cache expires
+    time.sleep(2 * VECTORSTORE_RESOLVE_TTL_SECONDS)
+    while True:
+        jobs = crud.get_ingest_jobs_overlapping(db, collection_name, switched_at, switched_at)
+        if all(j.finished_at is not None or _is_stale(j.started_at) for j in jobs):
+            break
+        # keep the row fresh so the wait is not mistaken for a dead migration
+        crud.update_vector_collection(db, collection_name, updated_at=_now())
+        time.sleep(_JOB_POLL_SECONDS)
+    # The file on disk is the truth: re-ingesting is incremental and idempotent,
+    # so any source whose chunks differ is simply ingested again into the new copy.
+    before, after = _by_source(_all_metadatas(old)), _by_source(_all_metadatas(new))
+    stale = [src for src in set(before) | set(after) if src and before.get(src) != after.get(src)]
+    for src in stale:
+        if os.path.isfile(src):
+            process_document(src, collection_name)
+        else:
+            remove_source(collection_name, src)
+    return len(stale)
+
+
+def _run_migration(collection_name: str) -> None:
+    db = SessionLocal()
+    switched = False
+    try:
+        row = crud.get_vector_collection(db, collection_name)
+        old_physical, new_physical = row.physical_name, row.pending_physical_name
+        spec = row.pending_embedding_model
+        old = vectorstore.open_physical(old_physical, collection_name)
+        new = vectorstore.open_physical(new_physical, collection_name, spec)
+        embeddings = CachedEmbeddings(get_embeddings(spec))
+        started = time.perf_counter()
+
+        crud.update_vector_collection(db, collection_name, migration_status="copying", migration_total=old.count())
+        _copy(
+            old,
+            new,
+            embeddings,
+            on_batch=lambda n, _batch: crud.update_vector_collection(db, collection_name, migration_done=n),
+        )
+
+        crud.update_vector_collection(db, collection_name, migration_status="syncing")
+        delta = _sync(old, new, embeddings)
+        dimension = vectorstore.record_dimension(collection_name, new)
+
+        # The switch: one row update; the project's model follows the collection
+        crud.update_vector_collection(
+            db,
+            collection_name,
+            physical_name=new_physical,
+            embedding_model=spec,
+            dimension=dimension,
+            pending_physical_name=None,
+            pending_embedding_model=None,
+            retired_physical_name=old_physical,
+            migration_status="reconciling",
+            migration_total=new.count(),
+        )
+        switched = True
+        switched_at = _now()
+        vectorstore.invalidate(collection_name)
+        project = crud.get_project_by_project_id(db, collection_name)
+        if project is not None:
+            project.embedding_model = spec
+            db.commit()
+
+        rerun = _reconcile(db, collection_name, old, new, switched_at)
+        crud.update_vector_collection(db, collection_name, retired_physical_name=None)
+        vectorstore.invalidate(collection_name)
+        vectorstore.delete_physical(old_physical)
+        crud.update_vector_collection(db, collection_name, migration_status="done")
+        logger.info(
+            "Re-embedded '%s' into %s (%s -> %s) in %.1fs: sync %s, %d sources reconciled, embedding cache hit rate %.0f%%",
+            collection_name, spec, old_physical, new_physical, time.perf_counter() - started, delta, rerun,
+            embeddings.hit_rate * 100,
+        )
+    except Exception as e:
+        logger.exception("Re-embed of '%s' failed", collection_name)
+        db.rollback()
+        fields = {"migration_status": "failed", "migration_error": str(e)}
+        if not switched:
+            # the old collection never stopped serving; discard the partial copy
+            row = crud.get_vector_collection(db, collection_name)
+            if row and row.pending_physical_name:
+                vectorstore.delete_physical(row.pending_physical_name)
+            fields.update(pending_physical_name=None, pending_embedding_model=None)
+        crud.update_vector_collection(db, collection_name, **fields)
+        vectorstore.invalidate(collection_name)
+    finally:
+        db.close()
@@ -0,0 +1,219 @@
+"""Requirement-statement index built at ingest.
+
+Listing requirements, building a compliance matrix or checking a draft
+against a checklist used to start from whatever top-k chunks retrieval
+returned, so requirements were missed and every run paid for an LLM pass
+over large contexts. Instead, while a document is ingested, candidate
+requirement sentences are pulled out of every section segment and stored in
+`requirement_statements` with their page, section and an embedding; readers
+get the complete set with one indexed query.
+
+A sentence is a candidate when it contains one of:
+
+- "shall" / "must" / "is required to": obligations on the offeror
+- "will be evaluated" / "will be rated" / evaluation factor language
+- a reference to Section L (instructions) or Section M (evaluation)
+
+Notes
+- Extraction is regex based and errs on the side of recall; the index is a
+  superset a human (or one cheap LLM pass) can prune.
+- Rows are replaced per source on every ingest, like `document_sections`,
+  and share its page numbering (0-based, as in chunk metadata).
+- Embeddings are packed float32 and tagged with the model that built them;
+  matching embeds the query once per model present, so rows written before
+  a re-embed migration still match.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import crud
+from app.services.embeddings import get_query_embeddings
+from app.services.headings import parse_heading
+
+logger = logging.getLogger("uvicorn.error")
+
+# Prompt function answered from the index instead of retrieved chunks
+REQUIREMENTS_FUNCTION = "Generate Requirements"
+
+# (kind, pattern) in priority order: the first match names the statement's kind
+_KINDS = [
+    ("evaluation", re.compile(
+        r"\b(will|shall)\s+be\s+(evaluated|rated|assessed|scored)\b|\bevaluation\s+(factor|criteri[ao]n?)s?\b",
+        re.IGNORECASE,
+    )),
+    ("shall", re.compile(r"\bshall\b", re.IGNORECASE)),
+    ("must", re.compile(r"\bmust\b", re.IGNORECASE)),
+    ("required", re.compile(r"\b(is|are)\s+required\s+to\b", re.IGNORECASE)),
+    ("reference", re.compile(r"\bSection\s+[LM]\b|\b[LM]\.\d{1,2}(?:\.\d{1,2})*\b")),
+]
+# sentence ends, or a new bullet / enumerated item on its own line
+_SPLIT_RE = re.compile(r"(?<=[.;!?])\s+(?=[A-Z(\"“\d])|\n\s*(?=(?:[•▪●◦\-–*]|\(?[a-z0-9]{1,3}[.)])\s)")
+_BULLET_RE = re.compile(r"^(?:[•▪●◦\-–*]|\(?[a-z0-9]{1,3}[.)])\s+")
+_SPACE_RE = re.compile(r"\s+")
+_LETTER_RE = re.compile(r"^(?:SECTION\s+([A-M])\b|([A-M])\.\d)", re.IGNORECASE)
+
+MIN_CHARS = 25
+MAX_CHARS = 1200
+
+
+def requirement_kind(sentence: str) -> Optional[str]:
+    for kind, pattern in _KINDS:
+        if pattern.search(sentence):
+            return kind
+    return None
+
+
+def section_letter(section_path: Optional[str]) -> Optional[str]:
+    """Uniform contract section ("L", "M", "C", ...) of a breadcrumb, if any."""
+    m = _LETTER_RE.match(section_path or "")
+    return (m.group(1) or m.group(2)).upper() if m else None
+
+
+def _sentences(text: str) -> Iterator[str]:
+    # heading lines open segments; they are not part of the first sentence
+    body = "\n".join(line for line in (text or "").splitlines() if parse_heading(line) is None)
+    for part in _SPLIT_RE.split(body):
+        sentence = _SPACE_RE.sub(" ", _BULLET_RE.sub("", part.strip())).strip()
+        if MIN_CHARS <= len(sentence) <= MAX_CHARS:
+            yield sentence
+
+
+class RequirementCollector:
+    """Accumulates candidate requirement sentences of one document.
+
+    Fed the section segments of each page in order (see `SectionTracker`);
+    the same sentence repeated later in the document (running headers,
+    restated clauses) is kept once, at its first page.
+    """
+
+    def __init__(self, namespace: str, source: str):
+        self.namespace = namespace
+        self.source = source
+        self._rows: Dict[str, dict] = {}
+
+    def feed(self, segments: Iterable) -> None:
+        for seg in segments:
+            meta = seg.metadata or {}
+            path = meta.get("section_path")
+            for sentence in _sentences(seg.page_content):
+                kind = requirement_kind(sentence)
+                if kind is None:
+                    continue
+                key = sentence.lower()
+                rid = hashlib.sha256(f"{self.namespace}\x00{key}".encode("utf-8")).hexdigest()[:32]
+                if rid in self._rows:
+                    continue
+                self._rows[rid] = {
+                    "id": rid,
+                    "source": self.source,
+                    "page": meta.get("page"),
+                    "section_path": path,
+                    "section_letter": section_letter(path),
+                    "parent_id": meta.get("parent_id"),
+                    "kind": kind,
+                    "text": sentence,
+                }
+
+    def rows(self, embeddings=None, embedding_model: Optional[str] = None) -> List[dict]:
+        """Collected rows, with embeddings when `embeddings` is given.
+
+        An embedding failure is logged and leaves the rows unembedded (still
+        listed, not matched) rather than failing the ingest.
+        """
+        rows = list(self._rows.values())
+        if embeddings is None or not rows:
+            return rows
+        try:
+            vectors = embeddings.embed_documents([r["text"] for r in rows])
+        except Exception as e:
+            logger.warning("Requirement statements of %s not embedded: %s", self.source, e)
+            return rows
+        for row, vec in zip(rows, vectors):
+            row["embedding"] = array("f", vec).tobytes()
+            row["embedding_model"] = embedding_model
+        return rows
+
+
+# ---------------------------
+# Reading the index
+# ---------------------------
+
+def _matrix(rows: Sequence) -> np.ndarray:
+    mat = np.stack([np.frombuffer(r.embedding, dtype=np.float32) for r in rows])
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.where(norms == 0, 1, norms)
+
+
+def _unit(vectors: List[List[float]]) -> np.ndarray:
+    q = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(q, axis=1, keepdims=True)
+    return q / np.where(norms == 0, 1, norms)
+
+
+def match_requirements(
+    db: Session,
+    collection_name: str,
+    queries: List[str],
+    k: int = 3,
+    kind: Optional[str] = None,
+    section: Optional[str] = None,
+) -> List[List[dict]]:
+    """Top `k` indexed requirements for each query, best first:
+    [[{"requirement": row, "score": cosine}, ...], ...] in query order."""
+    if not queries:
+        return []
+    rows = [
+        r for r in crud.get_requirement_statements(db, collection_name, kind=kind, section=section)
+        if r.embedding is not None
+    ]
+    by_model: Dict[str, list] = defaultdict(list)
+    for r in rows:
+        by_model[r.embedding_model].append(r)
+
+    scored: List[List[tuple]] = [[] for _ in queries]
+    for model, group in by_model.items():
+        q = _unit(get_query_embeddings(model).embed_documents(list(queries)))
+        sims = q @ _matrix(group).T
+        for qi in range(len(queries)):
+            top = np.argsort(-sims[qi])[:k]
+            scored[qi].extend((float(sims[qi, j]), group[j]) for j in top)
+    return [
+        [{"requirement": row, "score": round(score, 4)} for score, row in sorted(s, key=lambda x: -x[0])[:k]]
+        for s in scored
+    ]
+
+
+def requirement_documents(db: Session, collection_name: str, max_tokens: int) -> List:
+    """Indexed requirements as context Documents (one per section, in document
+    order), stopping at `max_tokens`. Empty when nothing is indexed."""
+    from langchain_core.documents import Document
+    from app.services.document_service import num_tokens_from_string
+
+    grouped: Dict[tuple, List] = defaultdict(list)
+    for r in crud.get_requirement_statements(db, collection_name):
+        grouped[(r.source, r.section_path)].append(r)
+    docs: List = []
+    used = 0
+    for (source, path), rows in grouped.items():
+        header = f"[{path or 'Untitled section'}]"
+        lines = [header] + [f"- (p. {(r.page or 0) + 1}) {r.text}" for r in rows]
+        text = "\n".join(lines)
+        tokens = num_tokens_from_string(text)
+        if docs and used + tokens > max_tokens:
+            logger.info("Requirement context for '%s' truncated at %d tokens", collection_name, used)
+            break
+        docs.append(Document(
+            page_content=text,
+            metadata={"source": source, "page": rows[0].page, "section_path": path, "tokens": tokens},
+        ))
+        used += tokens
+    return docs
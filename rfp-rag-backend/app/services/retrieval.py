@@ -1,22 +1,81 @@
-"""Centralized retrieval helpers for project RFP/KB context and example passages."""
+"""Centralized retrieval helpers for project RFP/KB context and example passages.
+
+Project and KB collections are queried through the vector-collection
+registry with query vectors from the model each collection was built with;
+the examples collection uses Chroma's default embedder.
+
+`multi_query_mmr` serves expanded queries: all variants are embedded in one
+call and each collection is searched once with every vector, with MMR
+re-ranking done in memory.
+"""
 from __future__ import annotations
 
+import logging
 from typing import List, Tuple, Dict, Any, Optional
+
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from langchain_core.documents import Document
 from sqlalchemy.orm import Session
 
-from chromadb import PersistentClient
-from app.core.config import DB_DIRECTORY, EXAMPLES_COLLECTION
+from app.core.config import EXAMPLES_COLLECTION
+from app.services import vectorstore
+from app.services.embeddings import get_query_embeddings
 import crud
 
-# Single persistent Chroma client
-_client = PersistentClient(path=DB_DIRECTORY)
-
+logger = logging.getLogger("uvicorn.error")
 
 def _get_or_create(name: str):
-    try:
-        return _client.get_collection(name)
-    except Exception:
-        return _client.create_collection(name)
+    return vectorstore.default_collection(name)
+
+
+def _query_logical(name: str, query_text: str, n_results: int):
+    """Query a registry-managed collection with its own embedding model."""
+    binding = vectorstore.resolve(name)
+    coll = vectorstore.get_collection(name)
+    vector = get_query_embeddings(binding.embedding_model).embed_query(query_text)
+    return coll.query(query_embeddings=[vector], n_results=n_results, include=["documents", "metadatas"])
+
+
+def multi_query_mmr(
+    name: str,
+    queries: List[str],
+    k: int = 50,
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+    vectors: Optional[Dict[str, List[List[float]]]] = None,
+) -> List[Document]:
+    """MMR search of a registry-managed collection for several query variants.
+
+    Same results as one LangChain MMR retriever per query (`fetch_k`
+    nearest neighbours, `k` picked by MMR), concatenated in query order, but
+    the queries are embedded in one batch and the collection is searched
+    once. Pass the same `vectors` dict ({embedding model: query vectors})
+    for every collection searched with these queries, so collections built
+    with the same model share one embedding call.
+    """
+    if not queries:
+        return []
+    binding = vectorstore.resolve(name)
+    query_vectors = (vectors or {}).get(binding.embedding_model)
+    if query_vectors is None:
+        query_vectors = get_query_embeddings(binding.embedding_model).embed_documents(list(queries))
+        if vectors is not None:
+            vectors[binding.embedding_model] = query_vectors
+    coll = vectorstore.get_collection(name)
+    res = coll.query(
+        query_embeddings=query_vectors, n_results=fetch_k, include=["documents", "metadatas", "embeddings"]
+    )
+    out: List[Document] = []
+    for i, vector in enumerate(query_vectors):
+        found = res["embeddings"][i] if res.get("embeddings") is not None else None
+        if found is None or len(found) == 0:
+            continue
+        picks = maximal_marginal_relevance(np.array(vector, dtype=np.float32), found, k=k, lambda_mult=lambda_mult)
+        out.extend(
+            Document(page_content=res["documents"][i][j], metadata=res["metadatas"][i][j] or {}) for j in picks
+        )
+    return out
 
 
 def _dedupe(docs: List[str], metas: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
@@ -65,8 +124,7 @@ def retrieve_project_context(
 
     # Project (RFP) collection
     try:
-        coll = _get_or_create(project_id)
-        q = coll.query(query_texts=[query_text], n_results=nk, include=["documents", "metadatas", "ids"])
+        q = _query_logical(project_id, query_text, nk)
         cd = q.get("documents", [[]])[0]
         cm = q.get("metadatas", [[]])[0]
         ci = q.get("ids", [[]])[0]
@@ -76,14 +134,13 @@ def retrieve_project_context(
             m["kind"] = "RFP"
             metas.append(m)
         docs.extend(cd)
-    except Exception:
-        pass
+    except Exception as e:
+        logger.warning("Project context retrieval for %s failed: %s", project_id, e)
 
     # Knowledge base
     if use_kb:
         try:
-            kb = _get_or_create("knowledge_base")
-            q = kb.query(query_texts=[query_text], n_results=max(4, nk // 3), include=["documents", "metadatas", "ids"])
+            q = _query_logical("knowledge_base", query_text, max(4, nk // 3))
             kd = q.get("documents", [[]])[0]
             km = q.get("metadatas", [[]])[0]
             ki = q.get("ids", [[]])[0]
@@ -93,8 +150,8 @@ def retrieve_project_context(
                 m["kind"] = "KB"
                 metas.append(m)
             docs.extend(kd)
-        except Exception:
-            pass
+        except Exception as e:
+            logger.warning("Knowledge base retrieval failed: %s", e)
 
     docs, metas = _dedupe(docs, metas)
     return docs, metas
@@ -120,9 +177,9 @@ def retrieve_example_passages(
         if example_ids:
             where_in = dict(where)
             where_in["example_id"] = {"$in": example_ids}
-            q = col.query(query_texts=[query_text], where=where_in, n_results=k, include=["documents", "metadatas", "ids"])
+            q = col.query(query_texts=[query_text], where=where_in, n_results=k, include=["documents", "metadatas"])
         else:
-            q = col.query(query_texts=[query_text], where=where, n_results=k, include=["documents", "metadatas", "ids"])
+            q = col.query(query_texts=[query_text], where=where, n_results=k, include=["documents", "metadatas"])
 
         dd = q.get("documents", [[]])[0]
         mm = q.get("metadatas", [[]])[0]
@@ -136,7 +193,7 @@ def retrieve_example_passages(
     except Exception:
         # fallback: over-fetch + client-side filter (covers servers without $in support)
         try:
-            q = col.query(query_texts=[query_text], n_results=max(50, k * 4), include=["documents", "metadatas", "ids"])
+            q = col.query(query_texts=[query_text], n_results=max(50, k * 4), include=["documents", "metadatas"])
             dd = q.get("documents", [[]])[0]
             mm = q.get("metadatas", [[]])[0]
             ii = q.get("ids", [[]])[0]
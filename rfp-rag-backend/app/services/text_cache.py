@@ -0,0 +1,190 @@
+"""On-disk cache of extracted document text.
+
+The same PDF is typically parsed several times: for a project, again for the
+knowledge base or as a proposal example, and again on every retried ingest.
+Extracted page texts are stored under the sha256 of the file's bytes plus
+the extractor version (e.g. "pypdf-4.2.0"), so a known file is never parsed
+twice and upgrading or switching the extractor naturally misses.
+
+Implementation details
+- One gzip'd file per (content hash, extractor version), fanned out by the
+  first two hex digits of the hash, holding one JSON-encoded page text per
+  line. Pages are written as they are extracted and read back one at a
+  time, so neither side holds the whole document's text.
+- Entries are written to a `.part` temp file and renamed into place once
+  the last page is in, so concurrent workers never read a partial entry;
+  the last writer wins (same content).
+- A pass that does not read every page (consumer stopped, extraction failed)
+  stores nothing.
+- Unreadable entries count as misses; if one breaks part-way through, the
+  file is extracted again and the pages already served are skipped.
+  Setting PARSED_TEXT_CACHE_DIRECTORY to an empty value disables the cache.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from app.core.config import PARSED_TEXT_CACHE_DIRECTORY
+
+logger = logging.getLogger("uvicorn.error")
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+# (path, size, mtime_ns) -> sha256; saves re-reading a file hashed moments ago
+_digests: dict = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """sha256 of the file's bytes."""
+    st = os.stat(path)
+    key: Tuple[str, int, int] = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        hit = _digests.get(key)
+    if hit:
+        return hit
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _digests_lock:
+        if len(_digests) > 4096:
+            _digests.clear()
+        _digests[key] = digest
+    return digest
+
+
+def enabled() -> bool:
+    return bool(PARSED_TEXT_CACHE_DIRECTORY)
+
+
+def _entry_path(digest: str, version: str) -> str:
+    safe_version = "".join(c if c.isalnum() or c in ".-_" else "_" for c in version)
+    return os.path.join(PARSED_TEXT_CACHE_DIRECTORY, digest[:2], f"{digest}.{safe_version}.jsonl.gz")
+
+
+def _read_pages(f) -> Iterator[str]:
+    with f:
+        for line in f:
+            text = json.loads(line)
+            if not isinstance(text, str):
+                raise ValueError("page entry is not a string")
+            yield text
+
+
+def get(digest: str, version: str) -> Optional[Iterator[str]]:
+    """Page texts of a cached entry, read one line at a time; None on a miss.
+    A damaged entry raises OSError/ValueError/EOFError while being read."""
+    if not enabled():
+        return None
+    path = _entry_path(digest, version)
+    try:
+        f = gzip.open(path, "rt", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("Ignoring unreadable parsed-text cache entry %s: %s", path, e)
+        return None
+    return _read_pages(f)
+
+
+class _EntryWriter:
+    """Streams page texts into a temp file beside the entry; `commit` renames it
+    into place. Disk errors are logged and turn the writer into a no-op, since
+    a full or read-only disk must not fail the ingest."""
+
+    def __init__(self, digest: str, version: str):
+        self.path = _entry_path(digest, version)
+        self._tmp: Optional[str] = None
+        self._raw = None
+        self._file = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, self._tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".part")
+            self._raw = os.fdopen(fd, "wb")
+            self._file = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=5)
+        except OSError as e:
+            self._fail(e)
+
+    def _fail(self, error: OSError) -> None:
+        logger.warning("Could not write parsed-text cache entry %s: %s", self.path, error)
+        self.discard()
+
+    def write(self, text: str) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.write((json.dumps(text, ensure_ascii=False) + "\n").encode("utf-8"))
+        except OSError as e:
+            self._fail(e)
+
+    def commit(self) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            self._raw.close()
+            os.replace(self._tmp, self.path)
+            self._tmp = self._file = self._raw = None
+        except OSError as e:
+            self._fail(e)
+
+    def discard(self) -> None:
+        """Drop the temp file (no-op once committed)."""
+        for handle in (self._file, self._raw):
+            try:
+                if handle is not None:
+                    handle.close()
+            except OSError:
+                pass
+        self._file = self._raw = None
+        if self._tmp is not None:
+            try:
+                os.unlink(self._tmp)
+            except OSError:
+                pass
+            self._tmp = None
+
+
+def read_through(path: str, version: str, extract: Callable[[], Iterable[str]]) -> Iterator[str]:
+    """Yield the page texts of `path`: from the cache when this content was
+    already extracted with `version`, otherwise from `extract()`, writing each
+    page to the cache as it goes (the entry appears once the last page is read)."""
+    if not enabled():
+        yield from extract()
+        return
+    digest = file_digest(path)
+    cached = get(digest, version)
+    served = 0
+    if cached is not None:
+        while True:
+            try:
+                text = next(cached, None)
+            except (OSError, ValueError, EOFError) as e:
+                logger.warning(
+                    "Ignoring unreadable parsed-text cache entry %s after %d pages: %s",
+                    _entry_path(digest, version), served, e,
+                )
+                break
+            if text is None:
+                return
+            served += 1
+            yield text
+    writer = _EntryWriter(digest, version)
+    try:
+        for i, text in enumerate(extract()):
+            writer.write(text)
+            # a damaged entry already served its first pages
+            if i >= served:
+                yield text
+        writer.commit()
+    finally:
+        writer.discard()
@@ -0,0 +1,144 @@
+"""Streaming upload persistence.
+
+Uploaded files are copied to disk in fixed-size chunks while a sha256 of the
+content is computed on the fly, so peak memory per upload stays constant no
+matter how large the file is. Files over `UPLOAD_MAX_BYTES` are rejected with
+HTTP 413 and nothing is left behind on disk.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import BinaryIO, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES, BULK_MAX_UNCOMPRESSED_BYTES
+
+
+def _copy_stream(src: BinaryIO, dest_path: str, max_bytes: int, chunk_size: int) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{dest_path}.part"
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit.",
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+        # Only replace the destination once the full file has arrived
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size, digest.hexdigest()
+
+
+async def save_upload(
+    upload: UploadFile,
+    dest_path: str,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> Tuple[int, str]:
+    """Stream `upload` to `dest_path`. Returns (size_in_bytes, sha256_hex).
+
+    The copy runs in the threadpool so disk I/O never blocks the event loop.
+    """
+    await upload.seek(0)
+    return await run_in_threadpool(_copy_stream, upload.file, dest_path, max_bytes, chunk_size)
+
+
+def unique_path(dest_dir: str, name: str, taken: set) -> str:
+    """`name`, or "name (n).ext" if another file of the same upload already
+    took it (`taken` collects the names used so far). A suffixed name never
+    lands on a file already in `dest_dir`."""
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in taken or (n > 1 and os.path.exists(os.path.join(dest_dir, candidate))):
+        n += 1
+        candidate = f"{stem} ({n}){ext}"
+    taken.add(candidate)
+    return os.path.join(dest_dir, candidate)
+
+
+def stage_zip(
+    zip_path: str,
+    dest_dir: str,
+    staging: str,
+    taken: set,
+    max_bytes: int = BULK_MAX_UNCOMPRESSED_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> List[Tuple[str, str]]:
+    """Extract the files of a ZIP archive into `staging`; returns
+    (staged_path, target_path) pairs for moving them into `dest_dir`.
+
+    Member paths are reduced to their basename (no traversal outside
+    `dest_dir`), OS metadata entries are skipped, members clashing with a
+    name in `taken` get a " (n)" suffix, and the total uncompressed size is
+    capped (as declared and as actually written).
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [
+            m for m in zf.infolist()
+            if not m.is_dir()
+            and not m.filename.startswith("__MACOSX/")
+            and not os.path.basename(m.filename).startswith(".")
+        ]
+        if sum(m.file_size for m in members) > max_bytes:
+            raise HTTPException(status_code=413, detail="ZIP archive expands beyond the upload limit.")
+        staged: List[Tuple[str, str]] = []
+        written = 0
+        for m in members:
+            target = unique_path(dest_dir, os.path.basename(m.filename), taken)
+            tmp = os.path.join(staging, os.path.basename(target))
+            # the cap also holds on the bytes actually written, not only the declared sizes
+            with zf.open(m) as src:
+                try:
+                    size, _ = _copy_stream(src, tmp, max(max_bytes - written, 1), chunk_size)
+                except HTTPException as e:
+                    if e.status_code == 413:
+                        raise HTTPException(status_code=413, detail="ZIP archive expands beyond the upload limit.")
+                    raise
+            written += size
+            staged.append((tmp, target))
+    return staged
+
+
+def extract_zip(
+    zip_path: str,
+    dest_dir: str,
+    max_bytes: int = BULK_MAX_UNCOMPRESSED_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    taken: Optional[set] = None,
+) -> List[str]:
+    """Flatten the files of a ZIP archive into `dest_dir`; returns their paths.
+
+    See `stage_zip` for how members are named and capped; pass the same
+    `taken` set for every archive of one upload so their members never
+    overwrite each other. Members are extracted into a temp dir and moved
+    into place only once all of them succeeded, so a bad archive leaves
+    `dest_dir` untouched. A member named like a file already in `dest_dir`
+    replaces it, like re-uploading that file: ingest treats it as a new
+    version.
+    """
+    staging = tempfile.mkdtemp(prefix=".extract-", dir=dest_dir)
+    try:
+        staged = stage_zip(zip_path, dest_dir, staging, set() if taken is None else taken, max_bytes, chunk_size)
+        for tmp, target in staged:
+            os.replace(tmp, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return [target for _, target in staged]
@@ -0,0 +1,290 @@
+"""Logical → physical Chroma collection registry.
+
+Callers name collections logically (a project id, "knowledge_base"). The
+`vector_collections` table maps each logical name to the physical Chroma
+collection currently serving it, together with the embedding model and
+vector dimension it was built with. Re-embedding a collection into another
+model (see `app.services.reembed`) builds a second physical collection and
+then repoints the row in one UPDATE, so readers never see a half-built index.
+
+Notes
+- Collections that predate the registry are registered on first use with
+  physical name == logical name and the model recorded in their metadata.
+- Lookups are cached per process for `VECTORSTORE_RESOLVE_TTL_SECONDS`;
+  writers pass `fresh=True` so a switch is seen before the next write.
+- Opened handles (chromadb collections and LangChain stores) are kept per
+  process, keyed by physical collection and embedding model, so retrieval
+  does not set up a client and collection per query. They are dropped when
+  a collection is deleted or its binding changes; when a binding is re-read,
+  a handle whose collection another worker deleted or re-created is dropped.
+- Chunk ids, section ids and `document_sections` rows are keyed by the
+  logical name, so they are identical in every physical copy.
+- Writers that read-modify-write shared state of a collection (ingest,
+  removal) hold `collection_lock`, which serializes them across threads
+  and, on Postgres, across workers.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from chromadb import PersistentClient
+from langchain_community.vectorstores import Chroma
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import crud
+from database import SessionLocal, engine
+from app.core.config import DB_DIRECTORY, VECTORSTORE_RESOLVE_TTL_SECONDS
+from app.services.embeddings import collection_embedding_model, get_query_embeddings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Single persistent Chroma client
+_client = PersistentClient(path=DB_DIRECTORY)
+
+
+@dataclass(frozen=True)
+class Binding:
+    name: str
+    physical_name: str
+    embedding_model: str
+    dimension: Optional[int] = None
+    # physical collections that must also see deletions while a migration runs
+    shadow_names: Tuple[str, ...] = ()
+
+
+_cache: Dict[str, Tuple[float, Binding]] = {}
+# physical name -> chromadb collection; (logical, physical, model) -> LangChain store
+_collections: Dict[str, object] = {}
+_stores: Dict[Tuple[str, str, str], Chroma] = {}
+_cache_lock = threading.Lock()
+# logical name -> lock held by this process's writer of that collection
+_write_locks: Dict[str, threading.Lock] = {}
+
+
+def client() -> PersistentClient:
+    """The process-wide Chroma client."""
+    return _client
+
+
+@contextmanager
+def collection_lock(name: str) -> Iterator[None]:
+    """Serialize writers of logical collection `name`: a lock per name for
+    the threads of this process and, on Postgres, a session advisory lock
+    for the other workers. Not reentrant."""
+    with _cache_lock:
+        lock = _write_locks.setdefault(name, threading.Lock())
+    with lock:
+        if engine.dialect.name != "postgresql":
+            yield
+            return
+        key = int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "big", signed=True)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+
+
+def _binding(row) -> Binding:
+    shadows = tuple(
+        n for n in (row.pending_physical_name, row.retired_physical_name) if n and n != row.physical_name
+    )
+    return Binding(row.name, row.physical_name, row.embedding_model, row.dimension, shadows)
+
+
+def _drop_handles(physical_name: Optional[str] = None, logical: Optional[str] = None) -> None:
+    with _cache_lock:
+        if physical_name is not None:
+            _collections.pop(physical_name, None)
+        for key in [k for k in _stores if k[1] == physical_name or k[0] == logical]:
+            del _stores[key]
+
+
+def invalidate(name: Optional[str] = None) -> None:
+    with _cache_lock:
+        if name is None:
+            _cache.clear()
+            _collections.clear()
+            _stores.clear()
+            return
+        _cache.pop(name, None)
+    _drop_handles(logical=name)
+
+
+def open_physical(physical_name: str, logical: str, embedding_model: Optional[str] = None):
+    """Get or create a physical collection tagged with its logical name and model.
+    Always asks Chroma; the handle is kept for `get_collection` readers."""
+    collection = _client.get_or_create_collection(name=physical_name, embedding_function=None)
+    collection_embedding_model(collection, default=embedding_model)
+    if physical_name != logical and (collection.metadata or {}).get("logical_name") != logical:
+        collection.modify(metadata={**(collection.metadata or {}), "logical_name": logical})
+    with _cache_lock:
+        _collections[physical_name] = collection
+    return collection
+
+
+def _revalidate(physical_name: str) -> None:
+    """Drop the handles of `physical_name` if the collection they point at is gone
+    (deleted, possibly re-created, by another worker)."""
+    with _cache_lock:
+        held = _collections.get(physical_name)
+    if held is None:
+        return
+    try:
+        current = _client.get_collection(name=physical_name, embedding_function=None).id
+    except Exception:
+        current = None
+    if current != held.id:
+        _drop_handles(physical_name)
+
+
+def _register(db, name: str, embedding_model: Optional[str]):
+    collection = open_physical(name, name, embedding_model)
+    spec = collection_embedding_model(collection)
+    dimension = (collection.metadata or {}).get("embedding_dimension")
+    try:
+        return crud.create_vector_collection(db, name, name, spec, dimension)
+    except IntegrityError:
+        # another worker registered it first
+        db.rollback()
+        return crud.get_vector_collection(db, name)
+
+
+def resolve(name: str, embedding_model: Optional[str] = None, fresh: bool = False) -> Binding:
+    """Current binding for a logical collection, registering it if unknown.
+
+    `embedding_model` only applies when the collection is created here.
+    """
+    now = time.monotonic()
+    if not fresh:
+        with _cache_lock:
+            hit = _cache.get(name)
+        if hit and now - hit[0] < VECTORSTORE_RESOLVE_TTL_SECONDS:
+            return hit[1]
+    db = SessionLocal()
+    try:
+        row = crud.get_vector_collection(db, name) or _register(db, name, embedding_model)
+        binding = _binding(row)
+    finally:
+        db.close()
+    with _cache_lock:
+        previous = _cache.get(name)
+        _cache[name] = (now, binding)
+    if previous is not None and previous[1].physical_name != binding.physical_name:
+        _drop_handles(logical=name)
+    if not fresh:
+        _revalidate(binding.physical_name)
+    return binding
+
+
+def get_collection(name: str, embedding_model: Optional[str] = None, fresh: bool = False):
+    """The physical chromadb collection currently serving logical `name`.
+    Readers get the kept handle; `fresh=True` re-opens it from Chroma."""
+    binding = resolve(name, embedding_model, fresh=fresh)
+    if not fresh:
+        with _cache_lock:
+            held = _collections.get(binding.physical_name)
+        if held is not None:
+            return held
+    return open_physical(binding.physical_name, name, binding.embedding_model)
+
+
+def langchain_store(name: str, embeddings=None) -> Chroma:
+    """LangChain Chroma store over the collection serving `name`, embedding
+    queries with its model (or `embeddings`); kept across requests."""
+    binding = resolve(name)
+    key = (name, binding.physical_name, binding.embedding_model)
+    with _cache_lock:
+        store = _stores.get(key)
+    if store is None:
+        # hold the collection handle too, so `_revalidate` covers the store
+        get_collection(name)
+        store = Chroma(
+            client=_client,
+            collection_name=binding.physical_name,
+            embedding_function=embeddings or get_query_embeddings(binding.embedding_model),
+        )
+        with _cache_lock:
+            _stores[key] = store
+    return store
+
+
+def default_collection(name: str):
+    """Get or create a collection outside the registry that embeds with
+    Chroma's default embedder (e.g. the examples library); kept like the rest."""
+    with _cache_lock:
+        held = _collections.get(name)
+    if held is not None:
+        return held
+    collection = _client.get_or_create_collection(name=name)
+    with _cache_lock:
+        _collections[name] = collection
+    return collection
+
+
+def shadow_collections(name: str) -> List:
+    """Other physical collections of `name` that a running migration still copies from/to."""
+    return [open_physical(n, name) for n in resolve(name, fresh=True).shadow_names]
+
+
+def logical_name(collection) -> str:
+    return (collection.metadata or {}).get("logical_name") or collection.name
+
+
+def record_dimension(name: str, collection) -> Optional[int]:
+    """Store the vector dimension of `collection` (from its first vector) if not known yet."""
+    meta = collection.metadata or {}
+    dimension = meta.get("embedding_dimension")
+    if dimension is None:
+        got = collection.get(limit=1, include=["embeddings"])
+        vectors = got.get("embeddings")
+        if vectors is None or len(vectors) == 0:
+            return None
+        dimension = len(vectors[0])
+        collection.modify(metadata={**meta, "embedding_dimension": dimension})
+    elif resolve(name).dimension == dimension:
+        return dimension
+    db = SessionLocal()
+    try:
+        row = crud.get_vector_collection(db, name)
+        if row and row.physical_name == collection.name and row.dimension != dimension:
+            crud.update_vector_collection(db, name, dimension=dimension)
+            invalidate(name)
+    finally:
+        db.close()
+    return dimension
+
+
+def delete_physical(physical_name: str) -> bool:
+    _drop_handles(physical_name)
+    try:
+        _client.delete_collection(name=physical_name)
+        return True
+    except Exception as e:
+        logger.info("Chroma collection %s not deleted: %s", physical_name, e)
+        return False
+
+
+def drop(name: str) -> List[str]:
+    """Delete every physical collection of `name` and its registry row.
+    Returns the physical names that were deleted."""
+    db = SessionLocal()
+    try:
+        row = crud.get_vector_collection(db, name)
+        physical = [name]
+        if row:
+            physical = [row.physical_name, row.pending_physical_name, row.retired_physical_name]
+        deleted = [n for n in dict.fromkeys(p for p in physical if p) if delete_physical(n)]
+        crud.delete_vector_collection(db, name)
+    finally:
+        db.close()
+    invalidate(name)
+    return deleted
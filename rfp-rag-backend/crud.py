@@ -1,8 +1,9 @@
 # rfp-rag-backend/crud.py
 
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 import models, schemas, auth
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -36,7 +37,9 @@ The current project you are working on is titled: '{project.name}'. All of your
         model_name="gpt-3.5-turbo",
         temperature=0.2,
         #context_amount=15,  # We'll retrieve more documents to re-rank
-        context_size='medium'
+        context_size='medium',
+        embedding_model=project.embedding_model,
+        pdf_extractor=project.pdf_extractor,
     )
     db.add(db_project)
     db.commit()
@@ -66,6 +69,8 @@ def update_settings(db: Session, project_id: str, settings: schemas.Settings, us
         db_project.temperature = settings.temperature
         # db_project.context_amount = settings.context_amount # <-- This line is removed
         db_project.context_size = settings.context_size
+        if settings.pdf_extractor is not None:
+            db_project.pdf_extractor = settings.pdf_extractor
         db.commit()
         db.refresh(db_project)
     return db_project
@@ -130,3 +135,272 @@ def delete_knowledge_base_document(db: Session, document_name: str):
         db.commit()
         return True
     return False
+
+def create_ingest_job(db: Session, job_id: str, collection_name: str, document_name: str, file_path: str, replaces: str = None, batch_id: str = None):
+    db_job = models.IngestJob(
+        id=job_id,
+        batch_id=batch_id,
+        collection_name=collection_name,
+        document_name=document_name,
+        file_path=file_path,
+        replaces=replaces,
+        status="queued",
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_ingest_job(db: Session, job_id: str):
+    return db.query(models.IngestJob).filter(models.IngestJob.id == job_id).first()
+
+def get_ingest_jobs_for_collection(db: Session, collection_name: str, limit: int = 50):
+    return db.query(models.IngestJob).filter(models.IngestJob.collection_name == collection_name).order_by(models.IngestJob.created_at.desc()).limit(limit).all()
+
+def get_ingest_jobs_for_batch(db: Session, batch_id: str):
+    return db.query(models.IngestJob).filter(models.IngestJob.batch_id == batch_id).order_by(models.IngestJob.document_name).all()
+
+def update_ingest_job(db: Session, job_id: str, **fields):
+    db_job = db.query(models.IngestJob).filter(models.IngestJob.id == job_id).first()
+    if db_job:
+        for key, value in fields.items():
+            setattr(db_job, key, value)
+        db.commit()
+        db.refresh(db_job)
+    return db_job
+
+def get_ingested_document(db: Session, document_id: str):
+    return db.query(models.IngestedDocument).filter(models.IngestedDocument.id == document_id).first()
+
+def get_ingested_documents(db: Session, collection_name: str):
+    return db.query(models.IngestedDocument).filter(
+        models.IngestedDocument.collection_name == collection_name
+    ).order_by(models.IngestedDocument.document_name).all()
+
+def upsert_ingested_document(db: Session, document_id: str, collection_name: str, source: str, **fields):
+    db_doc = get_ingested_document(db, document_id)
+    if db_doc is None:
+        db_doc = models.IngestedDocument(id=document_id, collection_name=collection_name, source=source)
+        db.add(db_doc)
+    for key, value in fields.items():
+        setattr(db_doc, key, value)
+    db.commit()
+    db.refresh(db_doc)
+    return db_doc
+
+def add_ingested_document_chunk_ids(db: Session, document_ids: Dict[str, List[str]]):
+    """Append vector ids to registered documents (ids a document took over)."""
+    for db_doc in db.query(models.IngestedDocument).filter(models.IngestedDocument.id.in_(list(document_ids))).all():
+        if db_doc.chunk_ids is None:
+            continue
+        merged = list(dict.fromkeys(list(db_doc.chunk_ids) + document_ids[db_doc.id]))
+        db_doc.chunk_ids = merged
+        db_doc.chunks = len(merged)
+    db.commit()
+
+def delete_ingested_documents(db: Session, collection_name: str, source: str = None):
+    query = db.query(models.IngestedDocument).filter(models.IngestedDocument.collection_name == collection_name)
+    if source is not None:
+        query = query.filter(models.IngestedDocument.source == source)
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def replace_document_sections(db: Session, collection_name: str, sources: List[str], sections: List[dict]):
+    """Drop stored sections of `sources` in a collection and insert `sections` in one transaction."""
+    db.query(models.DocumentSection).filter(
+        models.DocumentSection.collection_name == collection_name,
+        models.DocumentSection.source.in_(sources),
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.DocumentSection, [dict(s, collection_name=collection_name) for s in sections])
+    db.commit()
+
+def get_document_sections(db: Session, section_ids: List[str]):
+    if not section_ids:
+        return []
+    return db.query(models.DocumentSection).filter(models.DocumentSection.id.in_(section_ids)).all()
+
+def delete_document_sections(db: Session, collection_name: str, source: str = None):
+    query = db.query(models.DocumentSection).filter(models.DocumentSection.collection_name == collection_name)
+    if source is not None:
+        query = query.filter(models.DocumentSection.source == source)
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def get_document_sections_for_source(db: Session, collection_name: str, source: str):
+    return db.query(models.DocumentSection).filter(
+        models.DocumentSection.collection_name == collection_name,
+        models.DocumentSection.source == source,
+    ).order_by(models.DocumentSection.page_start).all()
+
+def replace_requirement_statements(db: Session, collection_name: str, sources: List[str], rows: List[dict]):
+    """Drop indexed requirements of `sources` in a collection and insert `rows` in one transaction."""
+    db.query(models.RequirementStatement).filter(
+        models.RequirementStatement.collection_name == collection_name,
+        models.RequirementStatement.source.in_(sources),
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.RequirementStatement, [dict(r, collection_name=collection_name) for r in rows])
+    db.commit()
+
+def get_requirement_statements(db: Session, collection_name: str, kind: str = None, section: str = None, source: str = None):
+    query = db.query(models.RequirementStatement).filter(models.RequirementStatement.collection_name == collection_name)
+    if source is not None:
+        query = query.filter(models.RequirementStatement.source == source)
+    if kind is not None:
+        query = query.filter(models.RequirementStatement.kind == kind)
+    if section is not None:
+        query = query.filter(models.RequirementStatement.section_letter == section.upper())
+    return query.order_by(models.RequirementStatement.source, models.RequirementStatement.page).all()
+
+def delete_requirement_statements(db: Session, collection_name: str, source: str = None):
+    query = db.query(models.RequirementStatement).filter(models.RequirementStatement.collection_name == collection_name)
+    if source is not None:
+        query = query.filter(models.RequirementStatement.source == source)
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def get_chunk_fingerprints(db: Session, collection_name: str, band_keys: List[str] = None, chunk_ids: List[str] = None):
+    """Fingerprint rows of a collection in any of `band_keys` and/or of `chunk_ids` (one row per band)."""
+    query = db.query(models.ChunkFingerprint).filter(models.ChunkFingerprint.collection_name == collection_name)
+    if band_keys is not None:
+        query = query.filter(models.ChunkFingerprint.band_key.in_(band_keys))
+    if chunk_ids is not None:
+        query = query.filter(models.ChunkFingerprint.chunk_id.in_(chunk_ids))
+    return query.all()
+
+def add_chunk_fingerprints(db: Session, collection_name: str, rows: List[dict]):
+    """Store fingerprints; each row has chunk_id, simhash, source, page and
+    band_keys. Rows already stored for the same chunks are replaced."""
+    ids = [r["chunk_id"] for r in rows]
+    for i in range(0, len(ids), 500):
+        db.query(models.ChunkFingerprint).filter(
+            models.ChunkFingerprint.collection_name == collection_name,
+            models.ChunkFingerprint.chunk_id.in_(ids[i : i + 500]),
+        ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.ChunkFingerprint, [
+        {"chunk_id": r["chunk_id"], "band_key": band, "collection_name": collection_name,
+         "simhash": r["simhash"], "source": r.get("source"), "page": r.get("page")}
+        for r in rows for band in r["band_keys"]
+    ])
+    db.commit()
+
+def move_chunk_fingerprints(db: Session, collection_name: str, owners: Dict[str, Tuple[str, int]]):
+    """Hand chunks to new owners: {chunk_id: (source, page)}."""
+    for chunk_id, (source, page) in owners.items():
+        db.query(models.ChunkFingerprint).filter(
+            models.ChunkFingerprint.collection_name == collection_name,
+            models.ChunkFingerprint.chunk_id == chunk_id,
+        ).update({"source": source, "page": page}, synchronize_session=False)
+    db.commit()
+
+def delete_chunk_fingerprints(db: Session, collection_name: str, chunk_ids: List[str] = None):
+    """Drop fingerprints and refs of `chunk_ids` (default: the whole collection)."""
+    for model in (models.ChunkFingerprint, models.ChunkRef):
+        query = db.query(model).filter(model.collection_name == collection_name)
+        if chunk_ids is None:
+            query.delete(synchronize_session=False)
+            continue
+        for i in range(0, len(chunk_ids), 500):
+            query.filter(model.chunk_id.in_(chunk_ids[i : i + 500])).delete(synchronize_session=False)
+    db.commit()
+
+def get_chunk_refs(db: Session, collection_name: str, chunk_ids: List[str] = None, sources: List[str] = None):
+    """Refs of `chunk_ids` and/or pointing at `sources`, in the order they were added."""
+    query = db.query(models.ChunkRef).filter(models.ChunkRef.collection_name == collection_name)
+    if chunk_ids is not None:
+        query = query.filter(models.ChunkRef.chunk_id.in_(chunk_ids))
+    if sources is not None:
+        query = query.filter(models.ChunkRef.source.in_(sources))
+    return query.order_by(models.ChunkRef.id).all()
+
+def set_chunk_refs(db: Session, collection_name: str, refs: Dict[str, List[list]]):
+    """Replace the refs of each chunk in `refs` ({chunk_id: [[source, page], ...]}) in one transaction."""
+    ids = list(refs)
+    for i in range(0, len(ids), 500):
+        db.query(models.ChunkRef).filter(
+            models.ChunkRef.collection_name == collection_name,
+            models.ChunkRef.chunk_id.in_(ids[i : i + 500]),
+        ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.ChunkRef, [
+        {"chunk_id": chunk_id, "collection_name": collection_name, "source": source, "page": page}
+        for chunk_id, held in refs.items() for source, page in held
+    ])
+    db.commit()
+
+def get_document_digest(db: Session, digest_id: str):
+    return db.query(models.DocumentDigest).filter(models.DocumentDigest.id == digest_id).first()
+
+def get_document_digests(db: Session, collection_names: List[str], status: str = None):
+    query = db.query(models.DocumentDigest).filter(models.DocumentDigest.collection_name.in_(collection_names))
+    if status is not None:
+        query = query.filter(models.DocumentDigest.status == status)
+    return query.order_by(models.DocumentDigest.collection_name, models.DocumentDigest.source).all()
+
+def upsert_document_digest(db: Session, digest_id: str, collection_name: str, source: str, **fields):
+    db_digest = get_document_digest(db, digest_id)
+    if db_digest is None:
+        db_digest = models.DocumentDigest(id=digest_id, collection_name=collection_name, source=source)
+        db.add(db_digest)
+    for key, value in fields.items():
+        setattr(db_digest, key, value)
+    db.commit()
+    db.refresh(db_digest)
+    return db_digest
+
+def delete_document_digests(db: Session, collection_name: str, source: str = None):
+    query = db.query(models.DocumentDigest).filter(models.DocumentDigest.collection_name == collection_name)
+    if source is not None:
+        query = query.filter(models.DocumentDigest.source == source)
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def get_vector_collection(db: Session, name: str):
+    return db.query(models.VectorCollection).filter(models.VectorCollection.name == name).first()
+
+def create_vector_collection(db: Session, name: str, physical_name: str, embedding_model: str, dimension: int = None):
+    db_row = models.VectorCollection(
+        name=name, physical_name=physical_name, embedding_model=embedding_model, dimension=dimension
+    )
+    db.add(db_row)
+    db.commit()
+    db.refresh(db_row)
+    return db_row
+
+def update_vector_collection(db: Session, name: str, **fields):
+    db_row = db.query(models.VectorCollection).filter(models.VectorCollection.name == name).first()
+    if db_row:
+        for key, value in fields.items():
+            setattr(db_row, key, value)
+        db.commit()
+        db.refresh(db_row)
+    return db_row
+
+def delete_vector_collection(db: Session, name: str):
+    deleted = db.query(models.VectorCollection).filter(models.VectorCollection.name == name).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+def get_unfinished_ingest_jobs(db: Session):
+    return db.query(models.IngestJob).filter(models.IngestJob.status.notin_(["done", "failed"])).all()
+
+def touch_ingest_jobs(db: Session, job_ids: List[str]):
+    """Heartbeat: bump updated_at of the unfinished jobs among `job_ids`."""
+    db.query(models.IngestJob).filter(
+        models.IngestJob.id.in_(job_ids),
+        models.IngestJob.status.notin_(["done", "failed"]),
+    ).update({"updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+
+def get_ingested_documents_with_status(db: Session, statuses: List[str]):
+    return db.query(models.IngestedDocument).filter(models.IngestedDocument.status.in_(statuses)).all()
+
+def get_ingest_jobs_overlapping(db: Session, collection_name: str, started_before, finished_after):
+    """Jobs that started before `started_before` and were still running at `finished_after`."""
+    return db.query(models.IngestJob).filter(
+        models.IngestJob.collection_name == collection_name,
+        models.IngestJob.started_at < started_before,
+        or_(models.IngestJob.finished_at.is_(None), models.IngestJob.finished_at >= finished_after),
+    ).all()
@@ -8,6 +8,8 @@ from app.core.config import origins, APP_ENV
 from app.deps import get_db
 import crud
 from app.services.prompt_service import _seed_prompt_functions_logic
+from app.services.embedding_cache import get_query_cache, query_cache_stats
+from app.services.ingest_jobs import recover_stale_jobs
 
 # Routers
 from app.routers.auth_routes import router as auth_router
@@ -41,7 +43,11 @@ app.include_router(sections_router, prefix=API_PREFIX)
 # Healthchecks (one unprefixed, optionally one prefixed in prod)
 @app.get("/healthz")
 def healthz():
-    return {"status": "ok", "env": APP_ENV, "prefix": API_PREFIX or "/"}
+    return {
+        "status": "ok", "env": APP_ENV, "prefix": API_PREFIX or "/",
+        # per worker process
+        "query_embedding_cache": query_cache_stats(),
+    }
 
 if API_PREFIX:
     @app.get(f"{API_PREFIX}/healthz")
@@ -57,3 +63,7 @@ async def startup_event():
     finally:
         if db:
             db.close()
+    # queued/running jobs of a worker that died were only in its memory
+    recover_stale_jobs()
+    # resolve QUERY_EMBED_CACHE_BACKEND now, so a bad spec is reported at boot
+    get_query_cache()
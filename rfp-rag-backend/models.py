@@ -1,6 +1,6 @@
 # rfp-rag-backend/models.py
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, DateTime, Boolean, Float, JSON, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -23,6 +23,10 @@ class RfpProject(Base):
     temperature = Column(Float, default=0.7)
     # context_amount = Column(Integer, default=15) # <-- This line is removed
     context_size = Column(String, default='medium')
+    # Embedding backend spec for the project's collection (None = EMBEDDING_MODEL)
+    embedding_model = Column(String, nullable=True)
+    # PDF text-extraction backend for the project's uploads (None = PDF_EXTRACTOR)
+    pdf_extractor = Column(String, nullable=True)
     owner = relationship("User", back_populates="projects")
     chat_messages = relationship(
         "ChatMessage", 
@@ -53,4 +57,153 @@ class KnowledgeBaseDocument(Base):
     __tablename__ = "knowledge_base_documents"
     id = Column(Integer, primary_key=True, index=True)
     document_name = Column(String, unique=True, index=True)
-    description = Column(Text, nullable=True)
\ No newline at end of file
+    description = Column(Text, nullable=True)
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(String, primary_key=True, index=True)
+    batch_id = Column(String, nullable=True, index=True)
+    collection_name = Column(String, index=True)
+    document_name = Column(String)
+    file_path = Column(String)
+    # queued -> extracting -> embedding -> done | failed
+    status = Column(String, default="queued", index=True)
+    pages = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    cache_misses = Column(Integer, default=0)
+    replaces = Column(String, nullable=True)
+    summary = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # bumped by every progress update and by the owning worker's heartbeat
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class IngestedDocument(Base):
+    """Registry row for one file ingested into a collection.
+
+    `chunk_ids` lists the exact vector ids the document owns, so deletes and
+    re-ingests address vectors by id instead of filtering the collection on
+    `source` metadata.
+    """
+    __tablename__ = "ingested_documents"
+    id = Column(String, primary_key=True, index=True)
+    collection_name = Column(String, index=True)
+    source = Column(String, index=True)
+    document_name = Column(String)
+    content_hash = Column(String, nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    pages = Column(Integer, default=0)
+    chunks = Column(Integer, default=0)
+    chunk_ids = Column(JSON, nullable=True)
+    # queued -> processing -> done | failed
+    status = Column(String, default="queued", index=True)
+    error = Column(Text, nullable=True)
+    job_id = Column(String, nullable=True)
+    timings = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class DocumentSection(Base):
+    """Full text of one detected section (e.g. L.4.2) of an ingested document.
+
+    Chunks in Chroma carry `parent_id` pointing here so retrieval can swap
+    matching fragments for their enclosing section.
+    """
+    __tablename__ = "document_sections"
+    id = Column(String, primary_key=True, index=True)
+    collection_name = Column(String, index=True)
+    source = Column(String, index=True)
+    section_path = Column(Text)
+    text = Column(Text)
+    tokens = Column(Integer, default=0)
+    page_start = Column(Integer, nullable=True)
+    page_end = Column(Integer, nullable=True)
+
+class ChunkFingerprint(Base):
+    """One SimHash band of a stored chunk, for near-duplicate lookup.
+
+    A chunk has one row per band (see `app.services.near_dup`), so an ingest
+    loads only the stored chunks that share a band with its new chunks.
+    `source`/`page` are the chunk's current owner.
+    """
+    __tablename__ = "chunk_fingerprints"
+    __table_args__ = (Index("ix_chunk_fingerprints_collection_band", "collection_name", "band_key"),)
+    chunk_id = Column(String, primary_key=True)
+    band_key = Column(String, primary_key=True)
+    collection_name = Column(String, nullable=False)
+    simhash = Column(String(16), nullable=False)
+    source = Column(String)
+    page = Column(Integer, nullable=True)
+
+class ChunkRef(Base):
+    """A [source, page] whose near-duplicate text is served by vector `chunk_id`."""
+    __tablename__ = "chunk_refs"
+    __table_args__ = (Index("ix_chunk_refs_collection_source", "collection_name", "source"),)
+    id = Column(Integer, primary_key=True, index=True)
+    chunk_id = Column(String, index=True, nullable=False)
+    collection_name = Column(String, nullable=False)
+    source = Column(String)
+    page = Column(Integer, nullable=True)
+
+class RequirementStatement(Base):
+    """Candidate requirement sentence ("shall", "must", evaluation language,
+    Section L/M references) found in an ingested document."""
+    __tablename__ = "requirement_statements"
+    id = Column(String, primary_key=True, index=True)
+    collection_name = Column(String, index=True)
+    source = Column(String, index=True)
+    page = Column(Integer, nullable=True)
+    section_path = Column(Text, nullable=True)
+    # uniform contract section letter ("L", "M", "C", ...) when known
+    section_letter = Column(String(1), nullable=True, index=True)
+    parent_id = Column(String, nullable=True)
+    # evaluation | shall | must | required | reference
+    kind = Column(String, index=True)
+    text = Column(Text)
+    embedding = Column(LargeBinary, nullable=True)
+    embedding_model = Column(String, nullable=True)
+
+class DocumentDigest(Base):
+    """Compact, precomputed overview of one ingested document (section list,
+    evaluation factors, short summaries) used instead of fresh retrieval."""
+    __tablename__ = "document_digests"
+    id = Column(String, primary_key=True, index=True)
+    collection_name = Column(String, index=True)
+    source = Column(String, index=True)
+    # queued -> running -> done | failed
+    status = Column(String, default="queued")
+    # hash of the text the digest was built from; unchanged documents are skipped
+    content_hash = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)
+    sections = Column(JSON, nullable=True)
+    evaluation_factors = Column(JSON, nullable=True)
+    tokens = Column(Integer, default=0)
+    model = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class VectorCollection(Base):
+    """Logical vector collection (project id, "knowledge_base") → the physical
+    Chroma collection currently serving it, plus any re-embed in progress."""
+    __tablename__ = "vector_collections"
+    name = Column(String, primary_key=True, index=True)
+    physical_name = Column(String, nullable=False)
+    embedding_model = Column(String, nullable=False)
+    dimension = Column(Integer, nullable=True)
+    pending_physical_name = Column(String, nullable=True)
+    pending_embedding_model = Column(String, nullable=True)
+    # old physical collection, kept after the switch until in-flight writes are reconciled
+    retired_physical_name = Column(String, nullable=True)
+    # queued -> copying -> syncing -> reconciling -> done | failed
+    migration_status = Column(String, nullable=True)
+    migration_done = Column(Integer, default=0)
+    migration_total = Column(Integer, default=0)
+    migration_error = Column(Text, nullable=True)
+    # band count the collection's chunk_fingerprints rows were built with (None: not indexed yet)
+    fingerprint_bands = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
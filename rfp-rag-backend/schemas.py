@@ -1,7 +1,7 @@
 # rfp-rag-backend/schemas.py
 
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Tuple, Optional, Literal
+from typing import Any, Dict, List, Tuple, Optional, Literal
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -32,6 +32,10 @@ class ChatMessage(ChatMessageBase):
 
 class RfpProjectBase(BaseModel):
     name: str
+    # "openai[:<model>]" or "local:<sentence-transformers model>"; changed later only through an embedding migration
+    embedding_model: Optional[str] = None
+    # "pypdf", "pdfminer" or "pdfium"; None uses the server default
+    pdf_extractor: Optional[str] = None
 class RfpProjectCreate(RfpProjectBase):
     project_id: str
 class RfpProjectUpdate(RfpProjectBase):
@@ -76,6 +80,8 @@ class Settings(BaseModel):
     temperature: float
     # context_amount: int
     context_size: Literal['low', 'medium', 'high'] = 'medium'
+    # left unchanged when omitted
+    pdf_extractor: Optional[str] = None
 
 class KnowledgeBaseDocumentBase(BaseModel):
     document_name: str
@@ -89,6 +95,99 @@ class KnowledgeBaseDocument(KnowledgeBaseDocumentBase):
     class Config:
         from_attributes = True
 
+class IngestJob(BaseModel):
+    id: str
+    batch_id: Optional[str] = None
+    collection_name: str
+    document_name: str
+    status: str
+    pages: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    cache_hits: Optional[int] = 0
+    cache_misses: Optional[int] = 0
+    replaces: Optional[str] = None
+    summary: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+class IngestBatch(BaseModel):
+    batch_id: str
+    status: str
+    documents: int
+    documents_done: int
+    documents_failed: int
+    pages: int
+    chunks_total: int
+    chunks_embedded: int
+    jobs: List[IngestJob] = []
+
+class DocumentDigestSection(BaseModel):
+    path: Optional[str] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    summary: Optional[str] = None
+
+class DocumentDigest(BaseModel):
+    id: str
+    source: str
+    status: str
+    summary: Optional[str] = None
+    sections: Optional[List[DocumentDigestSection]] = None
+    evaluation_factors: Optional[List[str]] = None
+    tokens: Optional[int] = 0
+    model: Optional[str] = None
+    error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+class RequirementStatement(BaseModel):
+    id: str
+    source: Optional[str] = None
+    page: Optional[int] = None
+    section_path: Optional[str] = None
+    section_letter: Optional[str] = None
+    kind: str
+    text: str
+    class Config:
+        from_attributes = True
+
+class ScoredRequirement(BaseModel):
+    requirement: RequirementStatement
+    score: float
+
+class RequirementMatchRequest(BaseModel):
+    items: List[str]
+    k: int = Field(default=3, ge=1, le=20)
+    kind: Optional[str] = None
+    section: Optional[str] = None
+
+class RequirementMatch(BaseModel):
+    item: str
+    matches: List[ScoredRequirement] = []
+
+class EmbeddingMigrationRequest(BaseModel):
+    embedding_model: str
+
+class VectorCollection(BaseModel):
+    name: str
+    physical_name: str
+    embedding_model: str
+    dimension: Optional[int] = None
+    pending_embedding_model: Optional[str] = None
+    migration_status: Optional[str] = None
+    migration_done: Optional[int] = 0
+    migration_total: Optional[int] = 0
+    migration_error: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
 # ---- Project Document schema (added) ----
 from typing import Optional
 
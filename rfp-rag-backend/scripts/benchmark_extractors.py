@@ -0,0 +1,119 @@
+"""Compare PDF text-extraction backends on a corpus of sample PDFs.
+
+Usage (from rfp-rag-backend/):
+
+    python scripts/benchmark_extractors.py path/to/pdfs [more.pdf ...] \
+        [--extractors pypdf,pdfminer,pdfium] [--workers 1] [--repeat 1]
+
+Each backend runs in its own fresh process, one file after another, so the
+reported peak memory (max RSS) belongs to that backend alone. Reported per
+backend: files, pages, wall seconds, pages/sec, peak RSS and characters
+extracted (a rough proxy for how much text a backend recovers). Backends
+whose package is not installed are skipped. The parsed-text cache is
+bypassed, so every pass really parses.
+
+With --workers > 1 the normal process pool is used, which measures
+end-to-end ingest throughput; pool processes are not included in the RSS.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _pdf_files(paths: List[str]) -> List[str]:
+    files: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _dirs, names in os.walk(p):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(".pdf"))
+        elif p.lower().endswith(".pdf"):
+            files.append(p)
+    return files
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_backend(extractor: str, files: List[str], workers: int, repeat: int, out) -> None:
+    from app.services.pdf_extract import extract_page_texts, extractor_version
+
+    result: Dict[str, object] = {"extractor": extractor_version(extractor), "pages": 0, "chars": 0, "errors": 0}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for path in files:
+            try:
+                texts = extract_page_texts(path, workers=workers, extractor=extractor, cache=False)
+            except Exception as e:
+                print(f"  {extractor}: {os.path.basename(path)} failed: {e}", file=sys.stderr)
+                result["errors"] += 1
+                continue
+            result["pages"] += len(texts)
+            result["chars"] += sum(len(t) for t in texts)
+    result["seconds"] = time.perf_counter() - started
+    result["peak_rss_mb"] = _peak_rss_mb()
+    out.put(result)
+
+
+def main() -> int:
+    from app.services.pdf_extract import EXTRACTORS, available_extractors
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--extractors", default=",".join(EXTRACTORS), help="comma-separated backends")
+    parser.add_argument("--workers", type=int, default=1, help="extraction processes per backend (default 1)")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus")
+    args = parser.parse_args()
+
+    files = _pdf_files(args.paths)
+    if not files:
+        print("No PDF files found.", file=sys.stderr)
+        return 1
+    installed = set(available_extractors())
+    wanted = [e.strip().lower() for e in args.extractors.split(",") if e.strip()]
+    size_mb = sum(os.path.getsize(f) for f in files) / (1024 * 1024)
+    print(f"{len(files)} files, {size_mb:.1f} MB, workers={args.workers}, repeat={args.repeat}\n")
+
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for extractor in wanted:
+        if extractor not in EXTRACTORS:
+            print(f"  skipping unknown extractor '{extractor}'", file=sys.stderr)
+            continue
+        if extractor not in installed:
+            print(f"  skipping '{extractor}': {EXTRACTORS[extractor].distribution} is not installed", file=sys.stderr)
+            continue
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_backend, args=(extractor, files, args.workers, args.repeat, out))
+        proc.start()
+        result = out.get()
+        proc.join()
+        rows.append(result)
+
+    header = f"{'extractor':<22}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'peak MB':>10}{'chars':>12}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in sorted(rows, key=lambda r: r["seconds"]):
+        rate = r["pages"] / r["seconds"] if r["seconds"] else 0.0
+        print(
+            f"{r['extractor']:<22}{r['pages']:>8}{r['seconds']:>10.2f}{rate:>10.1f}"
+            f"{r['peak_rss_mb']:>10.0f}{r['chars']:>12}{r['errors']:>8}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Shared fixtures for the offline test suite.
+
+The app reads its configuration from the environment at import time, so
+everything that would touch a real service (Postgres, OpenAI, the shared
+Chroma directory, the embedding/parsed-text caches) is pointed at a
+per-session temp directory before any app module is imported. Tokenizer
+and embedding models are replaced with deterministic fakes so the suite
+runs without network access.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="rfp-rag-tests-")
+
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{os.path.join(_TMP, 'test.db')}?check_same_thread=false",
+        "DB_DIRECTORY": os.path.join(_TMP, "chroma_db"),
+        "EMBED_CACHE_DIRECTORY": os.path.join(_TMP, "embedding_cache"),
+        "PARSED_TEXT_CACHE_DIRECTORY": os.path.join(_TMP, "parsed_text_cache"),
+        "PROJECTS_DIRECTORY": os.path.join(_TMP, "rfp_projects"),
+        "KNOWLEDGE_BASE_DIRECTORY": os.path.join(_TMP, "knowledge_base"),
+        "EXAMPLES_DIRECTORY": os.path.join(_TMP, "proposal_examples"),
+        "QUERY_EMBED_CACHE_BACKEND": "",
+        "VECTORSTORE_RESOLVE_TTL_SECONDS": "0",
+        "OPENAI_API_KEY": "test",
+        "SECRET_KEY": "test",
+        "ANONYMIZED_TELEMETRY": "False",
+    }
+)
+
+import pytest  # noqa: E402
+
+
+class _WhitespaceEncoding:
+    """Stand-in for a tiktoken encoding: one token per whitespace-separated word."""
+
+    name = "whitespace"
+
+    def encode(self, text, allowed_special=None, disallowed_special=None):
+        return (text or "").split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def offline_tokenizer(monkeypatch):
+    tiktoken = pytest.importorskip("tiktoken")
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: _WhitespaceEncoding())
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda name: _WhitespaceEncoding())
+
+
+@pytest.fixture
+def fake_embeddings():
+    fake = pytest.importorskip("langchain_core.embeddings")
+    return fake.DeterministicFakeEmbedding(size=8)
+
+
+@pytest.fixture
+def db_tables():
+    """Create the schema in the test database (idempotent)."""
+    pytest.importorskip("sqlalchemy")
+    from database import Base, engine
+    import models  # noqa: F401  (registers the tables)
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def fake_pdfs(tmp_path, monkeypatch, offline_tokenizer, fake_embeddings, db_tables):
+    """Ingest without PDFs or OpenAI: `fake_pdfs.add(name, pages)` writes a
+    placeholder file whose pages extract as the given texts and returns its
+    path; `fake_pdfs.pages[path]` can be edited before a re-ingest."""
+    ds = pytest.importorskip("app.services.document_service")
+    from langchain_core.documents import Document
+
+    class _FakePdfs:
+        def __init__(self):
+            self.pages = {}
+
+        def add(self, name, pages):
+            path = str(tmp_path / name)
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4 placeholder")
+            self.pages[path] = list(pages)
+            return path
+
+        def iter_pages(self, file_path, workers=None, extractor=None):
+            for i, text in enumerate(self.pages[file_path]):
+                yield Document(page_content=text, metadata={"source": file_path, "page": i})
+
+    pdfs = _FakePdfs()
+    monkeypatch.setattr(ds, "iter_pdf_pages", pdfs.iter_pages)
+    monkeypatch.setattr(ds, "get_embeddings", lambda spec=None: fake_embeddings)
+    monkeypatch.setattr(ds, "collection_extractor", lambda name: "pypdf")
+    return pdfs
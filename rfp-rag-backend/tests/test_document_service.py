@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+
+from app.services import document_service as ds
+from app.services import vectorstore
+
+
+def test_chunk_id_is_the_same_for_relative_and_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    meta = {"source": "rfp.pdf", "page": 2, "chunk_hash": "abc"}
+    absolute = dict(meta, source=str(tmp_path / "rfp.pdf"))
+    dotted = dict(meta, source=os.path.join(".", "sub", "..", "rfp.pdf"))
+    assert ds.chunk_id("proj", meta) == ds.chunk_id("proj", absolute) == ds.chunk_id("proj", dotted)
+
+
+def test_chunk_id_depends_on_collection_page_and_content():
+    meta = {"source": "/data/rfp.pdf", "page": 2, "chunk_hash": "abc"}
+    ids = {
+        ds.chunk_id("proj", meta),
+        ds.chunk_id("other", meta),
+        ds.chunk_id("proj", dict(meta, page=3)),
+        ds.chunk_id("proj", dict(meta, chunk_hash="abd")),
+        ds.chunk_id("proj", dict(meta, source="/data/sow.pdf")),
+    }
+    assert len(ids) == 5
+    assert ds.chunk_id("proj", dict(meta)) == ds.chunk_id("proj", meta)
+
+
+def _page_text(page: int, words: int = 60) -> str:
+    # distinct vocabulary per page, so no page is a near-duplicate of another
+    return " ".join(f"term{page}x{i}" for i in range(words)) + "."
+
+
+def _ids(collection_name: str) -> list:
+    return sorted(vectorstore.get_collection(collection_name, fresh=True).get()["ids"])
+
+
+def test_reingest_of_unchanged_file_is_an_upsert(fake_pdfs):
+    path = fake_pdfs.add("rfp.pdf", [_page_text(i) for i in range(4)])
+    first = ds.process_document(path, "upsert_unchanged")
+    ids = _ids("upsert_unchanged")
+    assert first["summary"]["mode"] == "new"
+    assert len(ids) == first["summary"]["chunks_added"] > 0
+
+    second = ds.process_document(path, "upsert_unchanged")
+    assert second["summary"]["mode"] == "incremental"
+    assert second["summary"]["chunks_added"] == 0
+    assert second["summary"]["chunks_removed"] == 0
+    assert second["summary"]["chunks_unchanged"] == len(ids)
+    assert _ids("upsert_unchanged") == ids
+
+
+def test_reingest_of_edited_page_replaces_only_its_chunks(fake_pdfs):
+    path = fake_pdfs.add("rfp.pdf", [_page_text(i) for i in range(4)])
+    ds.process_document(path, "upsert_edited")
+    before = vectorstore.get_collection("upsert_edited", fresh=True).get(include=["metadatas"])
+    by_page = {}
+    for cid, meta in zip(before["ids"], before["metadatas"]):
+        by_page.setdefault(meta["page"], set()).add(cid)
+
+    fake_pdfs.pages[path][2] = _page_text(20)
+    result = ds.process_document(path, "upsert_edited")
+    after = set(_ids("upsert_edited"))
+
+    assert result["summary"]["chunks_added"] == len(by_page[2])
+    assert result["summary"]["chunks_removed"] == len(by_page[2])
+    assert after.isdisjoint(by_page[2])
+    for page in (0, 1, 3):
+        assert by_page[page] <= after
+    assert len(after) == len(before["ids"])
@@ -0,0 +1,105 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from app.services.headings import SectionTracker, parse_heading
+
+
+@pytest.mark.parametrize(
+    "line, parts, label",
+    [
+        ("SECTION L - INSTRUCTIONS TO OFFERORS", ("L",), "SECTION L INSTRUCTIONS TO OFFERORS"),
+        ("Section M: Evaluation Factors for Award", ("M",), "SECTION M Evaluation Factors for Award"),
+        ("L.4.2 Technical Volume", ("L", "4", "2"), "L.4.2 Technical Volume"),
+        ("C.3.1. Scope", ("C", "3", "1"), "C.3.1 Scope"),
+        ("3.1.2 Program Management", ("3", "1", "2"), "3.1.2 Program Management"),
+        ("4. EVALUATION FACTORS", ("4",), "4 EVALUATION FACTORS"),
+    ],
+)
+def test_parse_heading_recognizes_headings(line, parts, label):
+    h = parse_heading(line)
+    assert h is not None
+    assert h.parts == parts
+    assert h.label == label
+
+
+def test_parse_heading_marks_section_roots():
+    assert parse_heading("SECTION L INSTRUCTIONS").is_section_root
+    assert not parse_heading("L.4 Proposal Volumes").is_section_root
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "",
+        "L.4.2 Technical Volume .......... 12",  # table of contents, dot leaders
+        "3.1 Program Management 14",  # table of contents, trailing page number
+        "3.1 The offeror shall provide a staffing plan.",  # a sentence
+        "1 Something",  # bare number with a mixed-case title
+        "L.4 " + "Very long heading text " * 10,  # too long
+    ],
+)
+def test_parse_heading_rejects_non_headings(line):
+    assert parse_heading(line) is None
+
+
+def _page(page, *lines):
+    return Document(page_content="\n".join(lines), metadata={"source": "rfp.pdf", "page": page})
+
+
+def test_section_tracker_segments_and_paths():
+    tracker = SectionTracker(namespace="proj\x00rfp.pdf")
+    first = tracker.segment(_page(
+        0,
+        "Cover page text",
+        "SECTION L INSTRUCTIONS",
+        "General instructions apply.",
+        "L.4 Proposal Volumes",
+        "Proposals have three volumes.",
+    ))
+    second = tracker.segment(_page(
+        1,
+        "Volumes continue here.",
+        "L.4.2 Technical Volume",
+        "Describe the technical approach.",
+        "L.5 Submission",
+        "Submit electronically.",
+    ))
+
+    assert "section_path" not in first[0].metadata  # text before the first heading
+    assert "parent_id" not in first[0].metadata
+    assert [s.metadata["section_path"] for s in first[1:]] == [
+        "SECTION L INSTRUCTIONS",
+        "SECTION L INSTRUCTIONS > L.4 Proposal Volumes",
+    ]
+    assert [s.metadata["section_path"] for s in second] == [
+        "SECTION L INSTRUCTIONS > L.4 Proposal Volumes",
+        "SECTION L INSTRUCTIONS > L.4 Proposal Volumes > L.4.2 Technical Volume",
+        "SECTION L INSTRUCTIONS > L.5 Submission",
+    ]
+    # a section continued across pages keeps its parent id
+    assert second[0].metadata["parent_id"] == first[2].metadata["parent_id"]
+    assert all(s.metadata["page"] == 1 for s in second)
+
+
+def test_section_tracker_parent_ids_are_stable_and_namespaced():
+    lines = ("SECTION M EVALUATION", "M.1 Factors", "Technical is most important.")
+    a = SectionTracker("proj\x00rfp.pdf").segment(_page(0, *lines))
+    b = SectionTracker("proj\x00rfp.pdf").segment(_page(0, *lines))
+    c = SectionTracker("other\x00rfp.pdf").segment(_page(0, *lines))
+    assert [s.metadata["parent_id"] for s in a] == [s.metadata["parent_id"] for s in b]
+    assert a[-1].metadata["parent_id"] != c[-1].metadata["parent_id"]
+
+
+def test_section_tracker_sections_span_pages():
+    tracker = SectionTracker("proj\x00rfp.pdf")
+    tracker.segment(_page(2, "C.3 Scope", "Scope text one."))
+    tracker.segment(_page(3, "Scope text two."))
+    tracker.segment(_page(4, "C.4 Deliverables", "Deliverable text."))
+    records = {r.section_path: r for r in tracker.sections()}
+    assert set(records) == {"C.3 Scope", "C.4 Deliverables"}
+    scope = records["C.3 Scope"]
+    assert (scope.page_start, scope.page_end) == (2, 3)
+    assert "Scope text one." in scope.text and "Scope text two." in scope.text
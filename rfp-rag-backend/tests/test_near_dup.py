@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.services.near_dup import BITS, SimHashIndex, from_hex, hamming, simhash, to_hex
+
+
+CLAUSE = (
+    "The contractor shall deliver the monthly status report to the contracting "
+    "officer no later than the tenth business day of each month."
+)
+
+
+def test_simhash_ignores_case_punctuation_and_whitespace():
+    assert simhash(CLAUSE) == simhash("  " + CLAUSE.upper().replace(".", "") + "\n")
+
+
+def test_simhash_near_copy_is_close_and_unrelated_text_is_far():
+    edited = CLAUSE.replace("tenth", "fifth")
+    other = "Offerors must describe their staffing approach and key personnel qualifications in Volume II."
+    assert hamming(simhash(CLAUSE), simhash(edited)) < hamming(simhash(CLAUSE), simhash(other))
+    assert hamming(simhash(CLAUSE), simhash(other)) > 6
+
+
+def test_hex_round_trip():
+    h = simhash(CLAUSE)
+    assert len(to_hex(h)) == 16
+    assert from_hex(to_hex(h)) == h
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(0, (1 << BITS) - 1) == BITS
+
+
+def test_find_within_max_distance():
+    index = SimHashIndex(max_distance=3)
+    base = simhash(CLAUSE)
+    index.add("a", base, "a")
+    assert index.find(base) == "a"
+    assert index.find(base ^ 0b111) == "a"  # 3 bits off
+    assert index.find(base ^ 0b1111) is None  # 4 bits off
+
+
+def test_find_prefers_closest_entry():
+    index = SimHashIndex(max_distance=6)
+    base = simhash(CLAUSE)
+    index.add("far", base ^ 0b11111, "far")
+    index.add("near", base ^ 0b1, "near")
+    assert index.find(base) == "near"
+
+
+def test_remove_and_re_add():
+    index = SimHashIndex(max_distance=2)
+    h = simhash(CLAUSE)
+    index.add("a", h, 1)
+    index.add("a", h ^ (1 << 63), 2)  # re-adding a key replaces its entry
+    assert len(index) == 1
+    assert index.find(h ^ (1 << 63)) == 2
+    index.remove("a")
+    assert len(index) == 0
+    assert index.find(h) is None
+
+
+def test_band_keys_one_per_band_and_tagged_with_band_count():
+    index = SimHashIndex(max_distance=6)
+    keys = index.band_keys(simhash(CLAUSE))
+    assert len(keys) == 7
+    assert len(set(keys)) == 7
+    assert all(k.startswith("7:") for k in keys)
+    assert set(SimHashIndex(max_distance=3).band_keys(simhash(CLAUSE))).isdisjoint(keys)
+
+
+def test_band_keys_share_a_bucket_within_max_distance():
+    """Pigeonhole: fingerprints within `max_distance` bits agree on a band."""
+    index = SimHashIndex(max_distance=6)
+    h = simhash(CLAUSE)
+    # flip 6 bits spread over the whole fingerprint
+    flipped = h
+    for bit in (0, 11, 22, 33, 44, 55):
+        flipped ^= 1 << bit
+    assert hamming(h, flipped) == 6
+    assert set(index.band_keys(h)) & set(index.band_keys(flipped))
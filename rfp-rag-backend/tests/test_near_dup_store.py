@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+
+from app.services import document_service as ds
+from app.services import vectorstore
+from app.services.near_dup_store import _text_keys
+
+CLAUSE = (
+    "The contractor shall deliver the transition plan to the contracting officer "
+    "within 30 days after award and shall update it monthly thereafter."
+)
+
+
+def test_text_keys_ignore_case_and_whitespace():
+    assert _text_keys(CLAUSE) == _text_keys("  " + CLAUSE.upper().replace(" ", "\n  "))
+    assert _text_keys(CLAUSE)[0] != _text_keys(CLAUSE.replace("monthly", "weekly"))[0]
+
+
+@pytest.mark.parametrize(
+    "edited",
+    [
+        CLAUSE.replace("shall deliver", "shall not deliver"),
+        CLAUSE.replace("30 days", "45 days"),
+        CLAUSE.replace("shall update", "may update"),
+    ],
+)
+def test_variant_key_sees_negations_numbers_and_modals(edited):
+    assert _text_keys(CLAUSE)[1] != _text_keys(edited)[1]
+
+
+def test_variant_key_ignores_other_wording():
+    assert _text_keys(CLAUSE)[1] == _text_keys(CLAUSE.replace("transition plan", "phase-in plan"))[1]
+
+
+def _filler(n: int) -> str:
+    return " ".join(f"filler{n}x{i}" for i in range(40)) + "."
+
+
+def test_only_matching_text_is_collapsed(fake_pdfs):
+    rfp = fake_pdfs.add("rfp.pdf", [CLAUSE, _filler(1)])
+    amendment = fake_pdfs.add("amendment.pdf", [CLAUSE.replace("shall deliver", "shall not deliver"), _filler(2)])
+    sow = fake_pdfs.add("sow.pdf", [CLAUSE.upper().replace(" ", "  "), _filler(3)])
+
+    ds.process_document(rfp, "near_dup_store")
+    amended = ds.process_document(amendment, "near_dup_store")
+    repeated = ds.process_document(sow, "near_dup_store")
+
+    # the amended clause is its own vector; the re-typeset copy folds into the original
+    assert (amended["summary"]["chunks_added"], amended["summary"]["chunks_collapsed"]) == (2, 0)
+    assert (repeated["summary"]["chunks_added"], repeated["summary"]["chunks_collapsed"]) == (1, 1)
+
+    coll = vectorstore.get_collection("near_dup_store", fresh=True)
+    got = coll.get(where={"source": os.path.abspath(rfp)}, include=["metadatas"])
+    holder = next(meta for meta in got["metadatas"] if meta["page"] == 0)
+    assert holder["dup_count"] == 2
+    assert json.loads(holder["refs"]) == [[os.path.abspath(sow), 0]]
+
+
+def test_removing_the_holder_hands_its_vector_to_the_copy(fake_pdfs):
+    rfp = fake_pdfs.add("rfp.pdf", [CLAUSE, _filler(1)])
+    sow = fake_pdfs.add("sow.pdf", [CLAUSE, _filler(3)])
+    ds.process_document(rfp, "near_dup_promote")
+    ds.process_document(sow, "near_dup_promote")
+    coll = vectorstore.get_collection("near_dup_promote", fresh=True)
+    assert coll.count() == 3
+
+    ds.remove_source("near_dup_promote", rfp)
+
+    got = coll.get(include=["documents", "metadatas"])
+    assert sorted(got["documents"]) == sorted([CLAUSE, _filler(3)])
+    assert {meta["source"] for meta in got["metadatas"]} == {os.path.abspath(sow)}
+    assert all(meta["dup_count"] == 1 for meta in got["metadatas"] if "dup_count" in meta)
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from app.services.requirements import RequirementCollector, requirement_kind, section_letter
+
+
+@pytest.mark.parametrize(
+    "sentence, kind",
+    [
+        ("Technical approach will be evaluated on feasibility and risk.", "evaluation"),
+        ("Proposals shall be rated against the evaluation factors below.", "evaluation"),
+        ("The evaluation criteria are listed in descending order of importance.", "evaluation"),
+        ("The contractor shall provide a transition plan within 30 days.", "shall"),
+        ("Offerors MUST submit past performance questionnaires.", "must"),
+        ("The offeror is required to hold a facility clearance.", "required"),
+        ("Page limits are set out in Section L of this solicitation.", "reference"),
+        ("Format the cost volume as described in L.4.3 below.", "reference"),
+        ("This page intentionally left blank for printing purposes.", None),
+        ("Marshall the resources of the whole team.", None),  # "shall" only inside a word
+    ],
+)
+def test_requirement_kind(sentence, kind):
+    assert requirement_kind(sentence) == kind
+
+
+@pytest.mark.parametrize(
+    "path, letter",
+    [
+        ("SECTION L INSTRUCTIONS > L.4 Proposal Volumes", "L"),
+        ("section m evaluation", "M"),
+        ("C.3.1 Scope", "C"),
+        ("3.1.2 Program Management", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_section_letter(path, letter):
+    assert section_letter(path) == letter
+
+
+def test_collector_keeps_first_occurrence_per_sentence():
+    collector = RequirementCollector(namespace="proj\x00rfp.pdf", source="rfp.pdf")
+    text = (
+        "L.4 Proposal Volumes\n"
+        "The offeror shall submit three volumes. Volumes are bound separately.\n"
+        "- Each volume must include a table of contents"
+    )
+    meta = {"page": 3, "section_path": "SECTION L INSTRUCTIONS > L.4 Proposal Volumes", "parent_id": "p1"}
+    collector.feed([Document(page_content=text, metadata=meta)])
+    collector.feed([Document(page_content="The offeror shall submit three volumes.", metadata={"page": 9})])
+
+    rows = collector.rows()
+    assert [(r["kind"], r["text"]) for r in rows] == [
+        ("shall", "The offeror shall submit three volumes."),
+        ("must", "Each volume must include a table of contents"),
+    ]
+    assert all(r["page"] == 3 and r["section_letter"] == "L" for r in rows)
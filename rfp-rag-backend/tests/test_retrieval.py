@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_community")
+
+from app.services import retrieval
+from app.services import vectorstore
+
+TEXTS = [
+    "The contractor shall deliver monthly status reports.",
+    "Monthly status reports are due on the tenth business day.",
+    "Key personnel must be available for the full period of performance.",
+    "Resumes for key personnel are limited to two pages each.",
+    "Technical approach will be evaluated for feasibility and risk.",
+    "Past performance will be rated on relevance and recency.",
+    "The cost volume shall include a basis of estimate.",
+    "Labor rates must be fully burdened.",
+    "Proposals are due by 2:00 PM Eastern on the closing date.",
+    "Questions must be submitted in writing ten days before closing.",
+    "The period of performance is one base year and four option years.",
+    "Transition-in shall be completed within sixty days of award.",
+]
+
+
+@pytest.fixture
+def populated(monkeypatch, fake_embeddings, db_tables):
+    name = "mmr_batch"
+    monkeypatch.setattr(retrieval, "get_query_embeddings", lambda spec=None: fake_embeddings)
+    coll = vectorstore.get_collection(name, fresh=True)
+    if coll.count() == 0:
+        coll.add(
+            ids=[f"c{i}" for i in range(len(TEXTS))],
+            documents=TEXTS,
+            metadatas=[{"source": "rfp.pdf", "page": i} for i in range(len(TEXTS))],
+            embeddings=fake_embeddings.embed_documents(TEXTS),
+        )
+    return name
+
+
+def test_multi_query_mmr_matches_per_query_mmr(populated, fake_embeddings):
+    queries = ["status report schedule", "key personnel requirements", "evaluation of proposals"]
+    k, fetch_k, lambda_mult = 3, 6, 0.5
+
+    batched = retrieval.multi_query_mmr(populated, queries, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+
+    store = vectorstore.langchain_store(populated, embeddings=fake_embeddings)
+    expected = [
+        d
+        for q in queries
+        for d in store.max_marginal_relevance_search(q, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+    ]
+    assert len(batched) == len(queries) * k
+    assert [(d.page_content, d.metadata) for d in batched] == [(d.page_content, d.metadata) for d in expected]
+
+
+def test_multi_query_mmr_reuses_shared_query_vectors(populated, fake_embeddings, monkeypatch):
+    queries = ["status report schedule"]
+    binding = vectorstore.resolve(populated)
+    vectors = {binding.embedding_model: fake_embeddings.embed_documents(queries)}
+
+    def _no_embedding(spec=None):
+        raise AssertionError("queries were embedded again")
+
+    monkeypatch.setattr(retrieval, "get_query_embeddings", _no_embedding)
+    assert len(retrieval.multi_query_mmr(populated, queries, k=2, fetch_k=4, vectors=vectors)) == 2
+
+
+def test_multi_query_mmr_without_queries():
+    assert retrieval.multi_query_mmr("anything", []) == []
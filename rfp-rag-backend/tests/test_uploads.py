@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from app.services.uploads import _copy_stream, extract_zip, stage_zip, unique_path
+
+
+def test_copy_stream_returns_size_and_sha256(tmp_path):
+    data = b"x" * 2500
+    dest = tmp_path / "rfp.pdf"
+    size, digest = _copy_stream(io.BytesIO(data), str(dest), max_bytes=4096, chunk_size=1000)
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
+    assert not os.path.exists(f"{dest}.part")
+
+
+def test_copy_stream_over_limit_is_413_and_leaves_nothing(tmp_path):
+    dest = tmp_path / "big.pdf"
+    with pytest.raises(HTTPException) as exc:
+        _copy_stream(io.BytesIO(b"x" * 5000), str(dest), max_bytes=4096, chunk_size=1000)
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_copy_stream_over_limit_keeps_existing_file(tmp_path):
+    dest = tmp_path / "rfp.pdf"
+    dest.write_bytes(b"previous version")
+    with pytest.raises(HTTPException):
+        _copy_stream(io.BytesIO(b"x" * 5000), str(dest), max_bytes=4096, chunk_size=1000)
+    assert dest.read_bytes() == b"previous version"
+    assert os.listdir(tmp_path) == ["rfp.pdf"]
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+
+
+def test_extract_zip_flattens_and_skips_metadata(tmp_path):
+    archive = tmp_path / "package.zip"
+    _zip(archive, [
+        ("rfp/sow.pdf", b"sow"),
+        ("amendments/sow.pdf", b"sow amended"),
+        ("../escape.pdf", b"escape"),
+        ("__MACOSX/rfp/._sow.pdf", b"junk"),
+        ("rfp/.DS_Store", b"junk"),
+    ])
+    dest = tmp_path / "project"
+    dest.mkdir()
+    paths = extract_zip(str(archive), str(dest))
+    assert sorted(os.path.basename(p) for p in paths) == ["escape.pdf", "sow (2).pdf", "sow.pdf"]
+    assert sorted(os.listdir(dest)) == ["escape.pdf", "sow (2).pdf", "sow.pdf"]
+
+
+def test_extract_zip_over_limit_leaves_destination_untouched(tmp_path):
+    archive = tmp_path / "package.zip"
+    _zip(archive, [("a.pdf", b"a" * 3000), ("b.pdf", b"b" * 3000)])
+    dest = tmp_path / "project"
+    dest.mkdir()
+    (dest / "a.pdf").write_bytes(b"kept")
+    with pytest.raises(HTTPException) as exc:
+        extract_zip(str(archive), str(dest), max_bytes=4096, chunk_size=1000)
+    assert exc.value.status_code == 413
+    assert os.listdir(dest) == ["a.pdf"]
+    assert (dest / "a.pdf").read_bytes() == b"kept"
+
+
+def test_one_taken_set_keeps_every_upload_of_a_request(tmp_path):
+    """Same-named plain files and ZIP members of one bulk upload never share a path."""
+    first, second = tmp_path / "one.zip", tmp_path / "two.zip"
+    _zip(first, [("sow.pdf", b"from one")])
+    _zip(second, [("docs/sow.pdf", b"from two")])
+    dest = tmp_path / "project"
+    staging = tmp_path / "staging"
+    dest.mkdir()
+    staging.mkdir()
+    taken = set()
+
+    plain = unique_path(str(dest), "sow.pdf", taken)
+    staged = stage_zip(str(first), str(dest), str(staging), taken)
+    staged += stage_zip(str(second), str(dest), str(staging), taken)
+
+    targets = [plain] + [target for _, target in staged]
+    assert [os.path.basename(t) for t in targets] == ["sow.pdf", "sow (2).pdf", "sow (3).pdf"]
+    assert [open(tmp, "rb").read() for tmp, _ in staged] == [b"from one", b"from two"]
+    assert os.listdir(dest) == []  # nothing moved into the project yet